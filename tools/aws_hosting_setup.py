@@ -6,25 +6,470 @@ Sets up AWS infrastructure to host converted Khan Academy content
 in TimeBack format with proper API endpoints.
 """
 
+import hashlib
 import json
-import boto3
+import py_compile
+import re
+import sys
+import tempfile
 import yaml
+import zipfile
 from datetime import datetime
 import os
 import argparse
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit, parse_qsl, unquote
+
+LAMBDA_RUNTIMES = ("python3.11", "python3.12", "python3.13")
+LAMBDA_ARCHITECTURES = ("arm64", "x86_64")
+
+# CloudFormation rejects inline Code.ZipFile sources longer than this; the generated
+# handler is far larger, so it always ships as a built artifact
+INLINE_CODE_LIMIT = 4096
+
+PSEUDO_PARAMETERS = {"AWS::AccountId", "AWS::NotificationARNs", "AWS::NoValue", "AWS::Partition",
+                     "AWS::Region", "AWS::StackId", "AWS::StackName", "AWS::URLSuffix"}
+
+def _runtime_version(runtime: str) -> tuple:
+    return tuple(int(part) for part in runtime[len("python"):].split("."))
 
 class AWSTimeBackHosting:
     """Sets up AWS infrastructure for hosting TimeBack content"""
     
-    def __init__(self, region: str = "us-east-1", stack_name: str = "timeback-khan-content"):
+    def __init__(self, region: str = "us-east-1", stack_name: str = "timeback-khan-content",
+                 runtime: str = "python3.11", memory_size: int = 512,
+                 architecture: str = "arm64", provisioned_concurrency: int = 0,
+                 school_hours_concurrency: int = 0, snap_start: bool = False, direct_s3_reads: bool = False):
         self.region = region
         self.stack_name = stack_name
         self.s3_bucket_name = f"{stack_name}-content-{datetime.now().strftime('%Y%m%d')}"
         self.api_name = f"{stack_name}-api"
         
-    def create_cloudformation_template(self) -> Dict[str, Any]:
-        """Create CloudFormation template for TimeBack hosting infrastructure"""
+        # Lambda runtime and capacity; the numbers become template parameter defaults
+        self.runtime = runtime
+        self.memory_size = memory_size
+        self.architecture = architecture
+        self.provisioned_concurrency = provisioned_concurrency
+        self.school_hours_concurrency = school_hours_concurrency
+        self.snap_start = snap_start
+        # Serve course and syllabus GETs straight from S3 through API Gateway
+        self.direct_s3_reads = direct_s3_reads
+    
+    def artifact_key(self) -> str:
+        """S3 key of the deployment package, named by its content so every change deploys"""
+        
+        digest = hashlib.sha256(self._get_lambda_code().encode("utf-8"))
+        digest.update(self.runtime.encode("utf-8"))
+        return f"lambda/timeback-api-{digest.hexdigest()[:16]}.zip"
+    
+    def build_lambda_package(self, output_dir: str) -> str:
+        """Write the Lambda deployment package and return its path
+        
+        The zip holds index.py and, when this interpreter matches the target
+        runtime, its bytecode compiled with an unchecked hash so the read-only
+        Lambda filesystem never has to recompile or even stat the source.
+        The handler needs nothing beyond the standard library and the
+        runtime's boto3, so no dependencies are vendored. Entries carry a
+        fixed timestamp, making the archive byte-for-byte reproducible.
+        """
+        
+        code = self._get_lambda_code()
+        package_path = os.path.join(output_dir, *self.artifact_key().split("/"))
+        os.makedirs(os.path.dirname(package_path), exist_ok=True)
+        
+        entries = [("index.py", code.encode("utf-8"))]
+        if _runtime_version(self.runtime) == sys.version_info[:2]:
+            with tempfile.TemporaryDirectory() as work_dir:
+                source_path = os.path.join(work_dir, "index.py")
+                with open(source_path, 'w', encoding='utf-8') as f:
+                    f.write(code)
+                compiled_path = py_compile.compile(source_path, cfile=os.path.join(work_dir, "index.pyc"),
+                                                   dfile="index.py", doraise=True,
+                                                   invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH)
+                with open(compiled_path, 'rb') as f:
+                    entries.append((f"__pycache__/index.{sys.implementation.cache_tag}.pyc", f.read()))
+        else:
+            print(f"⚠️  Building on Python {sys.version_info[0]}.{sys.version_info[1]}, not {self.runtime}: "
+                  f"packaging source only")
+        
+        with zipfile.ZipFile(package_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as archive:
+            for name, data in entries:
+                info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+                info.external_attr = 0o644 << 16
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, data)
+        return package_path
+    
+    def _lambda_resources(self) -> Dict[str, Any]:
+        """Function, published version, live alias and the school-hours provisioned concurrency schedule"""
+        
+        # A version is immutable, so a new one (new logical ID) is published whenever
+        # the code or the generated defaults change; parameter-only overrides at
+        # deploy time apply to $LATEST until the next regeneration
+        settings = json.dumps([self.artifact_key(), self.memory_size, self.architecture, self.snap_start])
+        version_id = "TimeBackAPIVersion" + hashlib.sha256(settings.encode("utf-8")).hexdigest()[:10].upper()
+        
+        return {
+            # Lambda function for TimeBack API
+            "TimeBackAPIFunction": {
+                "Type": "AWS::Lambda::Function",
+                "Properties": {
+                    "FunctionName": {"Fn::Sub": "${AWS::StackName}-api"},
+                    "Runtime": self.runtime,
+                    "Handler": "index.lambda_handler",
+                    "Role": {"Fn::GetAtt": ["LambdaExecutionRole", "Arn"]},
+                    "Environment": {
+                        "Variables": {
+                            "CONTENT_BUCKET": {"Ref": "ContentBucket"},
+                            "METADATA_TABLE": {"Ref": "ContentMetadataTable"},
+                            "PROGRESS_TABLE": {"Ref": "ProgressTable"},
+                            "CACHE_MAX_BYTES": {"Ref": "CacheMaxBytes"},
+                            "CACHE_TTL_SECONDS": {"Ref": "CacheTtlSeconds"}
+                        }
+                    },
+                    "Code": {"S3Bucket": {"Ref": "ArtifactBucket"}, "S3Key": {"Ref": "ArtifactKey"}},
+                    "MemorySize": {"Ref": "MemorySize"},
+                    "Architectures": [{"Ref": "Architecture"}],
+                    "SnapStart": {"ApplyOn": {"Fn::If": ["UseSnapStart", "PublishedVersions", "None"]}},
+                    "Timeout": 30
+                }
+            },
+            
+            version_id: {
+                "Type": "AWS::Lambda::Version",
+                "Properties": {
+                    "FunctionName": {"Ref": "TimeBackAPIFunction"},
+                    "Description": "Published for the live alias"
+                }
+            },
+            
+            # Callers invoke the alias: provisioned concurrency and SnapStart only apply to versions
+            "TimeBackAPILiveAlias": {
+                "Type": "AWS::Lambda::Alias",
+                "Properties": {
+                    "FunctionName": {"Ref": "TimeBackAPIFunction"},
+                    "FunctionVersion": {"Fn::GetAtt": [version_id, "Version"]},
+                    "Name": "live",
+                    "ProvisionedConcurrencyConfig": {"Fn::If": [
+                        "AliasProvisionedConcurrency",
+                        {"ProvisionedConcurrentExecutions": {"Ref": "ProvisionedConcurrency"}},
+                        {"Ref": "AWS::NoValue"}
+                    ]}
+                }
+            },
+            
+            # Warm capacity for school hours, scaled back to the baseline afterwards
+            "TimeBackAPIScalableTarget": {
+                "Type": "AWS::ApplicationAutoScaling::ScalableTarget",
+                "Condition": "HasSchoolHoursScaling",
+                "Properties": {
+                    "ServiceNamespace": "lambda",
+                    "ScalableDimension": "lambda:function:ProvisionedConcurrency",
+                    "ResourceId": {"Fn::Sub": "function:${TimeBackAPIFunction}:live"},
+                    "MinCapacity": {"Ref": "ProvisionedConcurrency"},
+                    "MaxCapacity": {"Ref": "SchoolHoursConcurrency"},
+                    "ScheduledActions": [{
+                        "ScheduledActionName": "school-hours-start",
+                        "Schedule": {"Ref": "SchoolHoursStart"},
+                        "Timezone": {"Ref": "ScheduleTimezone"},
+                        "ScalableTargetAction": {
+                            "MinCapacity": {"Ref": "SchoolHoursConcurrency"},
+                            "MaxCapacity": {"Ref": "SchoolHoursConcurrency"}
+                        }
+                    }, {
+                        "ScheduledActionName": "school-hours-end",
+                        "Schedule": {"Ref": "SchoolHoursEnd"},
+                        "Timezone": {"Ref": "ScheduleTimezone"},
+                        "ScalableTargetAction": {
+                            "MinCapacity": {"Ref": "ProvisionedConcurrency"},
+                            "MaxCapacity": {"Ref": "ProvisionedConcurrency"}
+                        }
+                    }]
+                },
+                "DependsOn": ["TimeBackAPILiveAlias"]
+            }
+        }
+    
+    def _api_resources(self, direct_s3_reads: bool) -> Dict[str, Any]:
+        """API Gateway resources, methods and deployment
+        
+        Every route reaches the Lambda's live alias through {proxy+}. With
+        direct_s3_reads the two hottest reads are S3 service integrations
+        instead: no Lambda invocation, so no cold start and no duration cost.
+        Their objects must exist at logical keys (content_uploader.py
+        --mirror-logical-keys). API Gateway does not fall back to a parent's
+        {proxy+} for deeper paths, so the explicit subtrees get their own.
+        """
+        
+        resources: Dict[str, Any] = {}
+        
+        def resource(logical_id: str, parent: Optional[str], path_part: str):
+            parent_id = {"Ref": parent} if parent else {"Fn::GetAtt": ["TimeBackAPI", "RootResourceId"]}
+            resources[logical_id] = {
+                "Type": "AWS::ApiGateway::Resource",
+                "Properties": {"RestApiId": {"Ref": "TimeBackAPI"}, "ParentId": parent_id, "PathPart": path_part}
+            }
+        
+        def lambda_method(logical_id: str, resource_id: Optional[str], http_method: str = "ANY"):
+            resources[logical_id] = {
+                "Type": "AWS::ApiGateway::Method",
+                "Properties": {
+                    "RestApiId": {"Ref": "TimeBackAPI"},
+                    "ResourceId": {"Ref": resource_id} if resource_id else {"Fn::GetAtt": ["TimeBackAPI", "RootResourceId"]},
+                    "HttpMethod": http_method,
+                    "AuthorizationType": "NONE",
+                    "Integration": {
+                        "Type": "AWS_PROXY",
+                        "IntegrationHttpMethod": "POST",
+                        "Uri": {"Fn::Sub": "arn:aws:apigateway:${AWS::Region}:lambda:path/2015-03-31/functions/"
+                                           "${TimeBackAPILiveAlias}/invocations"}
+                    }
+                }
+            }
+        
+        def s3_method(logical_id: str, resource_id: str, key: str, not_found: str, body_template: Optional[str] = None):
+            success = {
+                "StatusCode": "200",
+                "ResponseParameters": {
+                    "method.response.header.Content-Type": "integration.response.header.Content-Type",
+                    "method.response.header.ETag": "integration.response.header.ETag",
+                    "method.response.header.Cache-Control": "'public, max-age=300, stale-while-revalidate=3600'"
+                }
+            }
+            if body_template:
+                success["ResponseTemplates"] = {"application/json": body_template}
+            headers = ("Content-Type", "ETag", "Cache-Control")
+            resources[logical_id] = {
+                "Type": "AWS::ApiGateway::Method",
+                "Properties": {
+                    "RestApiId": {"Ref": "TimeBackAPI"},
+                    "ResourceId": {"Ref": resource_id},
+                    "HttpMethod": "GET",
+                    "AuthorizationType": "NONE",
+                    "RequestParameters": {
+                        "method.request.path.courseId": True,
+                        "method.request.header.If-None-Match": False
+                    },
+                    "Integration": {
+                        "Type": "AWS",
+                        "IntegrationHttpMethod": "GET",
+                        "Uri": {"Fn::Sub": f"arn:aws:apigateway:${{AWS::Region}}:s3:path/${{ContentBucket}}/{key}"},
+                        "Credentials": {"Fn::GetAtt": ["ApiGatewayS3ReadRole", "Arn"]},
+                        "RequestParameters": {
+                            "integration.request.path.courseId": "method.request.path.courseId",
+                            # Conditional GETs pass through, so unchanged content costs a 304
+                            "integration.request.header.If-None-Match": "method.request.header.If-None-Match"
+                        },
+                        "PassthroughBehavior": "WHEN_NO_TEMPLATES",
+                        "IntegrationResponses": [
+                            success,
+                            {"StatusCode": "304", "SelectionPattern": "304"},
+                            {
+                                # S3 answers 403 for a missing key when the caller cannot list the bucket
+                                "StatusCode": "404",
+                                "SelectionPattern": "403|404",
+                                "ResponseParameters": {"method.response.header.Cache-Control": "'no-store'"},
+                                "ResponseTemplates": {"application/json": json.dumps({"error": not_found})}
+                            },
+                            {
+                                "StatusCode": "502",
+                                "SelectionPattern": "5[0-9][0-9]",
+                                "ResponseParameters": {"method.response.header.Cache-Control": "'no-store'"},
+                                "ResponseTemplates": {"application/json": json.dumps({"error": "Content store unavailable"})}
+                            }
+                        ]
+                    },
+                    "MethodResponses": [
+                        {"StatusCode": "200",
+                         "ResponseParameters": {f"method.response.header.{header}": False for header in headers}},
+                        {"StatusCode": "304"},
+                        {"StatusCode": "404", "ResponseParameters": {"method.response.header.Cache-Control": False}},
+                        {"StatusCode": "502", "ResponseParameters": {"method.response.header.Cache-Control": False}}
+                    ]
+                }
+            }
+        
+        resource("ApiProxyResource", None, "{proxy+}")
+        lambda_method("ApiRootMethod", None)
+        lambda_method("ApiProxyMethod", "ApiProxyResource")
+        
+        if direct_s3_reads:
+            resource("ApiCoursesResource", None, "courses")
+            resource("ApiCourseResource", "ApiCoursesResource", "{courseId}")
+            resource("ApiCourseProxyResource", "ApiCourseResource", "{proxy+}")
+            resource("ApiPowerPathResource", None, "powerpath")
+            resource("ApiPowerPathProxyResource", "ApiPowerPathResource", "{proxy+}")
+            resource("ApiSyllabusResource", "ApiPowerPathResource", "syllabus")
+            resource("ApiSyllabusCourseResource", "ApiSyllabusResource", "{courseId}")
+            resource("ApiSyllabusCourseProxyResource", "ApiSyllabusCourseResource", "{proxy+}")
+            
+            # Listing, paging and filtering stay in the Lambda
+            lambda_method("ApiCoursesMethod", "ApiCoursesResource")
+            lambda_method("ApiCourseProxyMethod", "ApiCourseProxyResource")
+            lambda_method("ApiPowerPathProxyMethod", "ApiPowerPathProxyResource")
+            lambda_method("ApiSyllabusMethod", "ApiSyllabusResource")
+            lambda_method("ApiSyllabusCourseProxyMethod", "ApiSyllabusCourseProxyResource")
+            
+            s3_method("ApiCourseGetMethod", "ApiCourseResource", "courses/{courseId}.json", "Course not found")
+            # Same envelope get_syllabus builds around the stored syllabus
+            s3_method("ApiSyllabusGetMethod", "ApiSyllabusCourseResource", "syllabi/{courseId}.json",
+                      "Syllabus not found", '{"syllabus": $input.body}')
+            
+            resources["ApiGatewayS3ReadRole"] = {
+                "Type": "AWS::IAM::Role",
+                "Properties": {
+                    "AssumeRolePolicyDocument": {
+                        "Version": "2012-10-17",
+                        "Statement": [{
+                            "Effect": "Allow",
+                            "Principal": {"Service": "apigateway.amazonaws.com"},
+                            "Action": "sts:AssumeRole"
+                        }]
+                    },
+                    "Policies": [{
+                        "PolicyName": "TimeBackDirectReads",
+                        "PolicyDocument": {
+                            "Version": "2012-10-17",
+                            "Statement": [{
+                                "Effect": "Allow",
+                                "Action": "s3:GetObject",
+                                "Resource": [
+                                    {"Fn::Sub": "${ContentBucket.Arn}/courses/*"},
+                                    {"Fn::Sub": "${ContentBucket.Arn}/syllabi/*"}
+                                ]
+                            }]
+                        }
+                    }]
+                }
+            }
+        
+        resources["ApiLambdaPermission"] = {
+            "Type": "AWS::Lambda::Permission",
+            "Properties": {
+                "FunctionName": {"Ref": "TimeBackAPILiveAlias"},
+                "Action": "lambda:InvokeFunction",
+                "Principal": "apigateway.amazonaws.com",
+                "SourceArn": {"Fn::Sub": "arn:aws:execute-api:${AWS::Region}:${AWS::AccountId}:${TimeBackAPI}/*"}
+            }
+        }
+        
+        # A deployment is a snapshot of the methods, so a new one is created whenever they change
+        methods = sorted(logical_id for logical_id, item in resources.items() if item["Type"] == "AWS::ApiGateway::Method")
+        routes = json.dumps({logical_id: resources[logical_id] for logical_id in methods}, sort_keys=True)
+        deployment_id = "TimeBackAPIDeployment" + hashlib.sha256(routes.encode("utf-8")).hexdigest()[:10].upper()
+        resources[deployment_id] = {
+            "Type": "AWS::ApiGateway::Deployment",
+            "Properties": {"RestApiId": {"Ref": "TimeBackAPI"}, "StageName": "v1"},
+            "DependsOn": methods
+        }
+        return resources
+    
+    def _cache_policy(self, name: str, min_ttl: int, default_ttl: int, max_ttl: int, comment: str) -> Dict[str, Any]:
+        """CloudFront cache policy keyed on the path alone, with gzip and Brotli variants cached"""
+        
+        return {
+            "Type": "AWS::CloudFront::CachePolicy",
+            "Properties": {
+                "CachePolicyConfig": {
+                    "Name": {"Fn::Sub": f"${{AWS::StackName}}-{name}"},
+                    "Comment": comment,
+                    "MinTTL": min_ttl,
+                    "DefaultTTL": default_ttl,
+                    "MaxTTL": max_ttl,
+                    "ParametersInCacheKeyAndForwardedToOrigin": {
+                        "EnableAcceptEncodingGzip": True,
+                        "EnableAcceptEncodingBrotli": True,
+                        "HeadersConfig": {"HeaderBehavior": "none"},
+                        "CookiesConfig": {"CookieBehavior": "none"},
+                        "QueryStringsConfig": {"QueryStringBehavior": "none"}
+                    }
+                }
+            }
+        }
+    
+    def _cache_behavior(self, cache_policy: str, path_pattern: Optional[str] = None) -> Dict[str, Any]:
+        behavior = {"PathPattern": path_pattern} if path_pattern else {}
+        behavior.update({
+            "TargetOriginId": "S3Origin",
+            "ViewerProtocolPolicy": "redirect-to-https",
+            "AllowedMethods": ["GET", "HEAD", "OPTIONS"],
+            "CachedMethods": ["GET", "HEAD"],
+            "CachePolicyId": {"Ref": cache_policy},
+            # CloudFront compresses at the edge for clients that accept gzip or Brotli
+            "Compress": True
+        })
+        return behavior
+    
+    def _lambda_parameters(self) -> Dict[str, Any]:
+        parameters = {
+            "MemorySize": {
+                "Type": "Number",
+                "Default": self.memory_size,
+                "MinValue": 128,
+                "MaxValue": 10240,
+                "Description": "Lambda memory in MB (CPU is allocated in proportion)"
+            },
+            "Architecture": {
+                "Type": "String",
+                "Default": self.architecture,
+                "AllowedValues": list(LAMBDA_ARCHITECTURES),
+                "Description": "Lambda instruction set architecture"
+            },
+            "ProvisionedConcurrency": {
+                "Type": "Number",
+                "Default": self.provisioned_concurrency,
+                "MinValue": 0,
+                "Description": "Always-warm environments on the live alias (0 for none)"
+            },
+            "SchoolHoursConcurrency": {
+                "Type": "Number",
+                "Default": self.school_hours_concurrency,
+                "MinValue": 0,
+                "Description": "Provisioned concurrency between SchoolHoursStart and SchoolHoursEnd (0 disables the schedule)"
+            },
+            "SchoolHoursStart": {
+                "Type": "String",
+                "Default": "cron(30 6 ? * MON-FRI *)",
+                "Description": "When school-hours capacity is provisioned"
+            },
+            "SchoolHoursEnd": {
+                "Type": "String",
+                "Default": "cron(0 16 ? * MON-FRI *)",
+                "Description": "When capacity returns to ProvisionedConcurrency"
+            },
+            "ScheduleTimezone": {
+                "Type": "String",
+                "Default": "America/New_York",
+                "Description": "IANA time zone of the school-hours schedule"
+            },
+            "SnapStart": {
+                "Type": "String",
+                "Default": "Enabled" if self.snap_start else "Disabled",
+                "AllowedValues": ["Enabled", "Disabled"],
+                "Description": "Lambda SnapStart on published versions (Python 3.12+ runtimes, not with provisioned concurrency)"
+            },
+            "ArtifactBucket": {
+                "Type": "String",
+                "Description": "Bucket holding the Lambda deployment package (deploy.sh creates and fills it)"
+            },
+            "ArtifactKey": {
+                "Type": "String",
+                "Default": self.artifact_key(),
+                "Description": "Key of the Lambda deployment package"
+            }
+        }
+        return parameters
+        
+    def create_cloudformation_template(self, direct_s3_reads: Optional[bool] = None) -> Dict[str, Any]:
+        """Create CloudFormation template for TimeBack hosting infrastructure
+        
+        direct_s3_reads overrides the instance setting: GET /courses/{courseId}
+        and /powerpath/syllabus/{courseId} become API Gateway S3 integrations
+        and only the remaining routes invoke the Lambda.
+        """
+        
+        if direct_s3_reads is None:
+            direct_s3_reads = self.direct_s3_reads
         
         template = {
             "AWSTemplateFormatVersion": "2010-09-09",
@@ -35,7 +480,30 @@ class AWSTimeBackHosting:
                     "Default": "dev",
                     "AllowedValues": ["dev", "staging", "prod"],
                     "Description": "Environment name"
-                }
+                },
+                "CacheMaxBytes": {
+                    "Type": "Number",
+                    "Default": 67108864,
+                    "MinValue": 0,
+                    "Description": "Byte budget of the Lambda's warm-container object cache (0 disables it)"
+                },
+                "CacheTtlSeconds": {
+                    "Type": "Number",
+                    "Default": 60,
+                    "MinValue": 0,
+                    "Description": "Seconds a cached object is served before it is revalidated against S3 by ETag"
+                },
+                **self._lambda_parameters()
+            },
+            "Conditions": {
+                "HasProvisionedConcurrency": {"Fn::Not": [{"Fn::Equals": [{"Ref": "ProvisionedConcurrency"}, "0"]}]},
+                "HasSchoolHoursScaling": {"Fn::Not": [{"Fn::Equals": [{"Ref": "SchoolHoursConcurrency"}, "0"]}]},
+                # With a schedule, the scalable target owns the alias's provisioned concurrency
+                "AliasProvisionedConcurrency": {"Fn::And": [
+                    {"Condition": "HasProvisionedConcurrency"},
+                    {"Fn::Not": [{"Condition": "HasSchoolHoursScaling"}]}
+                ]},
+                "UseSnapStart": {"Fn::Equals": [{"Ref": "SnapStart"}, "Enabled"]}
             },
             "Resources": {
                 # S3 Bucket for content storage
@@ -88,7 +556,8 @@ class AWSTimeBackHosting:
                         "BillingMode": "PAY_PER_REQUEST",
                         "AttributeDefinitions": [
                             {"AttributeName": "sourcedId", "AttributeType": "S"},
-                            {"AttributeName": "type", "AttributeType": "S"}
+                            {"AttributeName": "type", "AttributeType": "S"},
+                            {"AttributeName": "title", "AttributeType": "S"}
                         ],
                         "KeySchema": [
                             {"AttributeName": "sourcedId", "KeyType": "HASH"}
@@ -99,6 +568,14 @@ class AWSTimeBackHosting:
                                 {"AttributeName": "type", "KeyType": "HASH"}
                             ],
                             "Projection": {"ProjectionType": "ALL"}
+                        }, {
+                            # Serves sort=title listings in index order
+                            "IndexName": "TypeTitleIndex",
+                            "KeySchema": [
+                                {"AttributeName": "type", "KeyType": "HASH"},
+                                {"AttributeName": "title", "KeyType": "RANGE"}
+                            ],
+                            "Projection": {"ProjectionType": "ALL"}
                         }],
                         "StreamSpecification": {
                             "StreamViewType": "NEW_AND_OLD_IMAGES"
@@ -106,6 +583,23 @@ class AWSTimeBackHosting:
                     }
                 },
                 
+                # Learner progress, one item per learner, lesson and ingested batch
+                "ProgressTable": {
+                    "Type": "AWS::DynamoDB::Table",
+                    "Properties": {
+                        "TableName": {"Fn::Sub": "${AWS::StackName}-progress"},
+                        "BillingMode": "PAY_PER_REQUEST",
+                        "AttributeDefinitions": [
+                            {"AttributeName": "userId", "AttributeType": "S"},
+                            {"AttributeName": "progressKey", "AttributeType": "S"}
+                        ],
+                        "KeySchema": [
+                            {"AttributeName": "userId", "KeyType": "HASH"},
+                            {"AttributeName": "progressKey", "KeyType": "RANGE"}
+                        ]
+                    }
+                },
+                
                 # Lambda execution role
                 "LambdaExecutionRole": {
                     "Type": "AWS::IAM::Role",
@@ -139,16 +633,24 @@ class AWSTimeBackHosting:
                                         "Effect": "Allow",
                                         "Action": [
                                             "dynamodb:GetItem",
+                                            "dynamodb:BatchGetItem",
                                             "dynamodb:PutItem",
                                             "dynamodb:UpdateItem",
                                             "dynamodb:DeleteItem",
-                                            "dynamodb:Query",
-                                            "dynamodb:Scan"
+                                            "dynamodb:Query"
                                         ],
                                         "Resource": [
                                             {"Fn::GetAtt": ["ContentMetadataTable", "Arn"]},
                                             {"Fn::Sub": "${ContentMetadataTable}/index/*"}
                                         ]
+                                    },
+                                    {
+                                        "Effect": "Allow",
+                                        "Action": [
+                                            "dynamodb:BatchWriteItem",
+                                            "dynamodb:Query"
+                                        ],
+                                        "Resource": {"Fn::GetAtt": ["ProgressTable", "Arn"]}
                                     }
                                 ]
                             }
@@ -156,26 +658,7 @@ class AWSTimeBackHosting:
                     }
                 },
                 
-                # Lambda function for TimeBack API
-                "TimeBackAPIFunction": {
-                    "Type": "AWS::Lambda::Function",
-                    "Properties": {
-                        "FunctionName": {"Fn::Sub": "${AWS::StackName}-api"},
-                        "Runtime": "python3.11",
-                        "Handler": "index.lambda_handler",
-                        "Role": {"Fn::GetAtt": ["LambdaExecutionRole", "Arn"]},
-                        "Environment": {
-                            "Variables": {
-                                "CONTENT_BUCKET": {"Ref": "ContentBucket"},
-                                "METADATA_TABLE": {"Ref": "ContentMetadataTable"}
-                            }
-                        },
-                        "Code": {
-                            "ZipFile": {"Fn::Sub": self._get_lambda_code()}
-                        },
-                        "Timeout": 30
-                    }
-                },
+                **self._lambda_resources(),
                 
                 # API Gateway
                 "TimeBackAPI": {
@@ -189,8 +672,15 @@ class AWSTimeBackHosting:
                     }
                 },
                 
-                # API Gateway Resources and Methods would go here
-                # (Simplified for brevity - full implementation would include all OneRoster endpoints)
+                **self._api_resources(direct_s3_reads),
+                
+                # CloudFront cache policies: content-addressed objects never change, the manifest does
+                "ImmutableContentCachePolicy": self._cache_policy("immutable", 31536000, 31536000, 31536000,
+                                                                  "Content-addressed objects (objects/*, manifests/*)"),
+                "ManifestCachePolicy": self._cache_policy("manifest", 0, 60, 300,
+                                                          "Content manifest; short-lived so new uploads show quickly"),
+                "DefaultContentCachePolicy": self._cache_policy("default", 0, 300, 3600,
+                                                                "Objects outside the content-addressed layout"),
                 
                 # CloudFront Distribution for CDN
                 "ContentDistribution": {
@@ -204,19 +694,12 @@ class AWSTimeBackHosting:
                                     "OriginAccessIdentity": ""
                                 }
                             }],
-                            "DefaultCacheBehavior": {
-                                "TargetOriginId": "S3Origin",
-                                "ViewerProtocolPolicy": "redirect-to-https",
-                                "AllowedMethods": ["GET", "HEAD", "OPTIONS"],
-                                "CachedMethods": ["GET", "HEAD"],
-                                "ForwardedValues": {
-                                    "QueryString": False,
-                                    "Cookies": {"Forward": "none"}
-                                },
-                                "MinTTL": 0,
-                                "DefaultTTL": 86400,
-                                "MaxTTL": 31536000
-                            },
+                            "DefaultCacheBehavior": self._cache_behavior("DefaultContentCachePolicy"),
+                            "CacheBehaviors": [
+                                self._cache_behavior("ImmutableContentCachePolicy", "objects/*"),
+                                self._cache_behavior("ImmutableContentCachePolicy", "manifests/*"),
+                                self._cache_behavior("ManifestCachePolicy", "content-manifest.json")
+                            ],
                             "Enabled": True,
                             "Comment": "TimeBack Khan Academy Content CDN"
                         }
@@ -244,6 +727,15 @@ class AWSTimeBackHosting:
                     "Description": "DynamoDB table for content metadata",
                     "Value": {"Ref": "ContentMetadataTable"},
                     "Export": {"Name": {"Fn::Sub": "${AWS::StackName}-MetadataTable"}}
+                },
+                "ProgressTableName": {
+                    "Description": "DynamoDB table for learner progress",
+                    "Value": {"Ref": "ProgressTable"},
+                    "Export": {"Name": {"Fn::Sub": "${AWS::StackName}-ProgressTable"}}
+                },
+                "FunctionAliasArn": {
+                    "Description": "Live alias of the API function (carries provisioned concurrency)",
+                    "Value": {"Ref": "TimeBackAPILiveAlias"}
                 }
             }
         }
@@ -254,16 +746,79 @@ class AWSTimeBackHosting:
         """Generate Lambda function code for TimeBack API"""
         
         return '''
+import base64
 import json
-import boto3
+import hashlib
+import math
 import os
-from datetime import datetime
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime, timezone
 
-s3 = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+# boto3 is imported and clients are built on first use, so a cold start that
+# only serves /health or /orgs never pays for them
+_clients = {}
 
 CONTENT_BUCKET = os.environ['CONTENT_BUCKET']
 METADATA_TABLE = os.environ['METADATA_TABLE']
+PROGRESS_TABLE = os.environ.get('PROGRESS_TABLE')
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', 60))
+
+# Cache-Control per route; error responses are never cached
+CACHE_CONTROL = {
+    'health': 'no-store',
+    'orgs': 'public, max-age=3600',
+    'catalog': 'public, max-age=60, stale-while-revalidate=300',
+    'content': 'public, max-age=300, stale-while-revalidate=3600',
+    'search': 'public, max-age=60'
+}
+
+# OneRoster collection queries against the metadata table
+LIST_PARAMS = ('limit', 'offset', 'filter', 'sort', 'orderBy', 'fields', 'next')
+# sort field -> (index, key attributes of its items); no sort uses TypeIndex order
+SORT_INDEXES = {
+    None: ('TypeIndex', ('sourcedId', 'type')),
+    'title': ('TypeTitleIndex', ('sourcedId', 'type', 'title'))
+}
+LIST_FIELDS = ('grades', 'subjects')
+FILTER_OPERATORS = {'=': '{0} = {1}', '!=': '{0} <> {1}', '>': '{0} > {1}', '>=': '{0} >= {1}',
+                    '<': '{0} < {1}', '<=': '{0} <= {1}', '~': 'contains({0}, {1})'}
+MAX_LIMIT = 1000
+MAX_OFFSET = 10000
+MAX_QUERY_PAGES = 10
+FILTER_PAGE_SIZE = 200
+
+# Learner progress ingestion (POST /progress/batch)
+MAX_PROGRESS_EVENTS = 1000
+PROGRESS_WRITERS = 4
+BATCH_WRITE_SIZE = 25
+BATCH_WRITE_ATTEMPTS = 6
+BATCH_WRITE_BASE_DELAY = 0.05
+BATCH_WRITE_MAX_DELAY = 1.0
+BATCH_WRITE_RETRYABLE = ('ProvisionedThroughputExceededException', 'ThrottlingException',
+                         'RequestLimitExceeded', 'InternalServerError')
+
+# Multi-get (/courses?ids=a,b,c and /powerpath/syllabus?ids=a,b,c); workers stay
+# within boto3's default pool of 10 connections
+MAX_MULTI_GET_IDS = 100
+MULTI_GET_WORKERS = 8
+
+# Warm-container object cache: key -> [body, etag, expires_at], least recently used first
+_cache = OrderedDict()
+_cache_bytes = 0
+# Multi-gets read through the cache from several threads
+_cache_lock = threading.Lock()
+
+# Published by content_uploader.py: logical key -> immutable content-addressed key
+MANIFEST_KEY = 'content-manifest.json'
+# [manifest body, its parsed objects map, missing until]; reparsed only when the body changes.
+# A bucket without a manifest is remembered for CACHE_TTL_SECONDS so reads skip the failed GET.
+_manifest = [None, None, 0.0]
 
 def lambda_handler(event, context):
     """Handle TimeBack API requests"""
@@ -274,27 +829,180 @@ def lambda_handler(event, context):
     try:
         # Parse OneRoster API paths
         if path.startswith('/orgs'):
-            return handle_organizations(event)
+            return respond(event, handle_organizations(event), CACHE_CONTROL['orgs'])
         elif path.startswith('/courses'):
-            return handle_courses(event)
+            listing = path.rstrip('/') == '/courses' and 'ids' not in (event.get('queryStringParameters') or {})
+            return respond(event, handle_courses(event), CACHE_CONTROL['catalog' if listing else 'content'])
+        elif path.startswith('/resources'):
+            return respond(event, handle_resources(event), CACHE_CONTROL['catalog'])
         elif path.startswith('/powerpath/syllabus'):
-            return handle_syllabus(event)
+            return respond(event, handle_syllabus(event), CACHE_CONTROL['content'])
+        elif path.startswith('/search'):
+            return respond(event, handle_search(event), CACHE_CONTROL['search'])
+        elif path.startswith('/progress'):
+            return respond(event, handle_progress(event))
         elif path.startswith('/health'):
-            return {
+            return respond(event, {
                 'statusCode': 200,
-                'body': json.dumps({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
-            }
+                'body': json.dumps({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat(),
+                                    'cache': {'objects': len(_cache), 'bytes': _cache_bytes}})
+            }, CACHE_CONTROL['health'])
         else:
-            return {
+            return respond(event, {
                 'statusCode': 404,
                 'body': json.dumps({'error': 'Not found'})
-            }
+            })
             
     except Exception as e:
-        return {
+        return respond(event, {
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
-        }
+        })
+
+def request_header(event, name):
+    """Case-insensitive request header lookup"""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match comparison (weak, as RFC 9110 specifies for this header)"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in [candidate[2:] if candidate.startswith('W/') else candidate for candidate in candidates]
+
+def respond(event, response, cache_control='no-store'):
+    """Add Content-Type, a strong ETag and Cache-Control; answer 304 when the client is current
+    
+    A handler serving one stored object sets its ETag and passes the body as
+    a callable, so a 304 neither hashes nor builds the body. Other bodies
+    are hashed.
+    """
+    headers = response.setdefault('headers', {})
+    headers.setdefault('Content-Type', 'application/json')
+    if response['statusCode'] != 200:
+        headers['Cache-Control'] = 'no-store'
+        return response
+    
+    etag = headers.get('ETag')
+    if not etag:
+        if callable(response['body']):
+            response['body'] = response['body']()
+        etag = '"' + hashlib.sha256(response['body'].encode('utf-8')).hexdigest() + '"'
+        headers['ETag'] = etag
+    # A handler may narrow the route's caching for one response
+    cache_control = headers.setdefault('Cache-Control', cache_control)
+    if cache_control != 'no-store' and etag_matches(request_header(event, 'if-none-match'), etag):
+        return {'statusCode': 304, 'headers': headers, 'body': ''}
+    if callable(response['body']):
+        response['body'] = response['body']()
+    return response
+
+class NotFound(Exception):
+    """The requested S3 object does not exist"""
+
+def client(service):
+    """Shared boto3 client for service, created on first use"""
+    if service not in _clients:
+        import boto3
+        _clients[service] = boto3.client(service)
+    return _clients[service]
+
+def _not_modified(error):
+    """True for the ClientError S3 raises when IfNoneMatch matches"""
+    code = (getattr(error, 'response', None) or {}).get('Error', {}).get('Code')
+    return code in ('304', 'NotModified')
+
+def _cache_evict(key):
+    global _cache_bytes
+    entry = _cache.pop(key, None)
+    if entry is not None:
+        _cache_bytes -= len(entry[0])
+
+def _cache_get(key):
+    """Cache entry for key, marked most recently used, or None"""
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+        return entry
+
+def _cache_store(key, body, etag, ttl):
+    global _cache_bytes
+    _cache_evict(key)
+    if not etag or len(body) > CACHE_MAX_BYTES:
+        return
+    while _cache and _cache_bytes + len(body) > CACHE_MAX_BYTES:
+        _cache_evict(next(iter(_cache)))
+    _cache[key] = [body, etag, time.monotonic() + ttl]
+    _cache_bytes += len(body)
+
+def resolve_key(key):
+    """(bucket key, immutable) for a logical key such as courses/<id>.json
+    
+    Once a manifest is published it is authoritative: keys it does not list
+    do not exist. Buckets without one are read by logical key.
+    """
+    if time.monotonic() < _manifest[2]:
+        return key, False
+    try:
+        body, _ = _fetch(MANIFEST_KEY, CACHE_TTL_SECONDS)
+    except NotFound:
+        _manifest[2] = time.monotonic() + CACHE_TTL_SECONDS
+        return key, False
+    with _cache_lock:
+        if body is not _manifest[0]:
+            _manifest[0], _manifest[1] = body, json.loads(body).get('objects', {})
+        objects = _manifest[1]
+    if key not in objects:
+        raise NotFound(key)
+    return objects[key], True
+
+def fetch_object(key):
+    """Bytes of a logical object, through the published manifest
+    
+    Content-addressed objects never change, so they stay cached until
+    evicted; only the manifest is revalidated. Raises NotFound.
+    """
+    return fetch_tagged(key)[0]
+
+def fetch_tagged(key):
+    """(bytes, S3 ETag) of a logical object; the ETag serves as the response's own"""
+    bucket_key, immutable = resolve_key(key)
+    return _fetch(bucket_key, float('inf') if immutable else CACHE_TTL_SECONDS)
+
+def _fetch(key, ttl):
+    """(object bytes, ETag), served from the warm-container cache for ttl seconds
+    
+    Expired entries are revalidated with a conditional GET; an unchanged
+    object costs a 304 and no transfer. Raises NotFound.
+    """
+    entry = _cache_get(key)
+    if entry is not None and time.monotonic() < entry[2]:
+        return entry[0], entry[1]
+    
+    s3 = client('s3')
+    try:
+        if entry is None:
+            response = s3.get_object(Bucket=CONTENT_BUCKET, Key=key)
+        else:
+            response = s3.get_object(Bucket=CONTENT_BUCKET, Key=key, IfNoneMatch=entry[1])
+    except s3.exceptions.NoSuchKey:
+        with _cache_lock:
+            _cache_evict(key)
+        raise NotFound(key)
+    except Exception as e:
+        if entry is None or not _not_modified(e):
+            raise
+        entry[2] = time.monotonic() + ttl
+        return entry[0], entry[1]
+    
+    body = response['Body'].read()
+    with _cache_lock:
+        _cache_store(key, body, response.get('ETag'), ttl)
+    return body, response.get('ETag')
 
 def handle_organizations(event):
     """Handle organization endpoints"""
@@ -312,62 +1020,513 @@ def handle_organizations(event):
 
 def handle_courses(event):
     """Handle course endpoints"""
-    path_params = event.get('pathParameters', {})
+    path_params = event.get('pathParameters') or {}
+    params = event.get('queryStringParameters') or {}
+    # /courses/{courseId}; the root {proxy+} route only sends {"proxy": "courses/<id>"}
+    segments = [segment for segment in event.get('path', '').split('/')[2:] if segment]
+    course_id = path_params.get('courseId') or (segments[0] if segments else None)
     
-    if not path_params or not path_params.get('courseId'):
-        # List all courses
-        return list_courses()
-    else:
+    if course_id:
         # Get specific course
-        course_id = path_params['courseId']
         return get_course(course_id)
+    if 'ids' in params:
+        # Several specific courses in one round trip
+        return get_many(params, 'courses/{0}.json', 'courses', 'sourcedId', 'course', 'Course not found')
+    if any(name in params for name in LIST_PARAMS):
+        # Paged, filtered or projected listing
+        return query_collection('course', 'courses', params)
+    # Full listing from the catalog manifest
+    return list_courses()
+
+def handle_resources(event):
+    """Handle resource endpoints"""
+    path_params = event.get('pathParameters') or {}
+    segments = [segment for segment in event.get('path', '').split('/')[2:] if segment]
+    resource_id = path_params.get('resourceId') or (segments[0] if segments else None)
+    
+    if resource_id:
+        item = client('dynamodb').get_item(TableName=METADATA_TABLE, Key={'sourcedId': {'S': resource_id}}).get('Item')
+        if not item or from_dynamodb(item['type']) != 'resource':
+            return {
+                'statusCode': 404,
+                'body': json.dumps({'error': 'Resource not found'})
+            }
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'resource': from_dynamodb({'M': item})})
+        }
+    params = event.get('queryStringParameters') or {}
+    if 'ids' in params:
+        return get_resources(params)
+    return query_collection('resource', 'resources', params)
+
+def get_resources(params):
+    """Several resources in one BatchGetItem, each with its own status
+    
+    Syllabi converted with --dedupe-resources reference shared resources by
+    sourcedId and title only; clients resolve a whole syllabus's references
+    with one request here. Keys left unprocessed after every retry get 502.
+    """
+    ids = parse_ids(params)
+    if ids is None:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': f'ids must list 1 to {MAX_MULTI_GET_IDS} comma-separated IDs'})
+        }
+    dynamodb = client('dynamodb')
+    found = {}
+    pending = {METADATA_TABLE: {'Keys': [{'sourcedId': {'S': resource_id}} for resource_id in ids]}}
+    # Same capped, jittered backoff as progress writes
+    for attempt in range(BATCH_WRITE_ATTEMPTS):
+        if attempt:
+            time.sleep(random.uniform(0, min(BATCH_WRITE_MAX_DELAY, BATCH_WRITE_BASE_DELAY * 2 ** attempt)))
+        response = dynamodb.batch_get_item(RequestItems=pending)
+        for item in response.get('Responses', {}).get(METADATA_TABLE, []):
+            found[item['sourcedId']['S']] = item
+        pending = response.get('UnprocessedKeys') or {}
+        if not pending.get(METADATA_TABLE):
+            break
+    unprocessed = {key['sourcedId']['S'] for key in (pending.get(METADATA_TABLE) or {}).get('Keys', [])}
+    
+    resources = []
+    for resource_id in ids:
+        item = found.get(resource_id)
+        if item is not None and from_dynamodb(item['type']) == 'resource':
+            resources.append({'sourcedId': resource_id, 'status': 200, 'resource': from_dynamodb({'M': item})})
+        elif resource_id in unprocessed:
+            resources.append({'sourcedId': resource_id, 'status': 502, 'error': 'Metadata store unavailable'})
+        else:
+            resources.append({'sourcedId': resource_id, 'status': 404, 'error': 'Resource not found'})
+    response = {
+        'statusCode': 200,
+        'body': json.dumps({'resources': resources})
+    }
+    if unprocessed:
+        response['headers'] = {'Cache-Control': 'no-store'}
+    return response
+
+def from_dynamodb(value):
+    """Plain Python value from a DynamoDB attribute value"""
+    kind, data = next(iter(value.items()))
+    if kind == 'M':
+        return {key: from_dynamodb(item) for key, item in data.items()}
+    if kind == 'L':
+        return [from_dynamodb(item) for item in data]
+    if kind == 'N':
+        return int(data) if data.lstrip('-').isdigit() else float(data)
+    if kind in ('SS', 'NS'):
+        return sorted(data)
+    if kind == 'NULL':
+        return None
+    return data
+
+def bad_request(message):
+    return {
+        'statusCode': 400,
+        'body': json.dumps({'error': message})
+    }
+
+def parse_filter(expression, request):
+    """Add a OneRoster filter (clauses joined by AND or OR) to a Query request"""
+    names = request['ExpressionAttributeNames']
+    values = request['ExpressionAttributeValues']
+    joiner = ' OR ' if ' OR ' in expression else ' AND '
+    if joiner == ' OR ' and ' AND ' in expression:
+        raise ValueError('Mixing AND and OR in one filter is not supported')
+    
+    conditions = []
+    for index, clause in enumerate(expression.split(joiner)):
+        match = re.fullmatch("([A-Za-z]+)(>=|<=|!=|=|>|<|~)'(.*)'", clause.strip())
+        if not match:
+            raise ValueError(f'Invalid filter clause: {clause.strip()}')
+        field, operator, value = match.groups()
+        names[f'#f{index}'] = field
+        values[f':f{index}'] = {'S': value}
+        if field in LIST_FIELDS and operator == '=':
+            operator = '~'
+        conditions.append(FILTER_OPERATORS[operator].format(f'#f{index}', f':f{index}'))
+    request['FilterExpression'] = joiner.join(conditions)
+
+def encode_token(sort, key):
+    return base64.urlsafe_b64encode(json.dumps({'sort': sort, 'key': key}).encode('utf-8')).decode('ascii')
+
+def decode_token(token, sort, key_attributes):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except ValueError:
+        raise ValueError('Invalid continuation token')
+    if data.get('sort') != sort or set(data.get('key') or {}) != set(key_attributes):
+        raise ValueError('Continuation token does not match this query')
+    return data['key']
+
+def query_collection(item_type, collection, params):
+    """OneRoster limit/offset/filter/sort/orderBy/fields over one item type
+    
+    Always a DynamoDB Query on a type index, never a Scan. Each call reads
+    at most MAX_QUERY_PAGES pages; the response's 'next' token continues
+    exactly where it stopped (also when a filter left the page short).
+    """
+    try:
+        limit = int(params.get('limit', 100))
+        offset = int(params.get('offset', 0))
+    except ValueError:
+        return bad_request('limit and offset must be integers')
+    if not 1 <= limit <= MAX_LIMIT or not 0 <= offset <= MAX_OFFSET:
+        return bad_request(f'limit must be 1-{MAX_LIMIT} and offset 0-{MAX_OFFSET}; use next to page further')
+    sort = params.get('sort') or None
+    if sort not in SORT_INDEXES:
+        return bad_request(f'Unsupported sort field: {sort}')
+    index_name, key_attributes = SORT_INDEXES[sort]
+    
+    request = {
+        'TableName': METADATA_TABLE,
+        'IndexName': index_name,
+        'KeyConditionExpression': '#type = :type',
+        'ExpressionAttributeNames': {'#type': 'type'},
+        'ExpressionAttributeValues': {':type': {'S': item_type}},
+        'ScanIndexForward': params.get('orderBy', 'asc') != 'desc'
+    }
+    fields = [field.strip() for field in params.get('fields', '').split(',') if field.strip()]
+    try:
+        if params.get('filter'):
+            parse_filter(params['filter'], request)
+        if params.get('next'):
+            request['ExclusiveStartKey'] = decode_token(params['next'], sort, key_attributes)
+    except ValueError as e:
+        return bad_request(str(e))
+    if fields:
+        if not all(re.fullmatch('[A-Za-z]+', field) for field in fields):
+            return bad_request('Invalid fields list')
+        # Key attributes are always read so the continuation token can be built
+        projected = list(dict.fromkeys(fields + list(key_attributes)))
+        for index, field in enumerate(projected):
+            request['ExpressionAttributeNames'][f'#p{index}'] = field
+        request['ProjectionExpression'] = ', '.join(f'#p{index}' for index in range(len(projected)))
+    
+    dynamodb = client('dynamodb')
+    items = []
+    next_key = None
+    skip = offset
+    for _ in range(MAX_QUERY_PAGES):
+        # Limit caps items evaluated per page, before the filter applies, so
+        # filtered queries read wider pages to fill a response in fewer calls
+        wanted = skip + limit - len(items)
+        request['Limit'] = min(MAX_LIMIT, max(wanted, FILTER_PAGE_SIZE) if 'FilterExpression' in request else wanted)
+        response = dynamodb.query(**request)
+        page = response.get('Items', [])
+        skipped = min(skip, len(page))
+        page = page[skipped:]
+        skip -= skipped
+        room = limit - len(items)
+        items.extend(page[:room])
+        if len(page) > room:
+            next_key = {attribute: items[-1][attribute] for attribute in key_attributes}
+            break
+        next_key = response.get('LastEvaluatedKey')
+        if not next_key or len(items) == limit:
+            break
+        request['ExclusiveStartKey'] = next_key
+    
+    results = []
+    for item in items:
+        record = from_dynamodb({'M': item})
+        results.append({field: record[field] for field in fields if field in record} if fields else record)
+    body = {collection: results}
+    if next_key:
+        body['next'] = encode_token(sort, next_key)
+    return {
+        'statusCode': 200,
+        'body': json.dumps(body)
+    }
 
 def handle_syllabus(event):
     """Handle syllabus endpoints"""
-    path_params = event.get('pathParameters', {})
-    course_id = path_params.get('courseId')
+    path_params = event.get('pathParameters') or {}
+    # /powerpath/syllabus/{courseId}[/index | /components/{componentId}]
+    segments = [segment for segment in event.get('path', '').split('/')[3:] if segment]
+    course_id = path_params.get('courseId') or (segments[0] if segments else None)
+    params = event.get('queryStringParameters') or {}
     
+    if not course_id and 'ids' in params:
+        return get_many(params, 'syllabi/{0}.json', 'syllabi', 'courseId', 'syllabus', 'Syllabus not found')
     if not course_id:
         return {
             'statusCode': 400,
             'body': json.dumps({'error': 'Course ID required'})
         }
     
+    if segments[1:] == ['index']:
+        return get_syllabus_shard(f'syllabi/{course_id}/index.json', 'Syllabus index not found')
+    if len(segments) == 3 and segments[1] == 'components':
+        return get_syllabus_component(course_id, segments[2])
+    
     return get_syllabus(course_id)
 
-def list_courses():
-    """List all available courses"""
-    # In a full implementation, this would query DynamoDB
-    # For now, return hardcoded Khan Academy converted courses
+def tokenize(text):
+    """Same tokenizer the converter used to build the search index"""
+    return ''.join(char if char.isalnum() else ' ' for char in text.lower()).split()
+
+def read_json_object(key, default=None):
+    try:
+        return json.loads(fetch_object(key))
+    except NotFound:
+        return default
+
+def handle_search(event):
+    """Rank courses, components and resources from the precomputed search index"""
+    params = event.get('queryStringParameters') or {}
+    terms = list(dict.fromkeys(tokenize(params.get('q', ''))))[:10]
+    if not terms:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': 'Query parameter q required'})
+        }
+    try:
+        limit = max(1, min(int(params.get('limit', 20)), 100))
+    except ValueError:
+        limit = 20
+    
+    index = read_json_object('search_index/index.json')
+    if index is None:
+        return {
+            'statusCode': 503,
+            'body': json.dumps({'error': 'Search index not available'})
+        }
+    
+    # One bucket read per distinct bucket, one shard read per hit shard
+    buckets = {}
+    for term in terms:
+        buckets.setdefault(zlib.crc32(term.encode('utf-8')) % index['buckets'], []).append(term)
+    scores = {}
+    for bucket, bucket_terms in buckets.items():
+        postings = read_json_object(f'search_index/terms/{bucket}.json', {})
+        for term in bucket_terms:
+            for doc, score in postings.get(term, []):
+                scores[doc] = scores.get(doc, 0) + score
+    
+    hits = sorted(scores.items(), key=lambda hit: (-hit[1], hit[0]))[:limit]
+    shards = {}
+    results = []
+    for doc, score in hits:
+        shard = doc // index['docsPerShard']
+        if shard not in shards:
+            shards[shard] = read_json_object(f'search_index/docs/{shard}.json', [])
+        result = dict(shards[shard][doc % index['docsPerShard']])
+        result['score'] = round(score, 4)
+        results.append(result)
+    
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'courses': [{
-                'sourcedId': 'pre-algebra-converted',
-                'title': 'Pre-algebra (Khan Academy)',
-                'courseCode': 'KHAN_PRE-ALGEBRA',
-                'grades': ['6-8'],
-                'subjects': ['mathematics'],
-                'status': 'active'
-            }]
-        })
+        'body': json.dumps({'query': params.get('q', ''), 'total': len(scores), 'results': results})
     }
 
+def handle_progress(event):
+    """Accept a batch of learner progress events (POST /progress/batch)"""
+    if event.get('path', '').rstrip('/') != '/progress/batch':
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'error': 'Not found'})
+        }
+    if event.get('httpMethod') != 'POST':
+        return {
+            'statusCode': 405,
+            'headers': {'Allow': 'POST'},
+            'body': json.dumps({'error': 'Use POST'})
+        }
+    if not PROGRESS_TABLE:
+        return {
+            'statusCode': 503,
+            'body': json.dumps({'error': 'Progress storage not configured'})
+        }
+    
+    body = event.get('body') or ''
+    try:
+        if event.get('isBase64Encoded'):
+            body = base64.b64decode(body)
+        payload = json.loads(body)
+    except ValueError:
+        return bad_request('Body must be JSON')
+    events = payload.get('events') if isinstance(payload, dict) else payload
+    if not isinstance(events, list) or not events:
+        return bad_request('Body must be a non-empty list of events or {"events": [...]}')
+    if len(events) > MAX_PROGRESS_EVENTS:
+        return bad_request(f'At most {MAX_PROGRESS_EVENTS} events per batch')
+    
+    accepted, rejected = validate_progress_events(events)
+    items = coalesce_progress(accepted)
+    unprocessed = batch_write(PROGRESS_TABLE, items)
+    result = {'accepted': len(accepted), 'rejected': rejected, 'written': len(items) - len(unprocessed)}
+    if unprocessed:
+        # Item keys are derived from the events, so resubmitting the batch is safe
+        result['unprocessed'] = len(unprocessed)
+        return {
+            'statusCode': 503,
+            'headers': {'Retry-After': '1'},
+            'body': json.dumps(result)
+        }
+    return {
+        'statusCode': 200,
+        'body': json.dumps(result)
+    }
+
+def _progress_number(event, field, required, integer=False):
+    value = event.get(field)
+    if value is None:
+        if required:
+            raise ValueError(f'{field} is required')
+        return None
+    # json.loads accepts NaN and Infinity, which DynamoDB rejects as N values
+    if (isinstance(value, bool) or not isinstance(value, int if integer else (int, float))
+            or not math.isfinite(value) or value < 0):
+        raise ValueError(f'{field} must be a non-negative {"integer" if integer else "number"}')
+    return value
+
+def validate_progress_events(events):
+    """Split events into normalized accepted events and [{index, error}] rejections, in one pass
+    
+    Fields follow the app's UserLessonRecord: userId, lessonId, completedDate
+    (ISO 8601), timeSpent (seconds), score/totalPossible, xpEarned, and
+    optionally courseId and a client event id.
+    """
+    accepted = []
+    rejected = []
+    for index, event in enumerate(events):
+        try:
+            if not isinstance(event, dict):
+                raise ValueError('event must be an object')
+            normalized = {}
+            for field in ('userId', 'lessonId'):
+                value = event.get(field)
+                if not isinstance(value, str) or not value or len(value) > 256:
+                    raise ValueError(f'{field} must be a non-empty string')
+                normalized[field] = value
+            for field in ('id', 'courseId'):
+                if event.get(field) is not None:
+                    if not isinstance(event[field], str) or len(event[field]) > 256:
+                        raise ValueError(f'{field} must be a string')
+                    normalized[field] = event[field]
+            try:
+                completed = datetime.fromisoformat(event['completedDate'].replace('Z', '+00:00'))
+            except (KeyError, AttributeError, ValueError):
+                raise ValueError('completedDate must be an ISO 8601 timestamp')
+            if completed.tzinfo is None:
+                completed = completed.replace(tzinfo=timezone.utc)
+            normalized['completedDate'] = completed.astimezone(timezone.utc).isoformat()
+            normalized['timeSpent'] = _progress_number(event, 'timeSpent', True)
+            normalized['score'] = _progress_number(event, 'score', True, integer=True)
+            normalized['totalPossible'] = _progress_number(event, 'totalPossible', False, integer=True)
+            normalized['xpEarned'] = _progress_number(event, 'xpEarned', False, integer=True) or 0
+            if normalized['totalPossible'] is not None and normalized['score'] > normalized['totalPossible']:
+                raise ValueError('score exceeds totalPossible')
+        except ValueError as e:
+            rejected.append({'index': index, 'error': str(e)})
+            continue
+        accepted.append(normalized)
+    return accepted, rejected
+
+def coalesce_progress(events):
+    """One DynamoDB item per learner and lesson within this batch
+    
+    Attempts are counted, time and XP summed, and the latest attempt's score
+    kept alongside the best. Coalescing is per batch only: the sort key is
+    lessonId#latestDate#fingerprint of the batch's events, so a retried batch
+    overwrites its own items while later batches for the same lesson add
+    items of their own. Readers total a lesson across its items.
+    """
+    groups = {}
+    for event in events:
+        groups.setdefault((event['userId'], event['lessonId']), []).append(event)
+    
+    items = []
+    for (user_id, lesson_id), attempts in groups.items():
+        attempts.sort(key=lambda attempt: attempt['completedDate'])
+        latest = attempts[-1]
+        fingerprint = hashlib.sha256(json.dumps(attempts, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        ratios = [attempt['score'] / attempt['totalPossible'] for attempt in attempts if attempt['totalPossible']]
+        item = {
+            'userId': {'S': user_id},
+            'progressKey': {'S': f"{lesson_id}#{latest['completedDate']}#{fingerprint}"},
+            'lessonId': {'S': lesson_id},
+            'attempts': {'N': str(len(attempts))},
+            'score': {'N': str(latest['score'])},
+            'timeSpent': {'N': repr(float(sum(attempt['timeSpent'] for attempt in attempts)))},
+            'xpEarned': {'N': str(sum(attempt['xpEarned'] for attempt in attempts))},
+            'firstCompletedDate': {'S': attempts[0]['completedDate']},
+            'lastCompletedDate': {'S': latest['completedDate']},
+            'receivedAt': {'S': datetime.now(timezone.utc).isoformat()}
+        }
+        if latest['totalPossible'] is not None:
+            item['totalPossible'] = {'N': str(latest['totalPossible'])}
+        if ratios:
+            item['bestScorePercentage'] = {'N': repr(round(max(ratios), 4))}
+        course_id = next((attempt['courseId'] for attempt in reversed(attempts) if 'courseId' in attempt), None)
+        if course_id:
+            item['courseId'] = {'S': course_id}
+        event_ids = sorted({attempt['id'] for attempt in attempts if 'id' in attempt})
+        if event_ids:
+            item['eventIds'] = {'SS': event_ids}
+        items.append(item)
+    return items
+
+def _write_chunk(table, requests):
+    """BatchWriteItem with UnprocessedItems and throttling retried under capped, jittered backoff"""
+    dynamodb = client('dynamodb')
+    pending = requests
+    for attempt in range(BATCH_WRITE_ATTEMPTS):
+        if attempt:
+            time.sleep(random.uniform(0, min(BATCH_WRITE_MAX_DELAY, BATCH_WRITE_BASE_DELAY * 2 ** attempt)))
+        try:
+            response = dynamodb.batch_write_item(RequestItems={table: pending})
+        except Exception as e:
+            error = getattr(e, 'response', None) or {}
+            status = error.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+            if error.get('Error', {}).get('Code') not in BATCH_WRITE_RETRYABLE and status < 500:
+                raise
+            continue
+        pending = (response.get('UnprocessedItems') or {}).get(table, [])
+        if not pending:
+            return []
+    return pending
+
+def batch_write(table, items):
+    """Put items in chunks of 25, chunks in parallel; returns the requests still unprocessed"""
+    chunks = [[{'PutRequest': {'Item': item}} for item in items[start:start + BATCH_WRITE_SIZE]]
+              for start in range(0, len(items), BATCH_WRITE_SIZE)]
+    if len(chunks) <= 1:
+        return _write_chunk(table, chunks[0]) if chunks else []
+    # Imported on first use, like boto3, to keep it off the cold-start path
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(PROGRESS_WRITERS, len(chunks))) as executor:
+        return [request for leftover in executor.map(lambda chunk: _write_chunk(table, chunk), chunks)
+                for request in leftover]
+
+def list_courses():
+    """List all available courses from the catalog manifest written by the converter"""
+    try:
+        # One read regardless of catalog size; the stored body already has a 'courses' list
+        body, etag = fetch_tagged('catalog.json')
+        return {
+            'statusCode': 200,
+            'headers': {'ETag': etag},
+            'body': lambda: body.decode('utf-8')
+        }
+    except NotFound:
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'version': 0, 'courseCount': 0, 'courses': []})
+        }
+
 def get_course(course_id):
     """Get specific course details"""
     try:
-        # Try to load course from S3
-        response = s3.get_object(
-            Bucket=CONTENT_BUCKET,
-            Key=f'courses/{course_id}.json'
-        )
-        course_data = json.loads(response['Body'].read())
-        
+        # Stored bodies are already the JSON we serve; pass them through undecoded
+        body, etag = fetch_tagged(f'courses/{course_id}.json')
         return {
             'statusCode': 200,
-            'body': json.dumps(course_data)
+            'headers': {'ETag': etag},
+            'body': lambda: body.decode('utf-8')
         }
-    except s3.exceptions.NoSuchKey:
+    except NotFound:
         return {
             'statusCode': 404,
             'body': json.dumps({'error': 'Course not found'})
@@ -376,28 +1535,165 @@ def get_course(course_id):
 def get_syllabus(course_id):
     """Get course syllabus"""
     try:
-        # Try to load syllabus from S3
-        response = s3.get_object(
-            Bucket=CONTENT_BUCKET,
-            Key=f'syllabi/{course_id}.json'
-        )
-        syllabus_data = json.loads(response['Body'].read())
-        
+        body, etag = fetch_tagged(f'syllabi/{course_id}.json')
         return {
             'statusCode': 200,
-            'body': json.dumps({'syllabus': syllabus_data})
+            'headers': {'ETag': etag},
+            'body': lambda: b''.join([b'{"syllabus": ', body, b'}']).decode('utf-8')
         }
-    except s3.exceptions.NoSuchKey:
+    except NotFound:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'error': 'Syllabus not found'})
+        }
+
+def parse_ids(params):
+    """Distinct IDs of a comma-separated ids parameter in request order, or None if unusable"""
+    ids = list(dict.fromkeys(part.strip() for part in params.get('ids', '').split(',') if part.strip()))
+    if not ids or len(ids) > MAX_MULTI_GET_IDS or any('/' in item_id for item_id in ids):
+        return None
+    return ids
+
+def _fetch_item(key):
+    """(status, body) of one multi-get object"""
+    try:
+        return 200, fetch_object(key)
+    except NotFound:
+        return 404, None
+    except Exception:
+        return 502, None
+
+def get_many(params, key_format, collection, id_field, item_field, not_found):
+    """Several stored objects in one response, each with its own status
+    
+    Objects are fetched concurrently, so the request costs roughly one S3
+    read instead of one API round trip per object. Bodies are spliced in
+    undecoded, as get_course serves them.
+    """
+    ids = parse_ids(params)
+    if ids is None:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({'error': f'ids must list 1 to {MAX_MULTI_GET_IDS} comma-separated IDs'})
+        }
+    keys = [key_format.format(item_id) for item_id in ids]
+    
+    # Read the manifest once up front rather than once per worker on a cold container
+    try:
+        resolve_key(keys[0])
+    except NotFound:
+        pass
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(MULTI_GET_WORKERS, len(keys))) as executor:
+        results = list(executor.map(_fetch_item, keys))
+    
+    items = []
+    for item_id, (status, body) in zip(ids, results):
+        if status == 200:
+            head = json.dumps({id_field: item_id, 'status': status})[:-1]
+            items.append(b''.join([head.encode('utf-8'), b', "', item_field.encode('utf-8'), b'": ', body, b'}']))
+        else:
+            error = not_found if status == 404 else 'Content store unavailable'
+            items.append(json.dumps({id_field: item_id, 'status': status, 'error': error}).encode('utf-8'))
+    
+    response = {
+        'statusCode': 200,
+        'body': b''.join([b'{"', collection.encode('utf-8'), b'": [', b', '.join(items), b']}']).decode('utf-8')
+    }
+    if any(status == 502 for status, _ in results):
+        # Don't let caches keep a transient failure alongside the items that succeeded
+        response['headers'] = {'Cache-Control': 'no-store'}
+    return response
+
+def get_syllabus_component(course_id, component_id):
+    """One syllabus component, read by byte range using the converter's offsets index
+    
+    Falls back to the sharded layout when the course has no offsets index.
+    """
+    try:
+        offsets = json.loads(fetch_object(f'syllabi/{course_id}.offsets.json'))
+    except NotFound:
+        return get_syllabus_shard(f'syllabi/{course_id}/components/{component_id}.json', 'Component not found')
+    
+    span = offsets['components'].get(component_id)
+    if span is None:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'error': 'Component not found'})
+        }
+    
+    try:
+        key = resolve_key(f'syllabi/{course_id}.json')[0]
+    except NotFound:
         return {
             'statusCode': 404,
             'body': json.dumps({'error': 'Syllabus not found'})
         }
+    entry = _cache_get(key)
+    if entry is not None and time.monotonic() < entry[2] and len(entry[0]) == offsets['bytes']:
+        body = entry[0][span[0]:span[1] + 1]
+    else:
+        s3 = client('s3')
+        try:
+            response = s3.get_object(Bucket=CONTENT_BUCKET, Key=key, Range=f'bytes={span[0]}-{span[1]}')
+        except s3.exceptions.NoSuchKey:
+            return {
+                'statusCode': 404,
+                'body': json.dumps({'error': 'Syllabus not found'})
+            }
+        # The total size guards against an offsets index from a different upload
+        if response.get('ContentRange', '').rpartition('/')[2] != str(offsets['bytes']):
+            return {
+                'statusCode': 503,
+                'body': json.dumps({'error': 'Syllabus offsets index is out of date'})
+            }
+        body = response['Body'].read()
+    
+    return {
+        'statusCode': 200,
+        'body': body.decode('utf-8')
+    }
+
+def get_syllabus_shard(key, not_found):
+    """Return a sharded syllabus object as stored, without re-encoding it"""
+    try:
+        body, etag = fetch_tagged(key)
+        return {
+            'statusCode': 200,
+            'headers': {'ETag': etag},
+            'body': lambda: body.decode('utf-8')
+        }
+    except NotFound:
+        return {
+            'statusCode': 404,
+            'body': json.dumps({'error': not_found})
+        }
 '''
     
     def create_deployment_script(self, output_dir: str) -> str:
         """Create deployment script for the infrastructure"""
         
         script_path = os.path.join(output_dir, "deploy.sh")
+        # The uploader and loader sit next to this file, wherever --output-dir puts the script
+        tools_dir = os.path.dirname(os.path.abspath(__file__))
+        
+        # API Gateway's direct S3 reads need courses and syllabi at their logical keys too
+        mirror_flag = " --mirror-logical-keys" if self.direct_s3_reads else ""
+        artifact_steps = f'''
+# Publish the Lambda deployment package (content-hashed key: unchanged code is not re-uploaded)
+ARTIFACT_KEY="{self.artifact_key()}"
+ACCOUNT_ID=$(aws sts get-caller-identity --query Account --output text)
+ARTIFACT_BUCKET="$STACK_NAME-artifacts-$ACCOUNT_ID-$REGION"
+if ! aws s3api head-bucket --bucket "$ARTIFACT_BUCKET" 2>/dev/null; then
+    echo "🪣 Creating artifact bucket $ARTIFACT_BUCKET..."
+    aws s3 mb "s3://$ARTIFACT_BUCKET" --region $REGION
+fi
+if ! aws s3api head-object --bucket "$ARTIFACT_BUCKET" --key "$ARTIFACT_KEY" >/dev/null 2>&1; then
+    echo "📤 Uploading Lambda package $ARTIFACT_KEY..."
+    aws s3 cp "$SCRIPT_DIR/$ARTIFACT_KEY" "s3://$ARTIFACT_BUCKET/$ARTIFACT_KEY" --region $REGION
+fi
+PARAMETER_OVERRIDES="ArtifactBucket=$ARTIFACT_BUCKET ArtifactKey=$ARTIFACT_KEY $PARAMETER_OVERRIDES"
+'''
         
         script_content = f'''#!/bin/bash
 
@@ -409,9 +1705,15 @@ STACK_NAME="{self.stack_name}"
 REGION="{self.region}"
 TEMPLATE_FILE="cloudformation.yaml"
 CONTENT_DIR="converted_content"
+SCRIPT_DIR=$(cd "$(dirname "$0")" && pwd)
+# Directory holding content_uploader.py and metadata_loader.py
+TOOLS_DIR="${{TOOLS_DIR:-{tools_dir}}}"
 
-echo "🚀 Deploying TimeBack Khan Academy Content Infrastructure..."
+# Extra template parameters, e.g. PARAMETER_OVERRIDES="MemorySize=1024 SchoolHoursConcurrency=5"
+PARAMETER_OVERRIDES="${{PARAMETER_OVERRIDES:-}}"
 
+echo "🚀 Deploying TimeBack Khan Academy Content Infrastructure..."
+{artifact_steps}
 # Deploy CloudFormation stack
 echo "📦 Deploying CloudFormation stack..."
 aws cloudformation deploy \\
@@ -419,7 +1721,7 @@ aws cloudformation deploy \\
     --stack-name $STACK_NAME \\
     --capabilities CAPABILITY_IAM \\
     --region $REGION \\
-    --parameter-overrides Environment=dev
+    --parameter-overrides Environment=dev $PARAMETER_OVERRIDES
 
 # Get stack outputs
 echo "📋 Getting stack outputs..."
@@ -441,6 +1743,12 @@ CDN_ENDPOINT=$(aws cloudformation describe-stacks \\
     --query 'Stacks[0].Outputs[?OutputKey==`CDNEndpoint`].OutputValue' \\
     --output text)
 
+METADATA_TABLE=$(aws cloudformation describe-stacks \\
+    --stack-name $STACK_NAME \\
+    --region $REGION \\
+    --query 'Stacks[0].Outputs[?OutputKey==`MetadataTableName`].OutputValue' \\
+    --output text)
+
 echo "✅ Infrastructure deployed successfully!"
 echo "📦 S3 Bucket: $BUCKET_NAME"
 echo "🌐 API Endpoint: $API_ENDPOINT"
@@ -450,25 +1758,14 @@ echo "🚀 CDN Endpoint: $CDN_ENDPOINT"
 if [ -d "$CONTENT_DIR" ]; then
     echo "📤 Uploading converted content..."
     
-    # Upload course files
-    for file in $CONTENT_DIR/course_*.json; do
-        if [ -f "$file" ]; then
-            filename=$(basename "$file")
-            course_id=$(echo "$filename" | sed 's/course_\\(.*\\)\\.json/\\1/')
-            aws s3 cp "$file" "s3://$BUCKET_NAME/courses/$course_id.json" --region $REGION
-            echo "✅ Uploaded course: $course_id"
-        fi
-    done
-    
-    # Upload syllabus files
-    for file in $CONTENT_DIR/syllabus_*.json; do
-        if [ -f "$file" ]; then
-            filename=$(basename "$file")
-            course_id=$(echo "$filename" | sed 's/syllabus_\\(.*\\)\\.json/\\1/')
-            aws s3 cp "$file" "s3://$BUCKET_NAME/syllabi/$course_id.json" --region $REGION
-            echo "✅ Uploaded syllabus: $course_id"
-        fi
-    done
+    # Parallel, content-addressed upload: objects already stored are skipped and
+    # content-manifest.json is flipped once everything is in (requires boto3)
+    python3 "$TOOLS_DIR/content_uploader.py" "$CONTENT_DIR" \\
+        --bucket "$BUCKET_NAME" --region $REGION{mirror_flag}
+    
+    # Bulk-load course/component/resource metadata (BatchWriteItem, resumable)
+    python3 "$TOOLS_DIR/metadata_loader.py" "$CONTENT_DIR" \\
+        --table "$METADATA_TABLE" --region $REGION
     
     echo "📤 Content upload complete!"
 else
@@ -506,6 +1803,7 @@ echo ""
         # Generate CloudFormation template
         template = self.create_cloudformation_template()
         cf_template_path = os.path.join(output_dir, "cloudformation.yaml")
+        package_path = self.build_lambda_package(output_dir)
         
         with open(cf_template_path, 'w') as f:
             yaml.dump(template, f, default_flow_style=False, sort_keys=False)
@@ -519,11 +1817,29 @@ echo ""
             "region": self.region,
             "api_name": self.api_name,
             "created_at": datetime.now().isoformat(),
+            "lambda": {
+                "artifactKey": self.artifact_key(),
+                "runtime": self.runtime,
+                "memorySize": self.memory_size,
+                "architecture": self.architecture,
+                "provisionedConcurrency": self.provisioned_concurrency,
+                "schoolHoursConcurrency": self.school_hours_concurrency,
+                "snapStart": self.snap_start,
+                "directS3Reads": self.direct_s3_reads
+            },
             "endpoints": {
                 "health": "/health",
                 "courses": "/courses",
+                "coursesMultiGet": "/courses?ids={courseId},{courseId}",
+                "resources": "/resources",
+                "resourcesMultiGet": "/resources?ids={resourceId},{resourceId}",
                 "syllabus": "/powerpath/syllabus/{courseId}",
-                "organizations": "/orgs"
+                "syllabusIndex": "/powerpath/syllabus/{courseId}/index",
+                "syllabusComponent": "/powerpath/syllabus/{courseId}/components/{componentId}",
+                "syllabiMultiGet": "/powerpath/syllabus?ids={courseId},{courseId}",
+                "organizations": "/orgs",
+                "progressBatch": "POST /progress/batch",
+                "search": "/search?q={query}"
             }
         }
         
@@ -542,6 +1858,7 @@ This directory contains AWS infrastructure files for hosting converted Khan Acad
 - `cloudformation.yaml`: CloudFormation template for AWS infrastructure
 - `deploy.sh`: Deployment script to set up everything
 - `config.json`: Configuration settings
+- `lambda/`: Lambda deployment package (`index.py` plus precompiled bytecode), uploaded by `deploy.sh`
 
 ## Quick Start
 
@@ -562,17 +1879,53 @@ This directory contains AWS infrastructure files for hosting converted Khan Acad
    # List courses
    curl https://your-api-endpoint/courses
    
+   # Page, filter, sort and project (DynamoDB-backed; follow "next" for more)
+   curl "https://your-api-endpoint/courses?limit=50&sort=title&filter=grades%3D'6-8'&fields=sourcedId,title"
+   
+   # Several courses or syllabi in one request (up to 100 IDs, per-item status)
+   curl "https://your-api-endpoint/courses?ids=COURSE_ID,COURSE_ID_2"
+   curl "https://your-api-endpoint/powerpath/syllabus?ids=COURSE_ID,COURSE_ID_2"
+   
+   # Resolve the shared-resource references of a --dedupe-resources syllabus
+   curl "https://your-api-endpoint/resources?ids=RESOURCE_ID,RESOURCE_ID_2"
+   
    # Get syllabus
    curl https://your-api-endpoint/powerpath/syllabus/COURSE_ID
+   
+   # Lazy loading (content converted with --shard-syllabus)
+   curl https://your-api-endpoint/powerpath/syllabus/COURSE_ID/index
+   curl https://your-api-endpoint/powerpath/syllabus/COURSE_ID/components/COMPONENT_ID
+   
+   # Search (content converted with --search-index)
+   curl "https://your-api-endpoint/search?q=linear+equations"
+   
+   # Submit learner progress (validated, coalesced per learner and lesson within a batch, batch-written)
+   curl -X POST https://your-api-endpoint/progress/batch -H "Content-Type: application/json" \\
+     -d '{{"events": [{{"userId": "u1", "lessonId": "RESOURCE_ID", "completedDate": "2025-01-15T10:00:00Z", "timeSpent": 300, "score": 8, "totalPossible": 10, "xpEarned": 40}}]}}'
    ```
 
 ## Architecture
 
 - **S3**: Content storage with public read access
-- **API Gateway + Lambda**: TimeBack-compatible REST API
+- **API Gateway + Lambda**: TimeBack-compatible REST API (with `--direct-s3-reads`, course and syllabus GETs are API Gateway S3 integrations and skip the Lambda)
 - **DynamoDB**: Content metadata storage
 - **CloudFront**: CDN for fast content delivery
 
+## Lambda Capacity
+
+Tune the function at deploy time through template parameters:
+
+```bash
+PARAMETER_OVERRIDES="MemorySize=1024 Architecture=arm64 ProvisionedConcurrency=1 SchoolHoursConcurrency=10" ./deploy.sh
+```
+
+- `MemorySize` / `Architecture`: memory (and proportional CPU) and instruction set
+- `ProvisionedConcurrency`: always-warm environments on the `live` alias
+- `SchoolHoursConcurrency`, `SchoolHoursStart`, `SchoolHoursEnd`, `ScheduleTimezone`: scheduled extra warm capacity on weekdays
+- `SnapStart`: snapshot-restored cold starts (Python 3.12+ runtimes; not combined with provisioned concurrency)
+
+Published versions are snapshots. Defaults baked in when the files are generated (`--memory-size`, `--architecture`, ...) publish a new version. Deploy-time overrides of `MemorySize`, `Architecture` or `SnapStart` only reach `$LATEST` until the files are regenerated.
+
 ## Cost Estimate
 
 - S3: ~$0.02/GB/month
@@ -587,6 +1940,8 @@ Total estimated cost: **< $10/month** for moderate usage.
 
 To update content, run the converter again and re-run `./deploy.sh`.
 
+Each file is stored once under a content-addressed key (`objects/<md5>.json`), and these objects never change. `content-manifest.json` maps logical keys such as `courses/COURSE_ID.json` to those objects. The manifest is replaced in a single write after every new object is uploaded, so readers switch to the new content all at once. CloudFront caches objects for a year and the manifest for a minute, so no invalidation is needed. Earlier manifest versions are kept under `manifests/` for rollback.
+
 ## Integration with iOS App
 
 Update your iOS app's API base URL to use the deployed endpoint:
@@ -599,12 +1954,199 @@ private let baseURL = "https://your-api-endpoint"
         with open(readme_path, 'w') as f:
             f.write(readme_content)
         
-        return {
+        files = {
             "cloudformation_template": cf_template_path,
             "deployment_script": deploy_script_path,
             "config_file": config_path,
-            "readme_file": readme_path
+            "readme_file": readme_path,
+            "lambda_package": package_path
         }
+        return files
+
+def _template_references(value: Any, refs: List[str], conditions: List[str], get_atts: List[str]):
+    """Collect Ref, Fn::GetAtt, Fn::Sub and condition references anywhere in a template fragment"""
+    
+    if isinstance(value, list):
+        for item in value:
+            _template_references(item, refs, conditions, get_atts)
+        return
+    if not isinstance(value, dict):
+        return
+    for key, item in value.items():
+        if key == "Ref" and isinstance(item, str):
+            refs.append(item)
+        elif key == "Condition" and isinstance(item, str):
+            conditions.append(item)
+        elif key == "Fn::If" and isinstance(item, list) and item:
+            conditions.append(item[0])
+        elif key == "Fn::GetAtt":
+            get_atts.append(item[0] if isinstance(item, list) else item.split(".", 1)[0])
+        elif key == "Fn::Sub":
+            text, variables = (item[0], item[1]) if isinstance(item, list) else (item, {})
+            for name in re.findall(r"\$\{([^!}][^}]*)\}", text):
+                if name in variables:
+                    continue
+                if "." in name and not name.startswith("AWS::"):
+                    get_atts.append(name.split(".", 1)[0])
+                else:
+                    refs.append(name)
+        _template_references(item, refs, conditions, get_atts)
+
+def _check_parameter(name: str, definition: Dict[str, Any], value: Any) -> Optional[str]:
+    if definition.get("Type") == "Number":
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return f"Parameter {name}: {value!r} is not a number"
+        if "MinValue" in definition and number < definition["MinValue"]:
+            return f"Parameter {name}: {value} is below MinValue {definition['MinValue']}"
+        if "MaxValue" in definition and number > definition["MaxValue"]:
+            return f"Parameter {name}: {value} is above MaxValue {definition['MaxValue']}"
+    if "AllowedValues" in definition and value not in definition["AllowedValues"]:
+        return f"Parameter {name}: {value!r} is not one of {definition['AllowedValues']}"
+    return None
+
+def _validate_api(resources: Dict[str, Any]) -> List[str]:
+    """API Gateway rules CloudFormation itself only reports at deploy time"""
+    
+    errors = []
+    methods = [logical_id for logical_id, resource in resources.items() if resource.get("Type") == "AWS::ApiGateway::Method"]
+    
+    # One variable path part per parent: {courseId} and {proxy+} cannot be siblings
+    variables: Dict[str, List[str]] = {}
+    for logical_id, resource in resources.items():
+        if resource.get("Type") == "AWS::ApiGateway::Resource" and resource["Properties"]["PathPart"].startswith("{"):
+            parent = json.dumps(resource["Properties"]["ParentId"], sort_keys=True)
+            variables.setdefault(parent, []).append(logical_id)
+    for siblings in variables.values():
+        if len(siblings) > 1:
+            errors.append(f"Sibling API resources with variable path parts: {', '.join(sorted(siblings))}")
+    
+    for logical_id in methods:
+        properties = resources[logical_id]["Properties"]
+        integration = properties.get("Integration", {})
+        declared = properties.get("RequestParameters", {})
+        for target, source in integration.get("RequestParameters", {}).items():
+            if source.startswith("method.request.") and source not in declared:
+                errors.append(f"{logical_id}: integration maps undeclared {source}")
+        
+        uri = integration.get("Uri", "")
+        uri = uri.get("Fn::Sub", "") if isinstance(uri, dict) else uri
+        for name in re.findall(r"(?<!\$)\{(\w+)\}", uri):
+            if f"integration.request.path.{name}" not in integration.get("RequestParameters", {}):
+                errors.append(f"{logical_id}: integration URI placeholder {{{name}}} is not mapped")
+        
+        if integration.get("Type") == "AWS":
+            if "Credentials" not in integration:
+                errors.append(f"{logical_id}: AWS service integration has no Credentials role")
+            responses = {response["StatusCode"] for response in properties.get("MethodResponses", [])}
+            for response in integration.get("IntegrationResponses", []):
+                if response["StatusCode"] not in responses:
+                    errors.append(f"{logical_id}: integration response {response['StatusCode']} has no method response")
+    
+    for logical_id, resource in resources.items():
+        if resource.get("Type") == "AWS::ApiGateway::Deployment":
+            depends_on = set(resource.get("DependsOn", []))
+            missing = [method for method in methods if method not in depends_on]
+            if missing:
+                errors.append(f"{logical_id}: must depend on every method (missing {', '.join(sorted(missing))})")
+    return errors
+
+def validate_template(template: Dict[str, Any], parameters: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Offline consistency check of a generated template; returns a list of problems
+    
+    Checks every Ref, GetAtt, Sub variable, condition and DependsOn target,
+    parameter values (defaults overridden by parameters) against their
+    constraints, inline Lambda source size, SnapStart compatibility and the
+    API Gateway resource tree, method mappings and deployment.
+    """
+    
+    errors = []
+    declared_parameters = template.get("Parameters", {})
+    resources = template.get("Resources", {})
+    declared_conditions = template.get("Conditions", {})
+    if not resources:
+        errors.append("Template has no Resources")
+    
+    values = {name: definition.get("Default") for name, definition in declared_parameters.items()}
+    for name, value in (parameters or {}).items():
+        if name not in declared_parameters:
+            errors.append(f"Unknown parameter override: {name}")
+        values[name] = value
+    for name, definition in declared_parameters.items():
+        if values[name] is None:
+            # No default: must be supplied at deploy time (e.g. by deploy.sh)
+            continue
+        problem = _check_parameter(name, definition, values[name])
+        if problem:
+            errors.append(problem)
+    
+    refs, conditions, get_atts = [], [], []
+    _template_references([template.get("Conditions", {}), resources, template.get("Outputs", {})],
+                         refs, conditions, get_atts)
+    for name in sorted(set(refs)):
+        if name not in declared_parameters and name not in resources and name not in PSEUDO_PARAMETERS:
+            errors.append(f"Reference to undefined parameter or resource: {name}")
+    for name in sorted(set(get_atts)):
+        if name not in resources:
+            errors.append(f"Fn::GetAtt of undefined resource: {name}")
+    for name in sorted(set(conditions)):
+        if name not in declared_conditions:
+            errors.append(f"Undefined condition: {name}")
+    
+    for logical_id, resource in resources.items():
+        resource_type = resource.get("Type", "")
+        if not re.fullmatch(r"AWS::\w+::\w+", resource_type):
+            errors.append(f"{logical_id}: invalid resource type {resource_type!r}")
+        if resource.get("Condition") and resource["Condition"] not in declared_conditions:
+            errors.append(f"{logical_id}: undefined condition {resource['Condition']}")
+        depends_on = resource.get("DependsOn", [])
+        for target in [depends_on] if isinstance(depends_on, str) else depends_on:
+            if target not in resources:
+                errors.append(f"{logical_id}: DependsOn undefined resource {target}")
+        
+        properties = resource.get("Properties", {})
+        if resource_type == "AWS::Lambda::Function":
+            inline = properties.get("Code", {}).get("ZipFile")
+            if inline is not None:
+                source = inline.get("Fn::Sub", "") if isinstance(inline, dict) else inline
+                if len(source) > INLINE_CODE_LIMIT:
+                    errors.append(f"{logical_id}: inline ZipFile source is {len(source)} characters "
+                                  f"(limit {INLINE_CODE_LIMIT}); use artifact packaging")
+            runtime = properties.get("Runtime", "")
+            if values.get("SnapStart") == "Enabled":
+                if runtime.startswith("python") and _runtime_version(runtime) < (3, 12):
+                    errors.append(f"{logical_id}: SnapStart requires Python 3.12 or later, not {runtime}")
+                if any(float(values.get(name) or 0) for name in ("ProvisionedConcurrency", "SchoolHoursConcurrency")):
+                    errors.append(f"{logical_id}: SnapStart cannot be combined with provisioned concurrency")
+    
+    errors.extend(_validate_api(resources))
+    
+    if float(values.get("SchoolHoursConcurrency") or 0) and \
+            float(values.get("SchoolHoursConcurrency")) < float(values.get("ProvisionedConcurrency") or 0):
+        errors.append("SchoolHoursConcurrency must not be below ProvisionedConcurrency")
+    return errors
+
+def proxy_event(method: str, target: str, headers: Optional[Dict[str, str]] = None,
+                body: bytes = b"") -> Dict[str, Any]:
+    """API Gateway proxy event for an HTTP request, as the root {proxy+} route delivers it
+    
+    The only path parameter is the proxy path; handlers take IDs from the path.
+    """
+    
+    parts = urlsplit(target)
+    path = unquote(parts.path)
+    proxy = path.lstrip("/")
+    return {
+        "resource": "/{proxy+}" if proxy else "/",
+        "path": path,
+        "httpMethod": method,
+        "headers": headers or {},
+        "queryStringParameters": dict(parse_qsl(parts.query)) or None,
+        "pathParameters": {"proxy": proxy} if proxy else None,
+        "body": body.decode("utf-8") if body else None,
+        "isBase64Encoded": False
+    }
 
 def main():
     """Command line interface"""
@@ -613,11 +2155,38 @@ def main():
     parser.add_argument("--region", default="us-east-1", help="AWS region")
     parser.add_argument("--stack-name", default="timeback-khan-content", help="CloudFormation stack name")
     parser.add_argument("--output-dir", default="aws_infrastructure", help="Output directory")
+    parser.add_argument("--runtime", choices=LAMBDA_RUNTIMES, default="python3.11", help="Lambda Python runtime")
+    parser.add_argument("--memory-size", type=int, default=512, help="Default Lambda memory in MB")
+    parser.add_argument("--architecture", choices=LAMBDA_ARCHITECTURES, default="arm64",
+                        help="Default Lambda architecture")
+    parser.add_argument("--provisioned-concurrency", type=int, default=0,
+                        help="Default always-warm environments on the live alias")
+    parser.add_argument("--school-hours-concurrency", type=int, default=0,
+                        help="Default provisioned concurrency during school hours (0 disables the schedule)")
+    parser.add_argument("--snap-start", action="store_true", help="Enable SnapStart by default (Python 3.12+)")
+    parser.add_argument("--direct-s3-reads", action="store_true",
+                        help="Serve GET /courses/{courseId} and /powerpath/syllabus/{courseId} from S3 without the Lambda")
+    parser.add_argument("--validate-only", action="store_true",
+                        help="Check the generated template offline without writing any files")
     
     args = parser.parse_args()
     
     # Create AWS hosting setup
-    hosting = AWSTimeBackHosting(region=args.region, stack_name=args.stack_name)
+    hosting = AWSTimeBackHosting(region=args.region, stack_name=args.stack_name,
+                                 runtime=args.runtime, memory_size=args.memory_size,
+                                 architecture=args.architecture,
+                                 provisioned_concurrency=args.provisioned_concurrency,
+                                 school_hours_concurrency=args.school_hours_concurrency,
+                                 snap_start=args.snap_start, direct_s3_reads=args.direct_s3_reads)
+    
+    errors = validate_template(hosting.create_cloudformation_template())
+    for error in errors:
+        print(f"❌ {error}")
+    if errors:
+        raise SystemExit(1)
+    print(f"✅ CloudFormation template passes offline validation")
+    if args.validate_only:
+        return
     
     print(f"🏗️  Generating AWS infrastructure files for TimeBack hosting...")
     
@@ -629,6 +2198,8 @@ def main():
     print(f"🚀 Deployment script: {files['deployment_script']}")
     print(f"⚙️  Configuration: {files['config_file']}")
     print(f"📖 Documentation: {files['readme_file']}")
+    if "lambda_package" in files:
+        print(f"📦 Lambda package: {files['lambda_package']}")
     
     print(f"\\n🎯 Next Steps:")
     print(f"1. Review the generated files")
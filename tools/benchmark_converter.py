@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Khan to TimeBack Converter Benchmark
+
+Generates synthetic Khan Academy GraphQL course dumps of configurable size
+and converts them through the converter's public API, with and without
+streaming input, reporting per-stage wall time, throughput and peak memory
+as recorded by StageProfiler. Results are written as JSON so runs can be
+compared for regressions.
+"""
+
+import json
+import os
+import platform
+import statistics
+import tempfile
+import argparse
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Tuple
+
+from khan_to_timeback_converter import KhanToTimeBackConverter, StageProfiler, CONVERTER_VERSION, OUTPUT_PROFILES
+
+# (contentKind, __typename) pairs cycled through for synthetic content
+CONTENT_KINDS = [
+    ("Video", "Video"),
+    ("Exercise", "Exercise"),
+    ("Article", "Article"),
+    ("Quiz", "TopicQuiz"),
+]
+
+# --streaming choices -> streaming settings benchmarked
+STREAMING_MODES = {"off": (False,), "on": (True,), "both": (False, True)}
+
+def generate_synthetic_course(units: int, items_per_unit: int, slug: str = "pre-algebra") -> Dict[str, Any]:
+    """Build a GraphQL-shaped Khan course with units x items_per_unit content items"""
+    
+    unit_children = []
+    for unit_index in range(units):
+        children = []
+        for item_index in range(items_per_unit):
+            content_kind, typename = CONTENT_KINDS[item_index % len(CONTENT_KINDS)]
+            item_slug = f"{content_kind.lower()}-{unit_index}-{item_index}"
+            children.append({
+                "__typename": typename,
+                "id": f"x{unit_index:04d}{item_index:05d}",
+                "contentKind": content_kind,
+                "slug": item_slug,
+                "translatedTitle": f"{content_kind} {item_index + 1} of unit {unit_index + 1}",
+                "translatedDescription": f"Practice {content_kind.lower()} covering topic {item_index % 17} "
+                                         f"in unit {unit_index + 1} of the synthetic course.",
+                "canonicalUrl": f"/math/{slug}/unit-{unit_index}/{item_slug}",
+                "timeEstimate": {"lowerBound": 2 + item_index % 5, "upperBound": 6 + item_index % 7}
+            })
+        
+        unit_children.append({
+            "__typename": "Unit",
+            "id": f"u{unit_index:04d}",
+            "slug": f"unit-{unit_index}",
+            "translatedTitle": f"Unit {unit_index + 1}",
+            "allOrderedChildren": children
+        })
+    
+    return {
+        "data": {
+            "contentRoute": {
+                "listedPathData": {
+                    "course": {
+                        "__typename": "Course",
+                        "id": f"synthetic-{units}x{items_per_unit}",
+                        "slug": slug,
+                        "translatedTitle": f"Synthetic {units}x{items_per_unit}",
+                        "translatedDescription": "Synthetic benchmark course",
+                        "iconPath": "",
+                        "unitChildren": unit_children
+                    }
+                }
+            }
+        }
+    }
+
+def write_synthetic_course(path: str, units: int, items_per_unit: int) -> int:
+    """Write a synthetic course dump and return its size in bytes"""
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(generate_synthetic_course(units, items_per_unit), f)
+    return os.path.getsize(path)
+
+def _profile_conversion(input_path: str, output_dir: str, output_profile: str, streaming: bool,
+                        trace_memory: bool) -> List[Dict[str, Any]]:
+    """Convert input_path once with convert_khan_course and return StageProfiler's stage records"""
+    
+    profiler = StageProfiler(trace_memory=trace_memory)
+    converter = KhanToTimeBackConverter(output_profile=output_profile, hooks=profiler)
+    try:
+        converter.convert_khan_course(input_path, output_dir, streaming=streaming)
+    finally:
+        profiler.close()
+    return profiler.stages
+
+def benchmark_scenario(units: int, items_per_unit: int, repeat: int = 3,
+                       output_profile: str = "pretty", streaming: bool = False) -> Dict[str, Any]:
+    """Benchmark one synthetic course size; times are medians over repeat runs
+    
+    Streaming conversions have no separate load and extract stages; reading
+    happens inside the syllabus stage.
+    """
+    
+    items = units * items_per_unit
+    timings: Dict[str, List[float]] = {}
+    
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, "course.json")
+        input_bytes = write_synthetic_course(input_path, units, items_per_unit)
+        
+        for run in range(repeat):
+            for record in _profile_conversion(input_path, os.path.join(work_dir, f"timed_{run}"),
+                                              output_profile, streaming, trace_memory=False):
+                timings.setdefault(record["stage"], []).append(record["wallTime"])
+        
+        # Memory is traced in a separate pass so tracing overhead doesn't skew timings
+        peaks = {record["stage"]: record["peakAllocation"]
+                 for record in _profile_conversion(input_path, os.path.join(work_dir, "traced"),
+                                                   output_profile, streaming, trace_memory=True)}
+    
+    stages = {}
+    for stage, wall_times in timings.items():
+        wall_time = statistics.median(wall_times)
+        stages[stage] = {
+            "wallTime": round(wall_time, 6),
+            "itemsPerSecond": round(items / wall_time, 1) if wall_time else None,
+            "peakMemory": peaks[stage]
+        }
+    total = sum(stage["wallTime"] for stage in stages.values())
+    
+    return {
+        "name": f"{units}x{items_per_unit}" + ("-streaming" if streaming else ""),
+        "units": units,
+        "itemsPerUnit": items_per_unit,
+        "items": items,
+        "inputBytes": input_bytes,
+        "outputProfile": output_profile,
+        "streaming": streaming,
+        "stages": stages,
+        "total": {
+            "wallTime": round(total, 6),
+            "itemsPerSecond": round(items / total, 1) if total else None,
+            "peakMemory": max(peaks.values())
+        }
+    }
+
+def run_benchmarks(sizes: List[Tuple[int, int]], repeat: int = 3, output_profile: str = "pretty",
+                   streaming_modes: Tuple[bool, ...] = (False, True)) -> Dict[str, Any]:
+    """Benchmark every requested size in each streaming mode and return a machine-readable report"""
+    
+    return {
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "converterVersion": CONVERTER_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "scenarios": [benchmark_scenario(units, items, repeat, output_profile, streaming)
+                      for units, items in sizes for streaming in streaming_modes]
+    }
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.15) -> List[str]:
+    """List stages whose wall time regressed by more than threshold against a baseline"""
+    
+    regressions = []
+    baseline_scenarios = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    
+    for scenario in current["scenarios"]:
+        previous = baseline_scenarios.get(scenario["name"])
+        if not previous:
+            continue
+        for stage, metrics in list(scenario["stages"].items()) + [("total", scenario["total"])]:
+            before = (previous["total"] if stage == "total" else previous["stages"].get(stage, {})).get("wallTime")
+            if before and metrics["wallTime"] > before * (1 + threshold):
+                regressions.append(f"{scenario['name']} {stage}: {before:.4f}s -> {metrics['wallTime']:.4f}s "
+                                   f"(+{(metrics['wallTime'] / before - 1) * 100:.0f}%)")
+    return regressions
+
+def format_rate(items_per_second: Optional[float]) -> str:
+    """Throughput column; a stage too fast to time has no rate"""
+    
+    return f"{items_per_second:>12,.0f}" if items_per_second is not None else f"{'n/a':>12}"
+
+def _parse_size(value: str) -> Tuple[int, int]:
+    try:
+        units, items = value.lower().split("x")
+        return int(units), int(items)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected UNITSxITEMS, got {value!r}")
+
+def main():
+    """Command line interface for the benchmark"""
+    
+    parser = argparse.ArgumentParser(description="Benchmark the Khan to TimeBack converter on synthetic courses")
+    parser.add_argument("--sizes", nargs="+", type=_parse_size, default=[(15, 40), (50, 200), (200, 400)],
+                        help="Course sizes as UNITSxITEMS_PER_UNIT (default: 15x40 50x200 200x400)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size; the median is reported")
+    parser.add_argument("--output-profile", choices=OUTPUT_PROFILES, default="pretty", help="Converter output profile")
+    parser.add_argument("--streaming", choices=sorted(STREAMING_MODES), default="both",
+                        help="Benchmark streaming input, whole-file input, or both (default)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON report")
+    parser.add_argument("--compare", help="Baseline report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown before flagging (0.15 = 15%%)")
+    
+    args = parser.parse_args()
+    
+    print(f"⏱️  Benchmarking converter ({args.output_profile} profile, {args.repeat} runs per size)...")
+    report = run_benchmarks(args.sizes, args.repeat, args.output_profile, STREAMING_MODES[args.streaming])
+    
+    for scenario in report["scenarios"]:
+        print(f"\n📊 {scenario['name']} ({scenario['items']} items, {scenario['inputBytes'] / 1e6:.1f} MB input)")
+        for stage, metrics in scenario["stages"].items():
+            print(f"   {stage:<9} {metrics['wallTime'] * 1000:9.1f} ms  {format_rate(metrics['itemsPerSecond'])} items/s  "
+                  f"{metrics['peakMemory'] / 1e6:8.1f} MB peak")
+        total = scenario["total"]
+        print(f"   {'total':<9} {total['wallTime'] * 1000:9.1f} ms  {format_rate(total['itemsPerSecond'])} items/s")
+    
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n📄 Results saved to: {args.output}")
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_reports(baseline, report, args.threshold)
+        if regressions:
+            print(f"\n❌ Regressions against {args.compare}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            raise SystemExit(1)
+        print(f"\n✅ No regressions against {args.compare}")
+
+if __name__ == "__main__":
+    main()
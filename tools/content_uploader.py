@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+TimeBack Content Uploader
+
+Publishes converter output to the content bucket with one pooled S3 client
+and a thread pool. Every file is stored once under a content-addressed key
+(objects/<md5><ext>), so objects never change once written and can be
+cached for a year. A small manifest mapping logical keys such as
+courses/<id>.json to those objects is written last; replacing it is the
+single atomic step that switches readers to the new content. Files of
+superseded conversions (a course re-converted under a new id) are left
+out, so the manifest only lists the latest conversion of each course.
+
+Works against any S3-compatible endpoint (--endpoint-url), so uploads can
+be exercised against a local stand-in before touching AWS.
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import sys
+import threading
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Callable, Set
+
+from khan_to_timeback_converter import latest_courses
+
+# Converter bookkeeping that is never served
+SKIPPED_FILES = {"build_manifest.json", "batch_summary.json", "conversion_profile.json"}
+SKIPPED_PREFIXES = ("timeback_course_", ".")
+
+# Precompressed siblings written by the production output profile
+CONTENT_ENCODINGS = {".gz": "gzip", ".br": "br"}
+
+# Content-addressed objects live under OBJECT_PREFIX; MANIFEST_KEY points readers at them
+OBJECT_PREFIX = "objects/"
+MANIFEST_KEY = "content-manifest.json"
+MANIFEST_HISTORY_PREFIX = "manifests/"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+MANIFEST_CACHE_CONTROL = "public, max-age=60"
+
+# Read by API Gateway's direct S3 integrations, which cannot follow the manifest
+MIRRORED_KEYS = re.compile(r"(courses|syllabi)/[^/]+(?<!\.offsets)\.json")
+MIRROR_CACHE_CONTROL = "public, max-age=300"
+
+def object_key(relative_path: str) -> Optional[str]:
+    """Bucket key for a file in the converter's output directory, or None to skip it
+    
+    course_<id>.json -> courses/<id>.json, syllabus_<id>.json (and its
+    .offsets.json) -> syllabi/<id>..., syllabus_<id>/... -> syllabi/<id>/...;
+    anything else keeps its relative path.
+    """
+    
+    parts = relative_path.replace(os.sep, "/").split("/")
+    name = parts[0]
+    if len(parts) == 1 and (name in SKIPPED_FILES or name.startswith(SKIPPED_PREFIXES)):
+        return None
+    if name.startswith("course_"):
+        return "courses/" + "/".join([name[len("course_"):]] + parts[1:])
+    if name.startswith("syllabus_"):
+        return "syllabi/" + "/".join([name[len("syllabus_"):]] + parts[1:])
+    return "/".join(parts)
+
+def course_id_of(logical_key: str) -> Optional[str]:
+    """Course id a courses/ or syllabi/ key belongs to, or None for shared objects"""
+    
+    parts = logical_key.split("/")
+    if len(parts) < 2 or parts[0] not in ("courses", "syllabi"):
+        return None
+    return parts[1].split(".", 1)[0]
+
+def superseded_course_ids(content_dir: str) -> Set[str]:
+    """Ids of course_<id>.json files replaced by a newer conversion of the same course"""
+    
+    course_ids = {name[len("course_"):-len(".json")] for name in os.listdir(content_dir)
+                  if name.startswith("course_") and name.endswith(".json")}
+    latest = {os.path.basename(path)[len("course_"):-len(".json")] for path, _ in latest_courses(content_dir)}
+    return course_ids - latest
+
+def content_key(logical_key: str, digest: str) -> str:
+    """Immutable key for content with this digest, keeping the logical key's extension(s)
+    
+    courses/<id>.json -> objects/<md5>.json, courses/<id>.json.gz -> objects/<md5>.json.gz
+    """
+    
+    base, extension = os.path.splitext(logical_key)
+    if extension in CONTENT_ENCODINGS:
+        extension = os.path.splitext(base)[1] + extension
+    return f"{OBJECT_PREFIX}{digest}{extension}"
+
+def file_digest(path: str) -> str:
+    """Hex MD5 of a file, the ETag S3 assigns to a single-part upload"""
+    
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def create_client(region: Optional[str] = None, endpoint_url: Optional[str] = None, pool_size: int = 16):
+    """S3 client whose connection pool is sized for pool_size concurrent uploads"""
+    
+    import boto3
+    from botocore.config import Config
+    
+    return boto3.client("s3", region_name=region, endpoint_url=endpoint_url,
+                        config=Config(max_pool_connections=pool_size, retries={"mode": "adaptive"}))
+
+class ContentUploader:
+    """Content-addressed, concurrent publication of a converter output directory"""
+    
+    def __init__(self, bucket: str, client: Any = None, workers: int = 16,
+                 progress: Optional[Callable[[Dict[str, int], int], None]] = None,
+                 mirror_logical_keys: bool = False):
+        self.bucket = bucket
+        self.workers = workers
+        self.client = client or create_client(pool_size=workers)
+        self.progress = progress
+        self.mirror_logical_keys = mirror_logical_keys
+        self.stats = {"uploaded": 0, "unchanged": 0, "mirrored": 0, "failed": 0, "bytesUploaded": 0}
+        self._lock = threading.Lock()
+    
+    def plan(self, content_dir: str) -> List[Dict[str, Any]]:
+        """Every file to publish with its logical key, content-addressed key, digest and metadata"""
+        
+        superseded = superseded_course_ids(content_dir)
+        objects = []
+        for root, dirs, names in os.walk(content_dir):
+            dirs[:] = sorted(name for name in dirs if not name.startswith("."))
+            for name in sorted(names):
+                path = os.path.join(root, name)
+                base, extension = os.path.splitext(name)
+                encoding = CONTENT_ENCODINGS.get(extension)
+                key = object_key(os.path.relpath(os.path.join(root, base) if encoding else path, content_dir))
+                if key is None or course_id_of(key) in superseded:
+                    continue
+                
+                content_type = mimetypes.guess_type(base if encoding else name)[0] or "application/octet-stream"
+                if content_type == "application/json":
+                    content_type += "; charset=utf-8"
+                logical_key = key + extension if encoding else key
+                digest = file_digest(path)
+                objects.append({
+                    "path": path,
+                    "logicalKey": logical_key,
+                    "key": content_key(logical_key, digest),
+                    "size": os.path.getsize(path),
+                    "digest": digest,
+                    "contentType": content_type,
+                    "contentEncoding": encoding
+                })
+        return objects
+    
+    def remote_keys(self) -> set:
+        """Content-addressed objects already in the bucket (one LIST call per 1000 keys)"""
+        
+        keys = set()
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=OBJECT_PREFIX):
+            keys.update(entry["Key"] for entry in page.get("Contents", []))
+        return keys
+    
+    def current_manifest(self) -> Dict[str, Any]:
+        """The manifest readers currently follow, or an empty one for a fresh bucket"""
+        
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=MANIFEST_KEY)
+        except self.client.exceptions.NoSuchKey:
+            return {"version": 0, "objects": {}}
+        return json.loads(response["Body"].read())
+    
+    def _extra_args(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        extra = {"ContentType": item["contentType"], "CacheControl": IMMUTABLE_CACHE_CONTROL}
+        if item["contentEncoding"]:
+            extra["ContentEncoding"] = item["contentEncoding"]
+        return extra
+    
+    def _record(self, outcome: str, size: int = 0):
+        with self._lock:
+            self.stats[outcome] += 1
+            self.stats["bytesUploaded"] += size
+            if self.progress is not None:
+                self.progress(dict(self.stats), 1)
+    
+    def _put(self, item: Dict[str, Any]):
+        try:
+            with open(item["path"], 'rb') as f:
+                self.client.put_object(Bucket=self.bucket, Key=item["key"], Body=f, **self._extra_args(item))
+            self._record("uploaded", item["size"])
+        except Exception as e:
+            print(f"❌ {item['logicalKey']}: {e}", file=sys.stderr)
+            self._record("failed")
+    
+    def _mirror(self, item: Dict[str, Any]):
+        """Server-side copy of a stored object to its logical key"""
+        
+        try:
+            self.client.copy_object(Bucket=self.bucket, Key=item["logicalKey"],
+                                    CopySource={"Bucket": self.bucket, "Key": item["key"]},
+                                    MetadataDirective="REPLACE", ContentType=item["contentType"],
+                                    CacheControl=MIRROR_CACHE_CONTROL)
+            with self._lock:
+                self.stats["mirrored"] += 1
+        except Exception as e:
+            print(f"❌ {item['logicalKey']} (mirror): {e}", file=sys.stderr)
+            self._record("failed")
+    
+    def mirror(self, objects: List[Dict[str, Any]]):
+        """Copy course and syllabus objects to courses/<id>.json and syllabi/<id>.json
+        
+        These copies are overwritten in place, so unlike the manifest they do
+        not switch atomically with the rest of the content.
+        """
+        
+        current = {}
+        for prefix in ("courses/", "syllabi/"):
+            for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefix):
+                current.update((entry["Key"], entry["ETag"].strip('"')) for entry in page.get("Contents", []))
+        
+        stale = [item for item in objects
+                 if MIRRORED_KEYS.fullmatch(item["logicalKey"]) and current.get(item["logicalKey"]) != item["digest"]]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for future in as_completed([executor.submit(self._mirror, item) for item in stale]):
+                future.result()
+    
+    def publish_manifest(self, objects: Dict[str, str], previous: Dict[str, Any]) -> Dict[str, Any]:
+        """Write the next manifest version, first to its history key, then to MANIFEST_KEY
+        
+        A PutObject replaces the whole manifest at once, so readers see either
+        the previous content set or the new one, never a mix.
+        """
+        
+        manifest = {
+            "version": previous.get("version", 0) + 1,
+            "publishedAt": datetime.now(timezone.utc).isoformat(),
+            "objects": objects
+        }
+        body = json.dumps(manifest, separators=(",", ":"), sort_keys=True).encode("utf-8")
+        history_key = f"{MANIFEST_HISTORY_PREFIX}{manifest['version']:06d}.json"
+        self.client.put_object(Bucket=self.bucket, Key=history_key, Body=body,
+                               ContentType="application/json", CacheControl=IMMUTABLE_CACHE_CONTROL)
+        self.client.put_object(Bucket=self.bucket, Key=MANIFEST_KEY, Body=body,
+                               ContentType="application/json", CacheControl=MANIFEST_CACHE_CONTROL)
+        return manifest
+    
+    def upload(self, content_dir: str) -> Dict[str, Any]:
+        """Publish content_dir and return upload statistics
+        
+        The manifest is only replaced once every object it names is in the
+        bucket; after any failed upload readers stay on the previous version.
+        Superseded objects are left in place for readers of older manifests.
+        """
+        
+        started = time.perf_counter()
+        objects = self.plan(content_dir)
+        remote = self.remote_keys()
+        
+        # Identical content shares one key, so it is sent once
+        pending: Dict[str, Dict[str, Any]] = {}
+        for item in objects:
+            if item["key"] in remote or item["key"] in pending:
+                self._record("unchanged")
+            else:
+                pending[item["key"]] = item
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._put, item) for item in pending.values()]
+            for future in as_completed(futures):
+                future.result()
+        
+        if self.mirror_logical_keys and not self.stats["failed"]:
+            self.mirror(objects)
+        
+        previous = self.current_manifest()
+        mapping = {item["logicalKey"]: item["key"] for item in objects}
+        manifest_version = previous.get("version", 0)
+        if self.stats["failed"]:
+            print(f"❌ {self.stats['failed']} uploads failed; {MANIFEST_KEY} left at version {manifest_version}",
+                  file=sys.stderr)
+        elif mapping != previous.get("objects"):
+            manifest_version = self.publish_manifest(mapping, previous)["version"]
+        
+        return dict(self.stats, objects=len(objects), manifestVersion=manifest_version,
+                    wallTime=round(time.perf_counter() - started, 3))
+
+def print_progress(stats: Dict[str, int], _: int):
+    done = stats["uploaded"] + stats["unchanged"] + stats["failed"]
+    if done % 100 == 0:
+        print(f"   ... {done} objects ({stats['uploaded']} uploaded, {stats['unchanged']} unchanged)")
+
+def main():
+    """Command line interface for the uploader"""
+    
+    parser = argparse.ArgumentParser(description="Upload converted TimeBack content to S3")
+    parser.add_argument("content_dir", help="Converter output directory")
+    parser.add_argument("--bucket", required=True, help="Content bucket name")
+    parser.add_argument("--region", default=None, help="AWS region")
+    parser.add_argument("--endpoint-url", default=None,
+                        help="S3-compatible endpoint, e.g. a local stand-in such as http://localhost:9000")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent uploads (and pooled connections)")
+    parser.add_argument("--mirror-logical-keys", action="store_true",
+                        help="Also copy courses and syllabi to courses/<id>.json and syllabi/<id>.json "
+                             "(needed by API Gateway direct S3 reads)")
+    
+    args = parser.parse_args()
+    
+    if not os.path.isdir(args.content_dir):
+        print(f"❌ Content directory not found: {args.content_dir}")
+        raise SystemExit(1)
+    
+    client = create_client(args.region, args.endpoint_url, args.workers)
+    uploader = ContentUploader(args.bucket, client, workers=args.workers, progress=print_progress,
+                               mirror_logical_keys=args.mirror_logical_keys)
+    
+    print(f"📤 Uploading {args.content_dir} to s3://{args.bucket} ({args.workers} workers)...")
+    stats = uploader.upload(args.content_dir)
+    
+    print(f"\n📊 Upload Summary:")
+    print(f"   Objects: {stats['objects']}")
+    print(f"   Uploaded: {stats['uploaded']} ({stats['bytesUploaded'] / 1e6:.1f} MB)")
+    print(f"   Unchanged (already stored or duplicate content): {stats['unchanged']}")
+    if args.mirror_logical_keys:
+        print(f"   Mirrored to logical keys: {stats['mirrored']}")
+    print(f"   Failed: {stats['failed']}")
+    print(f"   Manifest version: {stats['manifestVersion']}")
+    print(f"   Wall time: {stats['wallTime']:.2f}s")
+    
+    if stats["failed"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -8,43 +8,1082 @@ for hosting on AWS and integration with the TimeBack platform.
 
 import json
 import uuid
+import glob
+import cProfile
+import hashlib
+import math
+import time
+import zlib
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager, nullcontext
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Generator, TextIO, Tuple, FrozenSet
+from collections import Counter
 import argparse
+import gzip
 import os
+import shutil
+
+# Optional faster encoder and Brotli compression for production output
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Path from the GraphQL response root to the course object
+COURSE_PATH = ("data", "contentRoute", "listedPathData", "course")
+
+# Bump whenever conversion output changes so incremental builds re-convert
+CONVERTER_VERSION = "1.1"
+
+# "pretty" keeps indented, human-readable output for debugging; "production"
+# writes compact JSON, encodes each object once and precompresses for the CDN
+OUTPUT_PROFILES = ("pretty", "production")
+
+def encode_json(data: Any, output_profile: str = "pretty") -> bytes:
+    """Encode data as UTF-8 JSON bytes for the given output profile"""
+    
+    if output_profile == "production":
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
+def write_artifact(path: str, chunks: Iterable[bytes], precompress: bool = True) -> Dict[str, str]:
+    """Write encoded chunks to path plus .gz (and .br when brotli is installed) siblings
+    
+    Chunks are written and compressed as they arrive, so an artifact never
+    has to be held in memory as a whole. Returns the sibling paths by encoding.
+    """
+    
+    siblings = {}
+    with ExitStack() as stack:
+        sinks = [stack.enter_context(open(path, 'wb')).write]
+        
+        if precompress:
+            gz_path = f"{path}.gz"
+            gz_file = stack.enter_context(open(gz_path, 'wb'))
+            # mtime=0 keeps the archive bytes stable across identical conversions
+            sinks.append(stack.enter_context(
+                gzip.GzipFile(filename="", mode='wb', fileobj=gz_file, compresslevel=9, mtime=0)).write)
+            siblings["gz"] = gz_path
+            
+            if brotli is not None:
+                br_path = f"{path}.br"
+                br_file = stack.enter_context(open(br_path, 'wb'))
+                compressor = brotli.Compressor(quality=11)
+                sinks.append(lambda chunk: br_file.write(compressor.process(chunk)))
+                stack.callback(lambda: br_file.write(compressor.finish()))
+                siblings["br"] = br_path
+        
+        for chunk in chunks:
+            for sink in sinks:
+                sink(chunk)
+    
+    return siblings
+
+def _read_chunks(path: str, chunk_size: int = 1 << 20) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(chunk_size), b"")
+
+def _path_size(path: str) -> int:
+    """Size of a file, or of every file below a directory"""
+    
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(path) for name in names)
+
+def _remove_path(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+# Khan Academy content links are relative to this origin
+KHAN_BASE_URL = "https://www.khanacademy.org"
+
+# TimeBack (type, subType) per classification, in the priority order of the
+# original if/elif chain; the last entry is the fallback for unknown content
+RESOURCE_TYPES = (
+    ("video", "educational-video"),
+    ("qti-assessment", "qti-test"),
+    ("text", "article"),
+    ("qti-assessment", "qti-quiz"),
+    ("text", "general-content"),
+)
+_CONTENT_KIND_PRIORITY = {"video": 0, "exercise": 1, "article": 2, "quiz": 3}
+_TYPENAME_PRIORITY = {"video": 0, "exercise": 1, "article": 2, "topicquiz": 3}
+
+@lru_cache(maxsize=None)
+def classify_content(content_kind: str, content_type: str) -> Tuple[str, str, str]:
+    """Map a Khan contentKind/__typename pair to (originalKhanType, type, subType)
+    
+    Only a handful of distinct pairs occur in a catalog, so results are
+    memoized and each content item costs a single cache lookup.
+    """
+    
+    content_kind = (content_kind or "").lower()
+    content_type = (content_type or "").lower()
+    fallback = len(RESOURCE_TYPES) - 1
+    priority = min(_CONTENT_KIND_PRIORITY.get(content_kind, fallback),
+                   _TYPENAME_PRIORITY.get(content_type, fallback))
+    resource_type, sub_type = RESOURCE_TYPES[priority]
+    return content_kind or content_type, resource_type, sub_type
+
+class TimeBackResource:
+    """A converted content item; serialized as a TimeBack component resource"""
+    
+    __slots__ = ("sourced_id", "title", "sort_order", "khan_id", "khan_type", "description",
+                 "canonical_url", "estimated_duration", "resource_type", "sub_type")
+    
+    def __init__(self, sourced_id: str, title: str, sort_order: int, khan_id: str, khan_type: str,
+                 description: str, canonical_url: str, estimated_duration: Optional[Tuple[Any, Any]],
+                 resource_type: str, sub_type: str):
+        self.sourced_id = sourced_id
+        self.title = title
+        self.sort_order = sort_order
+        self.khan_id = khan_id
+        self.khan_type = khan_type
+        self.description = description
+        self.canonical_url = canonical_url
+        self.estimated_duration = estimated_duration
+        self.resource_type = resource_type
+        self.sub_type = sub_type
+    
+    def metadata(self) -> Dict[str, Any]:
+        metadata = {
+            "originalKhanType": self.khan_type,
+            "originalKhanId": self.khan_id,
+            "description": self.description,
+            "canonicalUrl": self.canonical_url,
+        }
+        if self.estimated_duration is not None:
+            metadata["estimatedDuration"] = {
+                "lowerBound": self.estimated_duration[0],
+                "upperBound": self.estimated_duration[1]
+            }
+        metadata["type"] = self.resource_type
+        metadata["subType"] = self.sub_type
+        if self.canonical_url:
+            metadata["url"] = KHAN_BASE_URL + self.canonical_url
+        return metadata
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sourcedId": self.sourced_id,
+            "title": self.title,
+            "sortOrder": self.sort_order,
+            "resource": {
+                "sourcedId": self.sourced_id,
+                "status": "active",
+                "title": self.title,
+                "vendorResourceId": self.khan_id,
+                "metadata": self.metadata()
+            }
+        }
+
+class TimeBackResourceRef:
+    """A component's reference to a resource kept in the shared ResourceStore"""
+    
+    __slots__ = ("sourced_id", "resource_id", "title", "sort_order")
+    
+    def __init__(self, sourced_id: str, resource_id: str, title: str, sort_order: int):
+        self.sourced_id = sourced_id
+        self.resource_id = resource_id
+        self.title = title
+        self.sort_order = sort_order
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sourcedId": self.sourced_id,
+            "title": self.title,
+            "sortOrder": self.sort_order,
+            "resource": {
+                "sourcedId": self.resource_id,
+                "title": self.title
+            }
+        }
+
+class TimeBackComponent:
+    """A converted Khan unit; serialized as a TimeBack syllabus component"""
+    
+    __slots__ = ("sourced_id", "title", "sort_order", "resources", "khan_id", "slug")
+    
+    def __init__(self, sourced_id: str, title: str, sort_order: int,
+                 resources: List[Any], khan_id: str, slug: str):
+        self.sourced_id = sourced_id
+        self.title = title
+        self.sort_order = sort_order
+        self.resources = resources
+        self.khan_id = khan_id
+        self.slug = slug
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sourcedId": self.sourced_id,
+            "title": self.title,
+            "sortOrder": self.sort_order,
+            "subComponents": [],  # Khan units don't typically have sub-components
+            "componentResources": [resource.to_dict() for resource in self.resources],
+            "metadata": {
+                "originalKhanId": self.khan_id,
+                "originalSlug": self.slug,
+                "unitType": "unit"
+            }
+        }
+
+class TimeBackSyllabus:
+    """A converted course syllabus: course header plus its components"""
+    
+    __slots__ = ("sourced_id", "title", "grade_level", "components")
+    
+    def __init__(self, sourced_id: str, title: str, grade_level: str, components: List[TimeBackComponent]):
+        self.sourced_id = sourced_id
+        self.title = title
+        self.grade_level = grade_level
+        self.components = components
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "course": {
+                "sourcedId": self.sourced_id,
+                "title": self.title,
+                "grades": [self.grade_level]
+            },
+            "subComponents": [component.to_dict() for component in self.components]
+        }
+
+class TimeBackCourse:
+    """A converted course; serialized as a TimeBack OneRoster course"""
+    
+    __slots__ = ("sourced_id", "title", "slug", "grade_level", "subject", "organization_id",
+                 "khan_id", "icon_path", "date_last_modified", "converted_at", "description")
+    
+    def __init__(self, sourced_id: str, title: str, slug: str, grade_level: str, subject: str,
+                 organization_id: str, khan_id: str, icon_path: str,
+                 date_last_modified: str, converted_at: str, description: str = ""):
+        self.sourced_id = sourced_id
+        self.title = title
+        self.slug = slug
+        self.description = description
+        self.grade_level = grade_level
+        self.subject = subject
+        self.organization_id = organization_id
+        self.khan_id = khan_id
+        self.icon_path = icon_path
+        self.date_last_modified = date_last_modified
+        self.converted_at = converted_at
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "sourcedId": self.sourced_id,
+            "status": "active",
+            "dateLastModified": self.date_last_modified,
+            "title": self.title,
+            "courseCode": f"KHAN_{self.slug.upper()}",
+            "grades": [self.grade_level],
+            "subjects": [self.subject],
+            "org": {
+                "sourcedId": self.organization_id,
+                "type": "org"
+            },
+            "schoolYear": {
+                "sourcedId": "2024-2025",
+                "type": "academicSession"
+            },
+            "metadata": {
+                "originalKhanId": self.khan_id,
+                "originalSlug": self.slug,
+                "iconPath": self.icon_path,
+                "description": self.description,
+                "convertedFrom": "Khan Academy",
+                "convertedAt": self.converted_at
+            }
+        }
+
+class _JSONStreamReader:
+    """Incremental JSON reader that walks a document without loading it whole"""
+    
+    def __init__(self, fp: TextIO, chunk_size: int = 1 << 16):
+        self._fp = fp
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+    
+    def _fill(self, size: Optional[int] = None) -> bool:
+        """Read the next chunk, dropping the already consumed part of the buffer"""
+        
+        if self._eof:
+            return False
+        chunk = self._fp.read(size or self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+    
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it"""
+        
+        while True:
+            buf, pos = self._buf, self._pos
+            while pos < len(buf) and buf[pos] in " \t\n\r":
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON input")
+    
+    def _consume(self, expected: str):
+        found = self.peek()
+        if found != expected:
+            raise ValueError(f"Expected {expected!r} but found {found!r}")
+        self._pos += 1
+    
+    def read_value(self) -> Any:
+        """Decode the next complete value; memory is bounded by that value's size"""
+        
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Value spans past the buffer - grow geometrically and retry
+                if not self._fill(max(self._chunk_size, len(self._buf) - self._pos)):
+                    raise
+                continue
+            if end == len(self._buf) and self._fill():
+                # A number or literal may continue in the next chunk
+                continue
+            self._pos = end
+            return value
+    
+    def iter_object(self) -> Iterator[str]:
+        """Yield the keys of an object; the caller must consume each value"""
+        
+        self._consume("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self._consume(":")
+            yield key
+            separator = self.peek()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or '}}' but found {separator!r}")
+    
+    def iter_array(self) -> Iterator[None]:
+        """Yield once per array element; the caller must consume each element"""
+        
+        self._consume("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield
+            separator = self.peek()
+            self._pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Expected ',' or ']' but found {separator!r}")
+
+def _iter_course_units(reader: _JSONStreamReader, course_fields: Dict[str, Any],
+                       level: int = 0) -> Generator[Dict[str, Any], None, int]:
+    """Yield unitChildren entries one at a time while collecting the course's other fields
+    
+    Returns how many levels of COURSE_PATH were found, so callers can tell
+    whether the course object was reached at all.
+    """
+    
+    if reader.peek() != "{":
+        reader.read_value()
+        return level
+    
+    depth = level
+    for key in reader.iter_object():
+        if level == len(COURSE_PATH):
+            # Inside the course object itself
+            if key == "unitChildren" and reader.peek() == "[":
+                course_fields["unitChildren"] = True
+                for _ in reader.iter_array():
+                    yield reader.read_value()
+            else:
+                course_fields[key] = reader.read_value()
+        elif key == COURSE_PATH[level]:
+            depth = max(depth, (yield from _iter_course_units(reader, course_fields, level + 1)))
+        else:
+            reader.read_value()
+    return depth
+
+class BuildManifest:
+    """Records what each input produced so unchanged inputs can be skipped
+    
+    The manifest lives in the output directory and maps every input file to
+    its content hash, the converter version and options used, and the files
+    that conversion produced.
+    """
+    
+    FILENAME = "build_manifest.json"
+    
+    def __init__(self, output_dir: str, entries: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self.entries: Dict[str, Dict[str, Any]] = entries or {}
+    
+    @classmethod
+    def load(cls, output_dir: str) -> "BuildManifest":
+        """Load the manifest from an output directory, or start an empty one"""
+        
+        path = os.path.join(output_dir, cls.FILENAME)
+        if not os.path.exists(path):
+            return cls(output_dir)
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(output_dir, data.get("inputs", {}))
+    
+    @staticmethod
+    def key(input_file: str) -> str:
+        return os.path.abspath(input_file)
+    
+    @staticmethod
+    def hash_file(input_file: str) -> str:
+        """SHA-256 of the input file's bytes"""
+        
+        digest = hashlib.sha256()
+        with open(input_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def get(self, input_file: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(self.key(input_file))
+    
+    def is_current(self, input_file: str, content_hash: str, options: Dict[str, Any]) -> bool:
+        """True if the input was already converted from identical content and settings"""
+        
+        entry = self.get(input_file)
+        if not entry:
+            return False
+        
+        return (entry.get("contentHash") == content_hash
+                and entry.get("converterVersion") == CONVERTER_VERSION
+                and entry.get("options") == options
+                and all(os.path.exists(path) for path in entry.get("outputFiles", {}).values()))
+    
+    def record(self, input_file: str, content_hash: str, options: Dict[str, Any],
+               output_files: Dict[str, str], summary: Dict[str, Any]):
+        self.entries[self.key(input_file)] = {
+            "contentHash": content_hash,
+            "converterVersion": CONVERTER_VERSION,
+            "options": options,
+            "outputFiles": output_files,
+            "summary": summary,
+            "convertedAt": datetime.now(timezone.utc).isoformat()
+        }
+    
+    def save(self):
+        """Write the manifest atomically"""
+        
+        os.makedirs(self.output_dir, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"converterVersion": CONVERTER_VERSION, "inputs": self.entries}, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+# Namespace for deterministic resource ids, so every process and every run
+# assigns the same sourcedId to the same Khan content item
+RESOURCE_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, KHAN_BASE_URL)
+
+class ResourceStore:
+    """Catalog-wide resource index keyed on the Khan content id (or canonicalUrl)
+    
+    Content that appears in several courses is converted and stored once;
+    each syllabus then carries only a reference to it. Resource ids are
+    derived from the key, so independent workers agree on them without
+    coordinating. known holds keys stored elsewhere (a batch worker gets the
+    keys of the store on disk) that count as present but are not loaded.
+    """
+    
+    FILENAME = "resource_store.json"
+    
+    def __init__(self, output_dir: str, resources: Optional[Dict[str, Dict[str, Any]]] = None,
+                 known: Optional[FrozenSet[str]] = None):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, self.FILENAME)
+        self.resources: Dict[str, Dict[str, Any]] = resources or {}
+        self.known: FrozenSet[str] = known or frozenset()
+        self.added: List[str] = []
+    
+    @classmethod
+    def load(cls, output_dir: str) -> "ResourceStore":
+        path = os.path.join(output_dir, cls.FILENAME)
+        if not os.path.exists(path):
+            return cls(output_dir)
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(output_dir, json.load(f).get("resources", {}))
+    
+    @staticmethod
+    def key_for(content: Dict[str, Any]) -> str:
+        return content.get("id") or content.get("canonicalUrl") or ""
+    
+    @staticmethod
+    def resource_id(key: str) -> str:
+        return str(uuid.uuid5(RESOURCE_NAMESPACE, key))
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self.resources or key in self.known
+    
+    def add(self, key: str, resource: Dict[str, Any]):
+        self.resources[key] = resource
+        self.added.append(key)
+    
+    def new_resources(self) -> Dict[str, Dict[str, Any]]:
+        """Resources added since the store was loaded"""
+        
+        return {key: self.resources[key] for key in self.added}
+    
+    def merge(self, resources: Dict[str, Dict[str, Any]]):
+        for key, resource in resources.items():
+            if key not in self.resources:
+                self.add(key, resource)
+    
+    def save(self, output_profile: str = "pretty"):
+        """Write the store atomically"""
+        
+        os.makedirs(self.output_dir, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(encode_json({"converterVersion": CONVERTER_VERSION, "resources": self.resources}, output_profile))
+        os.replace(temp_path, self.path)
+
+def latest_courses(output_dir: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """(path, course) for the newest conversion of each Khan course in output_dir
+    
+    Course sourcedIds are new on every conversion, so re-converting a course
+    without --incremental leaves the previous course_<id>.json in place.
+    Conversions of the same course share an originalKhanId (or slug).
+    """
+    
+    latest: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    for course_file in sorted(glob.glob(os.path.join(output_dir, "course_*.json"))):
+        with open(course_file, 'r', encoding='utf-8') as f:
+            course = json.load(f)
+        metadata = course.get("metadata", {})
+        key = metadata.get("originalKhanId") or metadata.get("originalSlug") or course["sourcedId"]
+        if key not in latest or course.get("dateLastModified", "") > latest[key][1].get("dateLastModified", ""):
+            latest[key] = (course_file, course)
+    return sorted(latest.values(), key=lambda entry: entry[0])
+
+class CourseCatalog:
+    """Versioned summary of every converted course in an output directory
+    
+    The hosted API serves /courses from this single object, so listing stays
+    one read however many courses are hosted. The version only moves when
+    the listed content changes.
+    """
+    
+    FILENAME = "catalog.json"
+    COURSE_FIELDS = ("sourcedId", "status", "dateLastModified", "title", "courseCode", "grades", "subjects")
+    
+    @classmethod
+    def summarize(cls, course: Dict[str, Any]) -> Dict[str, Any]:
+        entry = {field: course[field] for field in cls.COURSE_FIELDS if field in course}
+        metadata = course.get("metadata", {})
+        entry["metadata"] = {"originalSlug": metadata.get("originalSlug", ""), "iconPath": metadata.get("iconPath", "")}
+        return entry
+    
+    @classmethod
+    def build(cls, output_dir: str, output_profile: str = "pretty") -> Dict[str, Any]:
+        """Rebuild the catalog from the latest course_*.json files; returns the catalog without its course list"""
+        
+        courses = [cls.summarize(course) for _, course in latest_courses(output_dir)]
+        courses.sort(key=lambda course: (course.get("title", ""), course["sourcedId"]))
+        content_hash = hashlib.sha256(encode_json(courses, "production")).hexdigest()
+        
+        path = os.path.join(output_dir, cls.FILENAME)
+        previous = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+        
+        header = {key: value for key, value in previous.items() if key != "courses"}
+        if previous.get("contentHash") != content_hash:
+            header = {
+                "version": previous.get("version", 0) + 1,
+                "contentHash": content_hash,
+                "converterVersion": CONVERTER_VERSION,
+                "generatedAt": datetime.now(timezone.utc).isoformat(),
+                "courseCount": len(courses)
+            }
+            os.makedirs(output_dir, exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(encode_json({**header, "courses": courses}, output_profile))
+            os.replace(temp_path, path)
+        return header
+
+class _SyllabusOffsetIndex:
+    """Byte ranges of each component inside a compact (production) syllabus file
+    
+    Lets the API fetch one component with an S3 range read instead of
+    loading the whole syllabus. Positions are tracked relative to the
+    components array and rebased once the syllabus header is known, since
+    the streaming writer only learns it at the end.
+    """
+    
+    def __init__(self):
+        self.spans: List[Tuple[str, int, int]] = []
+        self.position = 0
+    
+    def add(self, component_id: str, size: int):
+        if self.spans:
+            self.position += 1  # separating comma
+        self.spans.append((component_id, self.position, self.position + size))
+        self.position += size
+    
+    def to_dict(self, syllabus_header: bytes) -> Dict[str, Any]:
+        base = len(b'{"course":') + len(syllabus_header) + len(b',"subComponents":[')
+        return {
+            "bytes": base + self.position + len(b"]}"),
+            # Inclusive [first, last] byte positions, as used by HTTP Range headers
+            "components": {component_id: [base + start, base + end - 1] for component_id, start, end in self.spans}
+        }
+
+class _SyllabusShardWriter:
+    """Writes a small syllabus index plus one shard file per component
+    
+    Layout (relative to the shard directory):
+        index.json                      course header and one entry per component
+        components/<componentId>.json   the full component
+    """
+    
+    def __init__(self, shard_dir: str, output_profile: str):
+        self.shard_dir = shard_dir
+        self.output_profile = output_profile
+        self.components: List[Dict[str, Any]] = []
+        os.makedirs(os.path.join(shard_dir, "components"), exist_ok=True)
+    
+    def add(self, component: "TimeBackComponent", data: Optional[bytes] = None):
+        """Write one component shard; data may carry the already encoded component"""
+        
+        shard = f"components/{component.sourced_id}.json"
+        if data is None:
+            data = encode_json(component.to_dict(), self.output_profile)
+        write_artifact(os.path.join(self.shard_dir, shard), [data],
+                       precompress=self.output_profile == "production")
+        
+        self.components.append({
+            "sourcedId": component.sourced_id,
+            "title": component.title,
+            "sortOrder": component.sort_order,
+            "resourceCount": len(component.resources),
+            "shard": shard
+        })
+    
+    def finish(self, syllabus_header: Dict[str, Any]) -> str:
+        """Write index.json and return its path"""
+        
+        index = {
+            "course": syllabus_header,
+            "componentCount": len(self.components),
+            "resourceCount": sum(component["resourceCount"] for component in self.components),
+            "components": self.components
+        }
+        index_file = os.path.join(self.shard_dir, "index.json")
+        write_artifact(index_file, [encode_json(index, self.output_profile)],
+                       precompress=self.output_profile == "production")
+        return index_file
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric terms; the generated Lambda tokenizes queries identically"""
+    
+    return "".join(char if char.isalnum() else " " for char in text.lower()).split()
+
+class SearchIndexBuilder:
+    """Inverted index over converted courses, components and resources
+    
+    Terms are hashed (crc32) into a fixed number of bucket files, so a query
+    reads one small object per distinct term no matter how many courses are
+    indexed. Postings carry precomputed BM25 scores and are cut to the best
+    max_postings per term; document details live in fixed-size shards that
+    are read only for the returned hits.
+    
+    Layout (relative to DIRNAME):
+        index.json           bucket count, shard size and corpus statistics
+        terms/<bucket>.json  {term: [[docIndex, score], ...]}
+        docs/<shard>.json    [{type, id, title, courseId, componentId?}, ...]
+    """
+    
+    DIRNAME = "search_index"
+    INDEX_VERSION = 1
+    # Title terms count double against description terms
+    FIELD_WEIGHTS = {"title": 2, "description": 1}
+    
+    def __init__(self, buckets: int = 64, max_postings: int = 200, docs_per_shard: int = 512,
+                 k1: float = 1.2, b: float = 0.75):
+        self.buckets = buckets
+        self.max_postings = max_postings
+        self.docs_per_shard = docs_per_shard
+        self.k1 = k1
+        self.b = b
+        self.documents: List[Dict[str, Any]] = []
+        self.term_frequencies: List[Counter] = []
+        self.courses = 0
+    
+    @staticmethod
+    def bucket_for(term: str, buckets: int) -> int:
+        return zlib.crc32(term.encode("utf-8")) % buckets
+    
+    def add_document(self, document: Dict[str, Any], title: str, description: str = ""):
+        frequencies = Counter()
+        for field, text in (("title", title), ("description", description)):
+            for term in tokenize(text or ""):
+                frequencies[term] += self.FIELD_WEIGHTS[field]
+        if frequencies:
+            self.documents.append(document)
+            self.term_frequencies.append(frequencies)
+    
+    def add_course(self, course: Dict[str, Any], syllabus: Dict[str, Any],
+                   shared_resources: Optional[Dict[str, Dict[str, Any]]] = None):
+        """Index a converted course; shared_resources maps resource sourcedId to ResourceStore entries"""
+        
+        course_id = course["sourcedId"]
+        self.courses += 1
+        self.add_document({"type": "course", "id": course_id, "title": course.get("title", ""),
+                           "courseId": course_id},
+                          course.get("title", ""), course.get("metadata", {}).get("description", ""))
+        
+        for component in syllabus.get("subComponents", []):
+            self.add_document({"type": "component", "id": component["sourcedId"], "title": component.get("title", ""),
+                               "courseId": course_id},
+                              component.get("title", ""))
+            
+            for component_resource in component.get("componentResources", []):
+                resource = component_resource.get("resource", {})
+                if "metadata" not in resource and shared_resources:
+                    resource = shared_resources.get(resource.get("sourcedId"), resource)
+                title = resource.get("title") or component_resource.get("title", "")
+                self.add_document({"type": "resource", "id": resource.get("sourcedId", ""), "title": title,
+                                   "courseId": course_id, "componentId": component["sourcedId"]},
+                                  title, resource.get("metadata", {}).get("description", ""))
+    
+    def _score_postings(self) -> Dict[str, List[List[Any]]]:
+        lengths = [sum(frequencies.values()) for frequencies in self.term_frequencies]
+        average_length = sum(lengths) / len(lengths) if lengths else 0.0
+        
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_index, frequencies in enumerate(self.term_frequencies):
+            for term, frequency in frequencies.items():
+                postings.setdefault(term, []).append((doc_index, frequency))
+        
+        document_count = len(self.documents)
+        scored = {}
+        for term, term_postings in postings.items():
+            idf = math.log(1 + (document_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            ranked = []
+            for doc_index, frequency in term_postings:
+                norm = self.k1 * (1 - self.b + self.b * lengths[doc_index] / average_length)
+                ranked.append([doc_index, round(idf * frequency * (self.k1 + 1) / (frequency + norm), 4)])
+            ranked.sort(key=lambda posting: (-posting[1], posting[0]))
+            scored[term] = ranked[:self.max_postings]
+        return scored
+    
+    def save(self, output_dir: str, output_profile: str = "pretty") -> Dict[str, Any]:
+        """Write the index under output_dir, replacing any previous one, and return its statistics"""
+        
+        index_dir = os.path.join(output_dir, self.DIRNAME)
+        temp_dir = f"{index_dir}.tmp"
+        _remove_path(temp_dir)
+        os.makedirs(os.path.join(temp_dir, "terms"))
+        os.makedirs(os.path.join(temp_dir, "docs"))
+        precompress = output_profile == "production"
+        
+        buckets: Dict[int, Dict[str, List[List[Any]]]] = {}
+        for term, postings in self._score_postings().items():
+            buckets.setdefault(self.bucket_for(term, self.buckets), {})[term] = postings
+        for bucket, terms in buckets.items():
+            write_artifact(os.path.join(temp_dir, "terms", f"{bucket}.json"),
+                           [encode_json(terms, output_profile)], precompress)
+        
+        for shard, start in enumerate(range(0, len(self.documents), self.docs_per_shard)):
+            write_artifact(os.path.join(temp_dir, "docs", f"{shard}.json"),
+                           [encode_json(self.documents[start:start + self.docs_per_shard], output_profile)],
+                           precompress)
+        
+        stats = {
+            "version": self.INDEX_VERSION,
+            "converterVersion": CONVERTER_VERSION,
+            "generatedAt": datetime.now(timezone.utc).isoformat(),
+            "buckets": self.buckets,
+            "docsPerShard": self.docs_per_shard,
+            "courses": self.courses,
+            "documents": len(self.documents),
+            "terms": sum(len(terms) for terms in buckets.values())
+        }
+        write_artifact(os.path.join(temp_dir, "index.json"), [encode_json(stats, output_profile)], precompress)
+        
+        _remove_path(index_dir)
+        os.replace(temp_dir, index_dir)
+        return stats
+
+def build_search_index(output_dir: str, output_profile: str = "pretty", **options) -> Dict[str, Any]:
+    """Rebuild the search index from the latest course_*.json / syllabus_*.json pairs in output_dir"""
+    
+    shared_resources = {}
+    store_path = os.path.join(output_dir, ResourceStore.FILENAME)
+    if os.path.exists(store_path):
+        shared_resources = {resource["sourcedId"]: resource
+                            for resource in ResourceStore.load(output_dir).resources.values()}
+    
+    builder = SearchIndexBuilder(**options)
+    for course_file, course in latest_courses(output_dir):
+        course_id = os.path.basename(course_file)[len("course_"):-len(".json")]
+        syllabus_file = os.path.join(output_dir, f"syllabus_{course_id}.json")
+        if not os.path.exists(syllabus_file):
+            continue
+        
+        with open(syllabus_file, 'r', encoding='utf-8') as f:
+            syllabus = json.load(f)
+        builder.add_course(course, syllabus, shared_resources)
+    
+    return builder.save(output_dir, output_profile)
+
+class ConversionHooks:
+    """Instrumentation hooks called around each conversion stage
+    
+    Subclass and override what you need. Stages are "hash", "load",
+    "extract", "syllabus", "course" and "save"; metrics may carry "items",
+    "components", "resources", "bytesRead" and "bytesWritten".
+    """
+    
+    def on_stage_start(self, stage: str):
+        pass
+    
+    def on_stage_end(self, stage: str, metrics: Dict[str, Any]):
+        pass
+
+class StageProfiler(ConversionHooks):
+    """Records per-stage wall time, counts, I/O bytes and peak allocation"""
+    
+    def __init__(self, trace_memory: bool = True):
+        self.trace_memory = trace_memory
+        self.stages: List[Dict[str, Any]] = []
+        self._owns_tracing = False
+        self._started = 0.0
+        self._memory_at_start = 0
+    
+    def on_stage_start(self, stage: str):
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._owns_tracing = True
+            tracemalloc.reset_peak()
+            self._memory_at_start = tracemalloc.get_traced_memory()[0]
+        self._started = time.perf_counter()
+    
+    def on_stage_end(self, stage: str, metrics: Dict[str, Any]):
+        record = {"stage": stage, "wallTime": round(time.perf_counter() - self._started, 6)}
+        record.update(metrics)
+        if self.trace_memory:
+            record["peakAllocation"] = tracemalloc.get_traced_memory()[1] - self._memory_at_start
+        self.stages.append(record)
+    
+    def close(self):
+        """Stop memory tracing if this profiler started it"""
+        
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+    
+    def report(self) -> Dict[str, Any]:
+        totals = {"wallTime": round(sum(stage["wallTime"] for stage in self.stages), 6)}
+        for key in ("bytesRead", "bytesWritten"):
+            totals[key] = sum(stage.get(key, 0) for stage in self.stages)
+        if self.trace_memory:
+            totals["peakAllocation"] = max((stage["peakAllocation"] for stage in self.stages), default=0)
+        return {"stages": self.stages, "totals": totals}
 
 class KhanToTimeBackConverter:
     """Converts Khan Academy scraped content to TimeBack OneRoster format"""
     
-    def __init__(self, organization_id: str = "khan-academy-converted"):
+    def __init__(self, organization_id: str = "khan-academy-converted", output_profile: str = "pretty",
+                 hooks: Optional[ConversionHooks] = None, resource_store: Optional[ResourceStore] = None,
+                 shard_syllabus: bool = False):
+        if output_profile not in OUTPUT_PROFILES:
+            raise ValueError(f"Unknown output profile: {output_profile}")
         self.organization_id = organization_id
+        self.output_profile = output_profile
+        self.hooks = hooks
+        self.resource_store = resource_store
+        self.shard_syllabus = shard_syllabus
         self.base_url = "https://your-aws-domain.com/api"  # Will be replaced with actual AWS URL
         
-    def convert_khan_course(self, khan_json_path: str, output_dir: str) -> Dict[str, Any]:
-        """Convert a Khan Academy JSON file to TimeBack format"""
+    def convert_khan_course(self, khan_json_path: str, output_dir: str, streaming: bool = False,
+                            manifest: Optional[BuildManifest] = None,
+                            streaming_output: bool = False) -> Dict[str, Any]:
+        """Convert a Khan Academy JSON file to TimeBack format
+        
+        With streaming=True the input is parsed incrementally and each unit is
+        converted as soon as it is read, so peak memory is bounded by the
+        largest single unit instead of the whole file.
+        
+        With streaming_output=True (production profile only) each component is
+        written to disk as soon as it is converted and no syllabus is kept in
+        memory; the result's "syllabus" is then None.
         
-        # Load Khan Academy scraped content
-        with open(khan_json_path, 'r', encoding='utf-8') as f:
-            khan_data = json.load(f)
+        With a manifest, inputs whose content hash, converter version and
+        options match the previous build are skipped, and files produced by an
+        outdated conversion are removed once the new ones are written. The
+        caller is responsible for saving the manifest.
+        """
         
-        # Extract course data from GraphQL response
-        course_data = self._extract_course_data(khan_data)
+        if streaming_output and self.output_profile != "production":
+            raise ValueError("Streaming output requires the production output profile")
         
-        # Create TimeBack course structure
-        timeback_course = self._create_timeback_course(course_data)
+        if manifest is not None:
+            with self._stage("hash") as metrics:
+                content_hash = BuildManifest.hash_file(khan_json_path)
+                metrics["bytesRead"] = os.path.getsize(khan_json_path)
+            options = {
+                "organizationId": self.organization_id,
+                "outputProfile": self.output_profile,
+                "dedupeResources": self.resource_store is not None,
+                "shardSyllabus": self.shard_syllabus
+            }
+            
+            if manifest.is_current(khan_json_path, content_hash, options):
+                entry = manifest.get(khan_json_path)
+                return {
+                    "course": None,
+                    "syllabus": None,
+                    "output_files": entry["outputFiles"],
+                    "summary": entry["summary"],
+                    "skipped": True
+                }
+        
+        if streaming:
+            # Reading happens lazily, inside the syllabus (or save) stage
+            course_data = self._stream_course_data(khan_json_path)
+        else:
+            # Load Khan Academy scraped content
+            with self._stage("load") as metrics:
+                with open(khan_json_path, 'r', encoding='utf-8') as f:
+                    khan_data = json.load(f)
+                metrics["bytesRead"] = os.path.getsize(khan_json_path)
+            
+            # Extract course data from GraphQL response
+            with self._stage("extract") as metrics:
+                course_data = self._extract_course_data(khan_data)
+                metrics["items"] = len(course_data["units"])
         
-        # Create syllabus with components
-        syllabus = self._create_syllabus(course_data)
+        if streaming_output:
+            # Components go straight from each unit to disk
+            with self._stage("save") as metrics:
+                timeback_course, output_files, summary = self._save_streaming_files(course_data, output_dir)
+                syllabus = None
+                self._record_output_metrics(metrics, khan_json_path if streaming else None, summary, output_files)
+        else:
+            # Course fields may follow unitChildren in a streamed input, so
+            # drain the units through the syllabus before building the course
+            with self._stage("syllabus") as metrics:
+                syllabus = self._create_syllabus(course_data)
+                self._record_output_metrics(metrics, khan_json_path if streaming else None,
+                                            self._summarize_syllabus(syllabus))
+            
+            with self._stage("course"):
+                timeback_course = self._create_timeback_course(course_data)
+            
+            # Save converted files
+            with self._stage("save") as metrics:
+                output_files = self._save_converted_files(timeback_course, syllabus, output_dir)
+                if self.shard_syllabus:
+                    output_files["syllabus_shards_dir"] = self._save_syllabus_shards(timeback_course, syllabus, output_dir)
+                self._record_output_metrics(metrics, None, None, output_files)
+            summary = self._summarize(timeback_course, syllabus)
         
-        # Save converted files
-        output_files = self._save_converted_files(timeback_course, syllabus, output_dir)
+        if manifest is not None:
+            previous = manifest.get(khan_json_path)
+            if previous:
+                # Drop outputs of the previous conversion of this input
+                for path in set(previous.get("outputFiles", {}).values()) - set(output_files.values()):
+                    _remove_path(path)
+            manifest.record(khan_json_path, content_hash, options, output_files, summary)
         
         return {
             "course": timeback_course,
             "syllabus": syllabus,
-            "output_files": output_files
+            "output_files": output_files,
+            "summary": summary,
+            "skipped": False
+        }
+    
+    def _summarize(self, course: "TimeBackCourse", syllabus: "TimeBackSyllabus") -> Dict[str, Any]:
+        """Summarize a converted course for reporting"""
+        
+        return {
+            "title": course.title,
+            **self._summarize_syllabus(syllabus),
+            "gradeLevel": course.grade_level,
+            "subject": course.subject
         }
     
+    def _summarize_syllabus(self, syllabus: "TimeBackSyllabus") -> Dict[str, int]:
+        return {
+            "components": len(syllabus.components),
+            "resources": sum(len(component.resources) for component in syllabus.components)
+        }
+    
+    def _stage(self, name: str):
+        """Context manager around a conversion stage; yields a metrics dict for the hooks"""
+        
+        if self.hooks is None:
+            return nullcontext({})
+        return self._instrumented_stage(name)
+    
+    @contextmanager
+    def _instrumented_stage(self, name: str) -> Iterator[Dict[str, Any]]:
+        metrics: Dict[str, Any] = {}
+        self.hooks.on_stage_start(name)
+        try:
+            yield metrics
+        finally:
+            # A failing stage still ends, so hooks that hold resources can release them
+            self.hooks.on_stage_end(name, metrics)
+    
+    def _record_output_metrics(self, metrics: Dict[str, Any], streamed_input: Optional[str],
+                               counts: Optional[Dict[str, Any]], output_files: Optional[Dict[str, str]] = None):
+        """Fill stage metrics with item counts and I/O bytes, only when instrumented"""
+        
+        if self.hooks is None:
+            return
+        if streamed_input:
+            metrics["bytesRead"] = os.path.getsize(streamed_input)
+        if counts:
+            metrics["items"] = counts["resources"]
+            metrics["components"] = counts["components"]
+            metrics["resources"] = counts["resources"]
+        if output_files:
+            metrics["bytesWritten"] = sum(_path_size(path) for path in output_files.values())
+    
     def _extract_course_data(self, khan_data: Dict[str, Any]) -> Dict[str, Any]:
         """Extract course information from Khan Academy GraphQL response"""
         
@@ -60,82 +1099,104 @@ class KhanToTimeBackConverter:
                 # For single unit responses, wrap in array
                 units = [course] if "allOrderedChildren" in course else []
             
-            return {
-                "id": course.get("id", str(uuid.uuid4())),
-                "title": course.get("translatedTitle", "Khan Academy Course"),
-                "description": course.get("translatedDescription", ""),
-                "slug": course.get("slug", "khan-course"),
-                "iconPath": course.get("iconPath", ""),
-                "units": units,
-                "subject": self._determine_subject(course.get("slug", "")),
-                "gradeLevel": self._determine_grade_level(course.get("slug", ""))
-            }
+            return self._build_course_data(course, units)
             
         except KeyError as e:
             print(f"Warning: Could not extract course data - {e}")
-            # Return minimal structure
-            return {
-                "id": str(uuid.uuid4()),
-                "title": "Khan Academy Course",
-                "description": "Converted Khan Academy content",
-                "slug": "khan-course",
-                "iconPath": "",
-                "units": [],
-                "subject": "mathematics",
-                "gradeLevel": "6-8"
-            }
+            return self._default_course_data()
     
-    def _create_timeback_course(self, course_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Create TimeBack Course object"""
+    def _stream_course_data(self, khan_json_path: str) -> Dict[str, Any]:
+        """Extract course information incrementally from a Khan Academy GraphQL dump
         
-        course_id = str(uuid.uuid4())
+        The returned "units" entry is a generator that reads one unitChildren
+        entry at a time. The remaining course fields are filled in once it has
+        been exhausted.
+        """
+        
+        course_data: Dict[str, Any] = {}
+        
+        def units() -> Iterator[Dict[str, Any]]:
+            course: Dict[str, Any] = {}
+            with open(khan_json_path, 'r', encoding='utf-8') as f:
+                depth = yield from _iter_course_units(_JSONStreamReader(f), course)
+            
+            if depth < len(COURSE_PATH):
+                print(f"Warning: Could not extract course data - '{COURSE_PATH[depth]}'")
+                fields = self._default_course_data()
+            else:
+                if "unitChildren" not in course and "allOrderedChildren" in course:
+                    # For single unit responses, the course itself is the unit
+                    yield course
+                fields = self._build_course_data(course, [])
+            
+            del fields["units"]
+            course_data.update(fields)
+        
+        course_data["units"] = units()
+        return course_data
+    
+    def _build_course_data(self, course: Dict[str, Any], units: Any) -> Dict[str, Any]:
+        """Build the internal course structure from a Khan Academy course object"""
         
         return {
-            "sourcedId": course_id,
-            "status": "active",
-            "dateLastModified": datetime.now(timezone.utc).isoformat(),
-            "title": course_data["title"],
-            "courseCode": f"KHAN_{course_data['slug'].upper()}",
-            "grades": [course_data["gradeLevel"]],
-            "subjects": [course_data["subject"]],
-            "org": {
-                "sourcedId": self.organization_id,
-                "type": "org"
-            },
-            "schoolYear": {
-                "sourcedId": "2024-2025",
-                "type": "academicSession"
-            },
-            "metadata": {
-                "originalKhanId": course_data["id"],
-                "originalSlug": course_data["slug"],
-                "iconPath": course_data["iconPath"],
-                "convertedFrom": "Khan Academy",
-                "convertedAt": datetime.now(timezone.utc).isoformat()
-            }
+            "id": course.get("id", str(uuid.uuid4())),
+            "title": course.get("translatedTitle", "Khan Academy Course"),
+            "description": course.get("translatedDescription", ""),
+            "slug": course.get("slug", "khan-course"),
+            "iconPath": course.get("iconPath", ""),
+            "units": units,
+            "subject": self._determine_subject(course.get("slug", "")),
+            "gradeLevel": self._determine_grade_level(course.get("slug", ""))
         }
     
-    def _create_syllabus(self, course_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _default_course_data(self) -> Dict[str, Any]:
+        """Minimal course structure used when the input has no course data"""
+        
+        return {
+            "id": str(uuid.uuid4()),
+            "title": "Khan Academy Course",
+            "description": "Converted Khan Academy content",
+            "slug": "khan-course",
+            "iconPath": "",
+            "units": [],
+            "subject": "mathematics",
+            "gradeLevel": "6-8"
+        }
+    
+    def _create_timeback_course(self, course_data: Dict[str, Any]) -> "TimeBackCourse":
+        """Create TimeBack Course object"""
+        
+        now = datetime.now(timezone.utc).isoformat()
+        
+        return TimeBackCourse(
+            sourced_id=str(uuid.uuid4()),
+            title=course_data["title"],
+            slug=course_data["slug"],
+            grade_level=course_data["gradeLevel"],
+            subject=course_data["subject"],
+            organization_id=self.organization_id,
+            khan_id=course_data["id"],
+            icon_path=course_data["iconPath"],
+            date_last_modified=now,
+            converted_at=now,
+            description=course_data.get("description", "")
+        )
+    
+    def _create_syllabus(self, course_data: Dict[str, Any]) -> "TimeBackSyllabus":
         """Create TimeBack Syllabus with components"""
         
         course_id = str(uuid.uuid4())
-        components = []
+        components = list(self._iter_components(course_data))
         
-        # Convert each Khan Academy unit to a TimeBack component
-        for unit_index, unit in enumerate(course_data["units"]):
-            component = self._convert_unit_to_component(unit, unit_index)
-            components.append(component)
+        return TimeBackSyllabus(course_id, course_data["title"], course_data["gradeLevel"], components)
+    
+    def _iter_components(self, course_data: Dict[str, Any]) -> Iterator["TimeBackComponent"]:
+        """Convert each Khan Academy unit to a TimeBack component as it is reached"""
         
-        return {
-            "course": {
-                "sourcedId": course_id,
-                "title": course_data["title"],
-                "grades": [course_data["gradeLevel"]]
-            },
-            "subComponents": components
-        }
+        for unit_index, unit in enumerate(course_data["units"]):
+            yield self._convert_unit_to_component(unit, unit_index)
     
-    def _convert_unit_to_component(self, unit: Dict[str, Any], index: int) -> Dict[str, Any]:
+    def _convert_unit_to_component(self, unit: Dict[str, Any], index: int) -> "TimeBackComponent":
         """Convert Khan Academy unit to TimeBack component"""
         
         component_id = str(uuid.uuid4())
@@ -148,21 +1209,21 @@ class KhanToTimeBackConverter:
                 if resource:
                     resources.append(resource)
         
-        return {
-            "sourcedId": component_id,
-            "title": unit.get("translatedTitle", f"Unit {index + 1}"),
-            "sortOrder": index,
-            "subComponents": [],  # Khan units don't typically have sub-components
-            "componentResources": resources,
-            "metadata": {
-                "originalKhanId": unit.get("id", ""),
-                "originalSlug": unit.get("slug", ""),
-                "unitType": "unit"
-            }
-        }
+        return TimeBackComponent(
+            sourced_id=component_id,
+            title=unit.get("translatedTitle", f"Unit {index + 1}"),
+            sort_order=index,
+            resources=resources,
+            khan_id=unit.get("id", ""),
+            slug=unit.get("slug", "")
+        )
     
-    def _convert_content_to_resource(self, content: Dict[str, Any], index: int) -> Optional[Dict[str, Any]]:
-        """Convert Khan Academy content item to TimeBack resource"""
+    def _convert_content_to_resource(self, content: Dict[str, Any], index: int) -> Optional[Any]:
+        """Convert Khan Academy content item to TimeBack resource
+        
+        With a resource store, content seen before (in this or any other
+        course) is not converted again; a TimeBackResourceRef is returned.
+        """
         
         content_kind = content.get("contentKind", "")
         content_type = content.get("__typename", "")
@@ -170,78 +1231,44 @@ class KhanToTimeBackConverter:
         if not content_kind and not content_type:
             return None
         
-        resource_id = str(uuid.uuid4())
-        resource_metadata = self._create_resource_metadata(content)
+        store = self.resource_store
+        key = ResourceStore.key_for(content) if store is not None else ""
+        if not key:
+            return self._build_resource(content, index, str(uuid.uuid4()))
         
-        return {
-            "sourcedId": resource_id,
-            "title": content.get("translatedTitle", content.get("title", f"Content {index + 1}")),
-            "sortOrder": index,
-            "resource": {
-                "sourcedId": resource_id,
-                "status": "active",
-                "title": content.get("translatedTitle", content.get("title", f"Content {index + 1}")),
-                "vendorResourceId": content.get("id", ""),
-                "metadata": resource_metadata
-            }
-        }
-    
-    def _create_resource_metadata(self, content: Dict[str, Any]) -> Dict[str, Any]:
-        """Create resource metadata based on Khan Academy content type"""
+        resource_id = ResourceStore.resource_id(key)
+        if key not in store:
+            store.add(key, self._build_resource(content, index, resource_id).to_dict()["resource"])
         
-        content_kind = content.get("contentKind", "").lower()
-        content_type = content.get("__typename", "").lower()
+        return TimeBackResourceRef(
+            sourced_id=str(uuid.uuid4()),
+            resource_id=resource_id,
+            title=content.get("translatedTitle", content.get("title", f"Content {index + 1}")),
+            sort_order=index
+        )
+    
+    def _build_resource(self, content: Dict[str, Any], index: int, resource_id: str) -> "TimeBackResource":
+        """Build the full resource model for a content item"""
         
-        metadata = {
-            "originalKhanType": content_kind or content_type,
-            "originalKhanId": content.get("id", ""),
-            "description": content.get("translatedDescription", ""),
-            "canonicalUrl": content.get("canonicalUrl", ""),
-        }
+        khan_type, resource_type, sub_type = classify_content(content.get("contentKind", ""), content.get("__typename", ""))
         
-        # Add time estimates if available
+        estimated_duration = None
         if "timeEstimate" in content:
             time_est = content["timeEstimate"]
-            metadata["estimatedDuration"] = {
-                "lowerBound": time_est.get("lowerBound", 0),
-                "upperBound": time_est.get("upperBound", 0)
-            }
+            estimated_duration = (time_est.get("lowerBound", 0), time_est.get("upperBound", 0))
         
-        # Determine TimeBack resource type and URL
-        if content_kind == "video" or content_type == "video":
-            metadata["type"] = "video"
-            metadata["subType"] = "educational-video"
-            # Use Khan Academy's video URL or construct YouTube URL
-            if content.get("canonicalUrl"):
-                metadata["url"] = f"https://www.khanacademy.org{content['canonicalUrl']}"
-            
-        elif content_kind == "exercise" or content_type == "exercise":
-            metadata["type"] = "qti-assessment"
-            metadata["subType"] = "qti-test"
-            # Create URL to exercise
-            if content.get("canonicalUrl"):
-                metadata["url"] = f"https://www.khanacademy.org{content['canonicalUrl']}"
-            
-        elif content_kind == "article" or content_type == "article":
-            metadata["type"] = "text"
-            metadata["subType"] = "article"
-            if content.get("canonicalUrl"):
-                metadata["url"] = f"https://www.khanacademy.org{content['canonicalUrl']}"
-            
-        elif content_kind == "quiz" or content_type == "topicquiz":
-            metadata["type"] = "qti-assessment"
-            metadata["subType"] = "qti-quiz"
-            if content.get("canonicalUrl"):
-                metadata["url"] = f"https://www.khanacademy.org{content['canonicalUrl']}"
-            
-        else:
-            # Default to text content
-            metadata["type"] = "text"
-            metadata["subType"] = "general-content"
-            if content.get("canonicalUrl"):
-                metadata["url"] = f"https://www.khanacademy.org{content['canonicalUrl']}"
-        
-        return metadata
+        return TimeBackResource(
+            sourced_id=resource_id,
+            title=content.get("translatedTitle", content.get("title", f"Content {index + 1}")),
+            sort_order=index,
+            khan_id=content.get("id", ""),
+            khan_type=khan_type,
+            description=content.get("translatedDescription", ""),
+            canonical_url=content.get("canonicalUrl", ""),
+            estimated_duration=estimated_duration,
+            resource_type=resource_type,
+            sub_type=sub_type
+        )
     
     def _determine_subject(self, slug: str) -> str:
         """Determine subject from Khan Academy slug"""
@@ -269,9 +1296,16 @@ class KhanToTimeBackConverter:
         else:
             return "6-8"  # Default
     
-    def _save_converted_files(self, course: Dict[str, Any], syllabus: Dict[str, Any], output_dir: str) -> Dict[str, str]:
+    def _save_converted_files(self, course: "TimeBackCourse", syllabus: "TimeBackSyllabus", output_dir: str) -> Dict[str, str]:
         """Save converted TimeBack files"""
         
+        # Models become plain dicts only here, at serialization time
+        course = course.to_dict()
+        syllabus = syllabus.to_dict()
+        
+        if self.output_profile == "production":
+            return self._save_production_files(course, syllabus, output_dir)
+        
         os.makedirs(output_dir, exist_ok=True)
         
         # Save course file
@@ -301,44 +1335,477 @@ class KhanToTimeBackConverter:
             "syllabus_file": syllabus_file,
             "combined_file": combined_file
         }
+    
+    def _save_production_files(self, course: Dict[str, Any], syllabus: Dict[str, Any], output_dir: str) -> Dict[str, str]:
+        """Save compact TimeBack files plus precompressed siblings
+        
+        The course and syllabus are each encoded once; the combined file is
+        assembled from those bytes instead of encoding both objects again.
+        """
+        
+        os.makedirs(output_dir, exist_ok=True)
+        
+        course_bytes = encode_json(course, "production")
+        # Components are encoded one by one to record their byte ranges; the
+        # assembled bytes are identical to encoding the syllabus in one go
+        syllabus_header = encode_json(syllabus["course"], "production")
+        offsets = _SyllabusOffsetIndex()
+        parts = []
+        for component in syllabus["subComponents"]:
+            parts.append(encode_json(component, "production"))
+            offsets.add(component["sourcedId"], len(parts[-1]))
+        syllabus_bytes = b"".join([b'{"course":', syllabus_header, b',"subComponents":[',
+                                   b",".join(parts), b"]}"])
+        del parts
+        combined_bytes = b"".join([
+            b'{"course":', course_bytes,
+            b',"syllabus":', syllabus_bytes,
+            b',"convertedAt":', encode_json(datetime.now(timezone.utc).isoformat(), "production"),
+            b',"version":"1.0"}'
+        ])
+        
+        output_files = {}
+        for name, prefix, data in (("course_file", "course", course_bytes),
+                                   ("syllabus_file", "syllabus", syllabus_bytes),
+                                   ("combined_file", "timeback_course", combined_bytes)):
+            path = os.path.join(output_dir, f"{prefix}_{course['sourcedId']}.json")
+            output_files[name] = path
+            for encoding, sibling in write_artifact(path, [data]).items():
+                output_files[f"{name}_{encoding}"] = sibling
+        
+        output_files["syllabus_offsets_file"] = self._save_syllabus_offsets(
+            offsets, syllabus_header, output_dir, course["sourcedId"])
+        return output_files
+    
+    def _save_syllabus_offsets(self, offsets: "_SyllabusOffsetIndex", syllabus_header: bytes,
+                               output_dir: str, course_id: str) -> str:
+        offsets_file = os.path.join(output_dir, f"syllabus_{course_id}.offsets.json")
+        with open(offsets_file, 'wb') as f:
+            f.write(encode_json(offsets.to_dict(syllabus_header), "production"))
+        return offsets_file
+    
+    def _save_syllabus_shards(self, course: "TimeBackCourse", syllabus: "TimeBackSyllabus", output_dir: str) -> str:
+        """Write the sharded syllabus layout next to the monolithic syllabus file"""
+        
+        shard_dir = os.path.join(output_dir, f"syllabus_{course.sourced_id}")
+        if os.path.isdir(shard_dir):
+            shutil.rmtree(shard_dir)
+        
+        writer = _SyllabusShardWriter(shard_dir, self.output_profile)
+        for component in syllabus.components:
+            writer.add(component)
+        writer.finish(syllabus.to_dict()["course"])
+        return shard_dir
+    
+    def _save_streaming_files(self, course_data: Dict[str, Any],
+                              output_dir: str) -> Tuple["TimeBackCourse", Dict[str, str], Dict[str, Any]]:
+        """Convert and write the syllabus one component at a time
+        
+        Components are encoded as they are produced and spooled to a temporary
+        file, because the syllabus header (title, grades) may only be known
+        once a streamed input has been read to the end. The spool is then
+        copied into the syllabus and combined files in chunks, so memory stays
+        flat regardless of course size. The bytes match _save_production_files.
+        """
+        
+        os.makedirs(output_dir, exist_ok=True)
+        
+        syllabus_id = str(uuid.uuid4())
+        spool_file = os.path.join(output_dir, f".syllabus_{syllabus_id}.parts")
+        # The shard directory is named after the course, which isn't known yet
+        spool_shard_dir = os.path.join(output_dir, f".syllabus_{syllabus_id}.shards")
+        shard_writer = _SyllabusShardWriter(spool_shard_dir, "production") if self.shard_syllabus else None
+        offsets = _SyllabusOffsetIndex()
+        component_count = resource_count = 0
+        
+        try:
+            with open(spool_file, 'wb') as f:
+                for component in self._iter_components(course_data):
+                    data = encode_json(component.to_dict(), "production")
+                    if component_count:
+                        f.write(b",")
+                    f.write(data)
+                    offsets.add(component.sourced_id, len(data))
+                    if shard_writer is not None:
+                        shard_writer.add(component, data)
+                    component_count += 1
+                    resource_count += len(component.resources)
+            
+            course = self._create_timeback_course(course_data)
+            course_bytes = encode_json(course.to_dict(), "production")
+            header = {
+                "sourcedId": syllabus_id,
+                "title": course_data["title"],
+                "grades": [course_data["gradeLevel"]]
+            }
+            syllabus_header = encode_json(header, "production")
+            
+            def syllabus_chunks() -> Iterator[bytes]:
+                yield b'{"course":' + syllabus_header + b',"subComponents":['
+                yield from _read_chunks(spool_file)
+                yield b"]}"
+            
+            def combined_chunks() -> Iterator[bytes]:
+                yield b'{"course":' + course_bytes + b',"syllabus":'
+                yield from syllabus_chunks()
+                yield (b',"convertedAt":' + encode_json(datetime.now(timezone.utc).isoformat(), "production")
+                       + b',"version":"1.0"}')
+            
+            output_files = {}
+            for name, prefix, chunks in (("course_file", "course", [course_bytes]),
+                                         ("syllabus_file", "syllabus", syllabus_chunks()),
+                                         ("combined_file", "timeback_course", combined_chunks())):
+                path = os.path.join(output_dir, f"{prefix}_{course.sourced_id}.json")
+                output_files[name] = path
+                for encoding, sibling in write_artifact(path, chunks).items():
+                    output_files[f"{name}_{encoding}"] = sibling
+            output_files["syllabus_offsets_file"] = self._save_syllabus_offsets(
+                offsets, syllabus_header, output_dir, course.sourced_id)
+            
+            if shard_writer is not None:
+                shard_writer.finish(header)
+                shard_dir = os.path.join(output_dir, f"syllabus_{course.sourced_id}")
+                os.replace(spool_shard_dir, shard_dir)
+                output_files["syllabus_shards_dir"] = shard_dir
+        finally:
+            _remove_path(spool_file)
+            _remove_path(spool_shard_dir)
+        
+        summary = {
+            "title": course.title,
+            "components": component_count,
+            "resources": resource_count,
+            "gradeLevel": course.grade_level,
+            "subject": course.subject
+        }
+        return course, output_files, summary
+
+def expand_inputs(patterns: List[str]) -> List[str]:
+    """Expand files, directories and glob patterns into a sorted list of JSON inputs"""
+    
+    inputs: List[str] = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "*.json")))
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        
+        for match in matches:
+            if match not in inputs:
+                inputs.append(match)
+    return inputs
+
+def _convert_batch_item(job: Tuple[str, str, Dict[str, Any], Dict[str, bool],
+                                   Optional[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert one input inside a batch worker and report a picklable result
+    
+    Workers never write the build manifest or resource store themselves.
+    They get the previous manifest entry for their input (when incremental)
+    and the keys already in the resource store, so only resources it does
+    not hold yet are converted. New manifest entries and new resources go
+    back to the parent, which merges them and saves both once.
+    """
+    
+    input_file, output_dir, converter_options, streaming_options, manifest_entry, worker_options = job
+    profiler = StageProfiler() if worker_options["profile"] else None
+    known_resources = worker_options["known_resources"]
+    store = ResourceStore(output_dir, known=known_resources) if known_resources is not None else None
+    converter = KhanToTimeBackConverter(hooks=profiler, resource_store=store, **converter_options)
+    manifest = None
+    if manifest_entry is not None:
+        entries = {BuildManifest.key(input_file): manifest_entry} if manifest_entry else {}
+        manifest = BuildManifest(output_dir, entries)
+    started = time.perf_counter()
+    
+    try:
+        result = converter.convert_khan_course(input_file, output_dir, manifest=manifest, **streaming_options)
+    except Exception as e:
+        return {
+            "input": input_file,
+            "status": "failed",
+            "error": f"{type(e).__name__}: {e}",
+            "wallTime": round(time.perf_counter() - started, 4)
+        }
+    finally:
+        if profiler is not None:
+            profiler.close()
+    
+    item = {
+        "input": input_file,
+        "status": "skipped" if result["skipped"] else "success",
+        "components": result["summary"]["components"],
+        "resources": result["summary"]["resources"],
+        "wallTime": round(time.perf_counter() - started, 4),
+        "outputFiles": result["output_files"],
+        "manifestEntry": manifest.get(input_file) if manifest is not None else None,
+        "newResources": store.new_resources() if store is not None else None
+    }
+    if profiler is not None:
+        item["profile"] = profiler.report()
+    return item
+
+def convert_batch(input_files: List[str], output_dir: str, workers: Optional[int] = None,
+                  organization_id: str = "khan-academy-converted", streaming: bool = False,
+                  incremental: bool = False, output_profile: str = "pretty",
+                  streaming_output: bool = False, profile: bool = False,
+                  dedupe_resources: bool = False, shard_syllabus: bool = False) -> Dict[str, Any]:
+    """Convert many Khan Academy files in parallel and write a batch summary
+    
+    Files are spread over a process pool, one file per task. A failing file
+    is recorded in the summary and does not stop the rest of the batch.
+    With incremental=True, inputs unchanged since the last build are skipped.
+    With profile=True, each file's result carries its per-stage profile.
+    With dedupe_resources=True, resources shared between inputs are stored
+    once in the output directory's ResourceStore.
+    """
+    
+    os.makedirs(output_dir, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(input_files) or 1))
+    manifest = BuildManifest.load(output_dir) if incremental else None
+    converter_options = {"organization_id": organization_id, "output_profile": output_profile,
+                         "shard_syllabus": shard_syllabus}
+    streaming_options = {"streaming": streaming, "streaming_output": streaming_output}
+    # The store is read and written once per batch; workers only get its keys
+    store = ResourceStore.load(output_dir) if dedupe_resources else None
+    worker_options = {"profile": profile,
+                      "known_resources": frozenset(store.resources) if store is not None else None}
+    jobs = [(input_file, output_dir, converter_options, streaming_options,
+             (manifest.get(input_file) or {}) if manifest is not None else None, worker_options)
+            for input_file in input_files]
+    started = time.perf_counter()
+    
+    if workers == 1:
+        results = [_convert_batch_item(job) for job in jobs]
+    else:
+        results_by_input: Dict[str, Dict[str, Any]] = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_convert_batch_item, job): job[0] for job in jobs}
+            for future in as_completed(futures):
+                results_by_input[futures[future]] = future.result()
+        results = [results_by_input[input_file] for input_file in input_files]
+    
+    for result in results:
+        entry = result.pop("manifestEntry", None)
+        if manifest is not None and entry:
+            manifest.entries[BuildManifest.key(result["input"])] = entry
+        new_resources = result.pop("newResources", None)
+        if store is not None and new_resources:
+            store.merge(new_resources)
+    if manifest is not None:
+        manifest.save()
+    if store is not None:
+        store.save(output_profile)
+    
+    summary = {
+        "workers": workers,
+        "wallTime": round(time.perf_counter() - started, 4),
+        "succeeded": sum(1 for r in results if r["status"] == "success"),
+        "skipped": sum(1 for r in results if r["status"] == "skipped"),
+        "failed": sum(1 for r in results if r["status"] == "failed"),
+        "files": results
+    }
+    
+    summary_file = os.path.join(output_dir, "batch_summary.json")
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    summary["summaryFile"] = summary_file
+    
+    return summary
+
+def write_profile(path: str, profile: Dict[str, Any]):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+
+def print_profile(profile: Dict[str, Any]):
+    """Print a per-stage profile table"""
+    
+    print(f"\n⏱️  Stage Profile:")
+    for stage in profile["stages"]:
+        line = f"   {stage['stage']:<9} {stage['wallTime'] * 1000:9.1f} ms"
+        if "items" in stage:
+            line += f"  {stage['items']:>8} items"
+        if "bytesRead" in stage:
+            line += f"  {stage['bytesRead'] / 1e6:8.2f} MB read"
+        if "bytesWritten" in stage:
+            line += f"  {stage['bytesWritten'] / 1e6:8.2f} MB written"
+        if "peakAllocation" in stage:
+            line += f"  {stage['peakAllocation'] / 1e6:8.2f} MB peak"
+        print(line)
+
+def print_catalog(catalog: Dict[str, Any]):
+    print(f"\n📚 Catalog: {catalog['courseCount']} courses (version {catalog['version']})")
+
+def print_search_index(stats: Dict[str, Any]):
+    print(f"\n🔎 Search index: {stats['documents']} documents, {stats['terms']} terms "
+          f"from {stats['courses']} courses")
+
+def refresh_catalog(args: argparse.Namespace, converted: bool):
+    """Rebuild the catalog once per CLI run, only when a course was written or none exists yet"""
+    
+    if args.no_catalog:
+        return
+    if converted or not os.path.exists(os.path.join(args.output_dir, CourseCatalog.FILENAME)):
+        print_catalog(CourseCatalog.build(args.output_dir, args.output_profile))
+
+def run_batch(args: argparse.Namespace):
+    """Run the CLI batch mode and print per-file results"""
+    
+    input_files = expand_inputs(args.input_file)
+    if not input_files:
+        print("❌ No input files matched")
+        raise SystemExit(1)
+    
+    print(f"Converting {len(input_files)} files to TimeBack format...")
+    summary = convert_batch(input_files, args.output_dir, workers=args.workers,
+                            organization_id=args.org_id, streaming=args.stream,
+                            incremental=args.incremental, output_profile=args.output_profile,
+                            streaming_output=args.stream_output, profile=args.profile,
+                            dedupe_resources=args.dedupe_resources, shard_syllabus=args.shard_syllabus)
+    
+    for result in summary["files"]:
+        if result["status"] == "success":
+            print(f"✅ {result['input']}: {result['components']} components, "
+                  f"{result['resources']} resources ({result['wallTime']:.2f}s)")
+        elif result["status"] == "skipped":
+            print(f"⏭️  {result['input']}: unchanged")
+        else:
+            print(f"❌ {result['input']}: {result['error']}")
+    
+    print(f"\n📊 Batch Summary:")
+    print(f"   Succeeded: {summary['succeeded']}")
+    print(f"   Skipped (unchanged): {summary['skipped']}")
+    print(f"   Failed: {summary['failed']}")
+    print(f"   Workers: {summary['workers']}")
+    print(f"   Wall time: {summary['wallTime']:.2f}s")
+    print(f"📄 Summary file: {summary['summaryFile']}")
+    
+    if args.profile:
+        profile_file = args.profile_output or os.path.join(args.output_dir, "conversion_profile.json")
+        write_profile(profile_file, {r["input"]: r["profile"] for r in summary["files"] if "profile" in r})
+        print(f"📄 Profile file: {profile_file}")
+    
+    refresh_catalog(args, converted=summary["succeeded"] > 0)
+    if args.search_index:
+        print_search_index(build_search_index(args.output_dir, args.output_profile))
+    
+    if summary["failed"]:
+        raise SystemExit(1)
 
 def main():
     """Command line interface for the converter"""
     
     parser = argparse.ArgumentParser(description="Convert Khan Academy content to TimeBack format")
-    parser.add_argument("input_file", help="Path to Khan Academy JSON file")
+    parser.add_argument("input_file", nargs="+",
+                        help="Path to Khan Academy JSON file (with --batch: files, directories or globs)")
     parser.add_argument("output_dir", help="Output directory for converted files")
     parser.add_argument("--org-id", default="khan-academy-converted", help="Organization ID for TimeBack")
+    parser.add_argument("--stream", action="store_true",
+                        help="Parse the input incrementally, one unit at a time (bounded memory for very large dumps)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Convert every matched input in parallel and write batch_summary.json")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for --batch (default: number of CPUs)")
+    parser.add_argument("--output-profile", choices=OUTPUT_PROFILES, default="pretty",
+                        help="pretty: indented JSON for debugging; production: compact JSON with .gz/.br siblings")
+    parser.add_argument("--stream-output", action="store_true",
+                        help="Write syllabus components to disk as they are converted (requires --output-profile production)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record per-stage timings, counts, I/O bytes and peak allocation as JSON")
+    parser.add_argument("--profile-output", default=None,
+                        help="Where to write the profile JSON (default: <output_dir>/conversion_profile.json)")
+    parser.add_argument("--cprofile", default=None, metavar="PATH",
+                        help="Also dump cProfile stats for the conversion to PATH (single-file mode)")
+    parser.add_argument("--dedupe-resources", action="store_true",
+                        help=f"Store each Khan resource once in <output_dir>/{ResourceStore.FILENAME} "
+                             "and reference it from syllabi")
+    parser.add_argument("--shard-syllabus", action="store_true",
+                        help="Also write syllabus_<id>/index.json plus one shard per component for lazy loading")
+    parser.add_argument("--search-index", action="store_true",
+                        help=f"Rebuild the full-text search index in <output_dir>/{SearchIndexBuilder.DIRNAME} "
+                             "from every converted course")
+    parser.add_argument("--no-catalog", action="store_true",
+                        help=f"Don't rebuild <output_dir>/{CourseCatalog.FILENAME}, which reads every converted course; "
+                             "use when converting many files one at a time and let the last run (or --batch) build it")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"Skip inputs unchanged since the last run, tracked in <output_dir>/{BuildManifest.FILENAME}")
     
     args = parser.parse_args()
     
+    if args.stream_output and args.output_profile != "production":
+        parser.error("--stream-output requires --output-profile production")
+    
+    if args.batch:
+        if args.cprofile:
+            parser.error("--cprofile is only supported for single-file conversion")
+        run_batch(args)
+        return
+    
+    if len(args.input_file) > 1:
+        parser.error("multiple inputs require --batch")
+    args.input_file = args.input_file[0]
+    
     # Create converter
-    converter = KhanToTimeBackConverter(organization_id=args.org_id)
+    profiler = StageProfiler() if args.profile else None
+    store = ResourceStore.load(args.output_dir) if args.dedupe_resources else None
+    converter = KhanToTimeBackConverter(organization_id=args.org_id, output_profile=args.output_profile,
+                                        hooks=profiler, resource_store=store, shard_syllabus=args.shard_syllabus)
     
     # Convert the file
     print(f"Converting {args.input_file} to TimeBack format...")
     
     try:
-        result = converter.convert_khan_course(args.input_file, args.output_dir)
+        manifest = BuildManifest.load(args.output_dir) if args.incremental else None
+        cprofiler = cProfile.Profile() if args.cprofile else None
+        if cprofiler is not None:
+            cprofiler.enable()
+        try:
+            result = converter.convert_khan_course(args.input_file, args.output_dir,
+                                                   streaming=args.stream, manifest=manifest,
+                                                   streaming_output=args.stream_output)
+        finally:
+            if cprofiler is not None:
+                cprofiler.disable()
+                cprofiler.dump_stats(args.cprofile)
+            if profiler is not None:
+                profiler.close()
+        if manifest is not None:
+            manifest.save()
+        if store is not None and store.added:
+            store.save(args.output_profile)
         
-        print(f"✅ Conversion successful!")
+        if result['skipped']:
+            print(f"⏭️  Input unchanged since last conversion, skipped")
+        else:
+            print(f"✅ Conversion successful!")
         print(f"📁 Output files saved to: {args.output_dir}")
         print(f"📄 Course file: {result['output_files']['course_file']}")
         print(f"📄 Syllabus file: {result['output_files']['syllabus_file']}")
         print(f"📄 Combined file: {result['output_files']['combined_file']}")
+        if 'syllabus_shards_dir' in result['output_files']:
+            print(f"📄 Syllabus shards: {result['output_files']['syllabus_shards_dir']}")
         
         # Print summary
-        course = result['course']
-        syllabus = result['syllabus']
-        component_count = len(syllabus['subComponents'])
-        resource_count = sum(len(comp.get('componentResources', [])) for comp in syllabus['subComponents'])
+        summary = result['summary']
         
         print(f"\n📊 Conversion Summary:")
-        print(f"   Course: {course['title']}")
-        print(f"   Components: {component_count}")
-        print(f"   Resources: {resource_count}")
-        print(f"   Grade Level: {course['grades'][0]}")
-        print(f"   Subject: {course['subjects'][0]}")
+        print(f"   Course: {summary['title']}")
+        print(f"   Components: {summary['components']}")
+        print(f"   Resources: {summary['resources']}")
+        print(f"   Grade Level: {summary['gradeLevel']}")
+        print(f"   Subject: {summary['subject']}")
+        
+        if profiler is not None:
+            profile_file = args.profile_output or os.path.join(args.output_dir, "conversion_profile.json")
+            write_profile(profile_file, profiler.report())
+            print_profile(profiler.report())
+            print(f"📄 Profile file: {profile_file}")
+        if args.cprofile:
+            print(f"📄 cProfile stats: {args.cprofile}")
+        refresh_catalog(args, converted=not result['skipped'])
+        if args.search_index:
+            print_search_index(build_search_index(args.output_dir, args.output_profile))
         
     except Exception as e:
         print(f"❌ Conversion failed: {e}")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+TimeBack Lambda Cold-Start Harness
+
+Writes the handler generated by AWSTimeBackHosting to a scratch directory
+and loads it in fresh Python processes, reporting module init time and the
+first (cold) and second (warm) invocation of each route - the split Lambda
+reports as Init Duration and Duration.
+
+Routes that read content need AWS credentials, or AWS_ENDPOINT_URL pointing
+at an S3-compatible stand-in; /health and /orgs run without either.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import argparse
+from typing import List, Dict, Any
+
+from aws_hosting_setup import AWSTimeBackHosting, proxy_event
+
+# Runs inside each fresh interpreter; argv[1] is the code directory, argv[2] the events
+CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import index
+init = time.perf_counter() - started
+routes = []
+for event in json.loads(sys.argv[2]):
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        response = index.lambda_handler(event, None)
+        timings.append(time.perf_counter() - started)
+    routes.append({"route": event["path"], "status": response["statusCode"], "cold": timings[0], "warm": timings[1]})
+print(json.dumps({"init": init, "routes": routes}))
+"""
+
+def _import_breakdown(stderr: str, top: int) -> List[Dict[str, Any]]:
+    """Heaviest top-level imports from python -X importtime output"""
+    
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented below the one that triggered them
+        if not name[1:].startswith(" "):
+            imports.append({"module": name.strip(), "cumulativeMs": int(cumulative) / 1000})
+    return sorted(imports, key=lambda entry: -entry["cumulativeMs"])[:top]
+
+def measure_cold_starts(routes: List[str], runs: int = 10, import_breakdown: bool = False,
+                        hosting: AWSTimeBackHosting = None) -> Dict[str, Any]:
+    """Start the generated handler runs times in fresh interpreters and summarize the timings"""
+    
+    hosting = hosting or AWSTimeBackHosting()
+    env = dict(os.environ)
+    env.setdefault("CONTENT_BUCKET", "local-content")
+    env.setdefault("METADATA_TABLE", "local-metadata")
+    env.setdefault("AWS_DEFAULT_REGION", hosting.region)
+    events = json.dumps([proxy_event("GET", route) for route in routes])
+    samples = []
+    breakdown = []
+    
+    with tempfile.TemporaryDirectory() as code_dir:
+        with open(os.path.join(code_dir, "index.py"), 'w', encoding='utf-8') as f:
+            f.write(hosting._get_lambda_code())
+        
+        for run in range(runs + import_breakdown):
+            command = [sys.executable, "-B"]
+            # Only the first run pays for import tracing, so it doesn't skew the others
+            if import_breakdown and run == 0:
+                command += ["-X", "importtime"]
+            completed = subprocess.run(command + ["-c", CHILD_SCRIPT, code_dir, events],
+                                       capture_output=True, text=True, env=env, check=True)
+            if import_breakdown and run == 0:
+                breakdown = _import_breakdown(completed.stderr, 10)
+                continue
+            samples.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    
+    def summarize(values: List[float]) -> Dict[str, float]:
+        values = [value * 1000 for value in values]
+        return {"medianMs": round(statistics.median(values), 3), "minMs": round(min(values), 3),
+                "maxMs": round(max(values), 3)}
+    
+    report = {
+        "runs": len(samples),
+        "codeBytes": len(hosting._get_lambda_code().encode("utf-8")),
+        "init": summarize([sample["init"] for sample in samples]),
+        "routes": [{
+            "route": route,
+            "status": samples[-1]["routes"][index]["status"],
+            "cold": summarize([sample["routes"][index]["cold"] for sample in samples]),
+            "warm": summarize([sample["routes"][index]["warm"] for sample in samples])
+        } for index, route in enumerate(routes)]
+    }
+    if import_breakdown:
+        report["imports"] = breakdown
+    return report
+
+def main():
+    """Command line interface for the cold-start harness"""
+    
+    parser = argparse.ArgumentParser(description="Measure cold-start init time of the generated TimeBack Lambda")
+    parser.add_argument("--routes", nargs="+", default=["/health", "/orgs"],
+                        help="Routes invoked after init, e.g. /courses/ID (default: /health /orgs)")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters to start; medians are reported")
+    parser.add_argument("--import-breakdown", action="store_true",
+                        help="Also list the heaviest imports (one extra run under -X importtime)")
+    parser.add_argument("--output", default=None, help="Also write the report as JSON")
+    
+    args = parser.parse_args()
+    
+    print(f"⏱️  Measuring cold starts ({args.runs} runs)...")
+    report = measure_cold_starts(args.routes, args.runs, args.import_breakdown)
+    
+    init = report["init"]
+    print(f"\n📊 Init: {init['medianMs']:.1f} ms median ({init['minMs']:.1f}-{init['maxMs']:.1f} ms), "
+          f"{report['codeBytes']} bytes of handler code")
+    for route in report["routes"]:
+        print(f"   {route['route']:<30} {route['status']}  cold {route['cold']['medianMs']:8.2f} ms  "
+              f"warm {route['warm']['medianMs']:8.2f} ms")
+    for entry in report.get("imports", []):
+        print(f"   import {entry['module']:<24} {entry['cumulativeMs']:8.1f} ms")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Results saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
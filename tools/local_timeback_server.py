@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Local TimeBack API Server
+
+Runs the lambda_handler generated by AWSTimeBackHosting behind a small
+asyncio HTTP front end, with S3 and DynamoDB stand-ins backed by a
+converter output directory. Lets the handler, its caching and its routes
+be exercised (and load-tested with timeback_load_test.py) without
+deploying anything.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import random
+import re
+import threading
+import types
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import List, Dict, Any, Optional, Tuple
+
+from aws_hosting_setup import AWSTimeBackHosting, proxy_event
+from metadata_loader import iter_metadata_items, to_dynamodb
+
+class StandInError(Exception):
+    """Error shaped like botocore's ClientError (error code in .response)"""
+    
+    def __init__(self, code: str, message: str = ""):
+        super().__init__(f"{code}: {message}" if message else code)
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+class LocalS3:
+    """get_object over a converter output directory, addressed by logical key
+    
+    There is no content manifest, so the handler reads logical keys directly,
+    as it does for a bucket published before manifests existed.
+    """
+    
+    class exceptions:
+        class NoSuchKey(StandInError):
+            def __init__(self, key: str):
+                super().__init__("NoSuchKey", key)
+    
+    def __init__(self, content_dir: str):
+        self.content_dir = content_dir
+    
+    def path_for(self, key: str) -> str:
+        """Inverse of content_uploader.object_key"""
+        
+        prefix, _, rest = key.partition("/")
+        if prefix == "courses" and rest:
+            return os.path.join(self.content_dir, f"course_{rest}")
+        if prefix == "syllabi" and rest:
+            return os.path.join(self.content_dir, f"syllabus_{rest}")
+        return os.path.join(self.content_dir, *key.split("/"))
+    
+    def get_object(self, Bucket: str, Key: str, IfNoneMatch: Optional[str] = None,
+                   Range: Optional[str] = None, **_) -> Dict[str, Any]:
+        path = self.path_for(Key)
+        if ".." in Key.split("/") or not os.path.isfile(path):
+            raise self.exceptions.NoSuchKey(Key)
+        with open(path, 'rb') as f:
+            data = f.read()
+        
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        if IfNoneMatch == etag:
+            raise StandInError("304", "Not Modified")
+        response = {"ETag": etag, "ContentLength": len(data)}
+        if Range:
+            start, end = (int(position) for position in Range.split("=", 1)[1].split("-"))
+            response["ContentRange"] = f"bytes {start}-{end}/{len(data)}"
+            data = data[start:end + 1]
+        response["Body"] = io.BytesIO(data)
+        return response
+
+class LocalDynamoDB:
+    """In-memory DynamoDB client supporting what the generated handler calls
+    
+    Tables are dicts keyed on their hash key. The metadata table is filled
+    from the output directory the same way metadata_loader.py loads it.
+    Query supports the type indexes, Limit/ExclusiveStartKey paging,
+    ScanIndexForward, ProjectionExpression and the comparison/contains
+    FilterExpressions the handler builds. BatchWriteItem can hand back a
+    share of each request as UnprocessedItems, as a throttled table does,
+    and applies DeleteRequests as well as PutRequests.
+    """
+    
+    INDEX_KEYS = {"TypeIndex": ("type", None), "TypeTitleIndex": ("type", "title")}
+    
+    def __init__(self, metadata_table: str, content_dir: Optional[str] = None, unprocessed_rate: float = 0.0):
+        # Table name -> key attribute names; items are stored under the tuple of their key values
+        self.key_schema: Dict[str, Tuple[str, ...]] = {metadata_table: ("sourcedId",)}
+        self.tables: Dict[str, Dict[Tuple, Dict[str, Any]]] = {metadata_table: {}}
+        self.unprocessed_rate = unprocessed_rate
+        self.stats = {"batchWrites": 0, "itemsWritten": 0, "unprocessed": 0}
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+        if content_dir:
+            for item in iter_metadata_items(content_dir):
+                if item["sourcedId"]:
+                    self.tables[metadata_table][(item["sourcedId"],)] = to_dynamodb(item)["M"]
+    
+    def create_table(self, name: str, *key_attributes: str):
+        self.key_schema[name] = key_attributes
+        self.tables.setdefault(name, {})
+    
+    @staticmethod
+    def _value(attribute: Optional[Dict[str, Any]]) -> Any:
+        if attribute is None:
+            return None
+        kind, value = next(iter(attribute.items()))
+        if kind == "L":
+            return [LocalDynamoDB._value(item) for item in value]
+        if kind == "N":
+            return float(value)
+        return value
+    
+    def _table(self, name: str) -> Dict[Tuple, Dict[str, Any]]:
+        if name not in self.tables:
+            raise StandInError("ResourceNotFoundException", f"Requested resource not found: Table: {name} not found")
+        return self.tables[name]
+    
+    def _key(self, table_name: str, item: Dict[str, Any]) -> Tuple:
+        return tuple(self._value(item.get(attribute)) for attribute in self.key_schema[table_name])
+    
+    def get_item(self, TableName: str, Key: Dict[str, Any], **_) -> Dict[str, Any]:
+        item = self._table(TableName).get(self._key(TableName, Key))
+        return {"Item": item} if item is not None else {}
+    
+    def batch_get_item(self, RequestItems: Dict[str, Dict[str, Any]], **_) -> Dict[str, Any]:
+        responses: Dict[str, List[Dict[str, Any]]] = {}
+        for table_name, request in RequestItems.items():
+            if len(request["Keys"]) > 100:
+                raise StandInError("ValidationException", "Too many items requested for the BatchGetItem call")
+            table = self._table(table_name)
+            responses[table_name] = [table[self._key(table_name, key)] for key in request["Keys"]
+                                     if self._key(table_name, key) in table]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+    
+    def batch_write_item(self, RequestItems: Dict[str, List[Dict[str, Any]]], **_) -> Dict[str, Any]:
+        unprocessed: Dict[str, List[Dict[str, Any]]] = {}
+        with self._lock:
+            self.stats["batchWrites"] += 1
+            for table_name, requests in RequestItems.items():
+                if len(requests) > 25:
+                    raise StandInError("ValidationException", "Too many items requested for the BatchWriteItem call")
+                table = self._table(table_name)
+                for request in requests:
+                    if self.unprocessed_rate and self._random.random() < self.unprocessed_rate:
+                        unprocessed.setdefault(table_name, []).append(request)
+                        self.stats["unprocessed"] += 1
+                        continue
+                    if "DeleteRequest" in request:
+                        table.pop(self._key(table_name, request["DeleteRequest"]["Key"]), None)
+                        continue
+                    item = request["PutRequest"]["Item"]
+                    table[self._key(table_name, item)] = item
+                    self.stats["itemsWritten"] += 1
+        return {"UnprocessedItems": unprocessed}
+    
+    def _matches(self, item: Dict[str, Any], expression: str, names: Dict[str, str], values: Dict[str, Any]) -> bool:
+        joiner = " OR " if " OR " in expression else " AND "
+        results = []
+        for clause in expression.split(joiner):
+            contains = re.fullmatch(r"contains\((#\w+), (:\w+)\)", clause)
+            if contains:
+                actual, expected = self._value(item.get(names[contains[1]])), self._value(values[contains[2]])
+                results.append(actual is not None and expected in actual)
+                continue
+            name, operator, placeholder = clause.split(" ")
+            attribute, operand = item.get(names[name]), values[placeholder]
+            # Values of different types never compare equal or ordered
+            if attribute is None or next(iter(attribute)) != next(iter(operand)):
+                results.append(False)
+                continue
+            actual, expected = self._value(attribute), self._value(operand)
+            results.append({"=": actual == expected, "<>": actual != expected, ">": actual > expected,
+                            ">=": actual >= expected, "<": actual < expected, "<=": actual <= expected}[operator])
+        return any(results) if joiner == " OR " else all(results)
+    
+    def query(self, TableName: str, IndexName: str, KeyConditionExpression: str,
+              ExpressionAttributeNames: Dict[str, str], ExpressionAttributeValues: Dict[str, Any],
+              Limit: int = 1000, ScanIndexForward: bool = True, ExclusiveStartKey: Optional[Dict[str, Any]] = None,
+              FilterExpression: Optional[str] = None, ProjectionExpression: Optional[str] = None, **_) -> Dict[str, Any]:
+        hash_key, range_key = self.INDEX_KEYS[IndexName]
+        name, placeholder = (part.strip() for part in KeyConditionExpression.split("="))
+        assert ExpressionAttributeNames[name] == hash_key
+        wanted = self._value(ExpressionAttributeValues[placeholder])
+        
+        rows = [item for item in self._table(TableName).values()
+                if self._value(item.get(hash_key)) == wanted and (range_key is None or range_key in item)]
+        rows.sort(key=lambda item: (self._value(item.get(range_key)) if range_key else "", item["sourcedId"]["S"]),
+                  reverse=not ScanIndexForward)
+        key_names = ["sourcedId", hash_key] + ([range_key] if range_key else [])
+        if ExclusiveStartKey:
+            position = next((index for index, item in enumerate(rows)
+                             if all(item.get(key) == ExclusiveStartKey.get(key) for key in key_names)), None)
+            rows = rows[position + 1:] if position is not None else []
+        
+        page = rows[:Limit]
+        items = [item for item in page if not FilterExpression
+                 or self._matches(item, FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues)]
+        if ProjectionExpression:
+            fields = [ExpressionAttributeNames[name.strip()] for name in ProjectionExpression.split(",")]
+            items = [{field: item[field] for field in fields if field in item} for item in items]
+        
+        response = {"Items": items, "Count": len(items), "ScannedCount": len(page)}
+        if len(rows) > Limit:
+            response["LastEvaluatedKey"] = {key: page[-1][key] for key in key_names}
+        return response
+
+def load_handler(content_dir: str, hosting: Optional[AWSTimeBackHosting] = None,
+                 environment: Optional[Dict[str, str]] = None, unprocessed_rate: float = 0.0) -> types.ModuleType:
+    """Import the generated Lambda code as a module wired to the local stand-ins"""
+    
+    hosting = hosting or AWSTimeBackHosting()
+    environment = dict({"CONTENT_BUCKET": "local-content", "METADATA_TABLE": "local-metadata",
+                        "PROGRESS_TABLE": "local-progress"}, **(environment or {}))
+    os.environ.update(environment)
+    
+    module = types.ModuleType("index")
+    module.__file__ = "index.py"
+    exec(compile(hosting._get_lambda_code(), "index.py", "exec"), module.__dict__)
+    module._clients["s3"] = LocalS3(content_dir)
+    dynamodb = LocalDynamoDB(environment["METADATA_TABLE"], content_dir, unprocessed_rate)
+    dynamodb.create_table(environment["PROGRESS_TABLE"], "userId", "progressKey")
+    module._clients["dynamodb"] = dynamodb
+    return module
+
+class LocalTimeBackServer:
+    """Minimal HTTP/1.1 (keep-alive) front end invoking lambda_handler in a thread pool"""
+    
+    def __init__(self, handler_module: types.ModuleType, concurrency: int = 8):
+        self.handler = handler_module.lambda_handler
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+    
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            # Header names are case-insensitive; API Gateway also delivers them as the client sent them
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0) or 0)
+        body = await reader.readexactly(length) if length else b""
+        return method, target, headers, body
+    
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                event = proxy_event(method, target, headers, body)
+                response = await loop.run_in_executor(self.executor, self.handler, event, None)
+                
+                status = response["statusCode"]
+                payload = (response.get("body") or "").encode("utf-8")
+                response_headers = dict(response.get("headers") or {})
+                response_headers["Content-Length"] = str(len(payload))
+                keep_alive = headers.get("connection", "").lower() != "close"
+                response_headers["Connection"] = "keep-alive" if keep_alive else "close"
+                
+                head = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+                head += [f"{name}: {value}" for name, value in response_headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+async def serve(content_dir: str, host: str, port: int, concurrency: int, unprocessed_rate: float = 0.0):
+    handler_module = load_handler(content_dir, unprocessed_rate=unprocessed_rate)
+    server = await LocalTimeBackServer(handler_module, concurrency).start(host, port)
+    print(f"🌐 TimeBack API serving {content_dir} at http://{host}:{server.sockets[0].getsockname()[1]}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    """Command line interface for the local server"""
+    
+    parser = argparse.ArgumentParser(description="Serve the generated TimeBack Lambda locally from converter output")
+    parser.add_argument("content_dir", help="Converter output directory (stands in for S3 and DynamoDB)")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--concurrency", type=int, default=8, help="Handler invocations run in parallel")
+    parser.add_argument("--unprocessed-rate", type=float, default=0.0,
+                        help="Share of BatchWriteItem requests the DynamoDB stand-in returns unprocessed (0-1)")
+    
+    args = parser.parse_args()
+    
+    if not os.path.isdir(args.content_dir):
+        print(f"❌ Content directory not found: {args.content_dir}")
+        raise SystemExit(1)
+    
+    try:
+        asyncio.run(serve(args.content_dir, args.host, args.port, args.concurrency, args.unprocessed_rate))
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+
+if __name__ == "__main__":
+    main()
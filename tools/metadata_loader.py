@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+TimeBack Metadata Loader
+
+Loads course, component and resource metadata from converter output into
+the ContentMetadataTable with BatchWriteItem: 25 items per request, chunks
+written concurrently, UnprocessedItems retried with exponential backoff.
+
+Loading is idempotent. A state file remembers a digest of every item the
+table has acknowledged, so a re-run after a partial failure only writes
+what is missing or changed, and items the content no longer produces
+(a re-conversion mints new ids) are deleted.
+"""
+
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Iterator
+
+from khan_to_timeback_converter import latest_courses
+
+BATCH_SIZE = 25  # BatchWriteItem limit
+STATE_FILENAME = ".metadata_loader_state.json"
+# Throttling and server-side failures; anything else (missing table, bad item, denied access) fails at once
+RETRYABLE_ERRORS = {"ProvisionedThroughputExceededException", "ThrottlingException",
+                    "RequestLimitExceeded", "InternalServerError"}
+
+def to_dynamodb(value: Any) -> Dict[str, Any]:
+    """DynamoDB attribute value for a plain JSON value"""
+    
+    if isinstance(value, bool):
+        return {"BOOL": value}
+    if isinstance(value, (int, float)):
+        return {"N": repr(value)}
+    if isinstance(value, str):
+        return {"S": value}
+    if isinstance(value, dict):
+        return {"M": {key: to_dynamodb(item) for key, item in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {"L": [to_dynamodb(item) for item in value]}
+    return {"NULL": True}
+
+def create_client(region: Optional[str] = None, endpoint_url: Optional[str] = None, pool_size: int = 8):
+    """DynamoDB client whose connection pool is sized for pool_size concurrent batches"""
+    
+    import boto3
+    from botocore.config import Config
+    
+    return boto3.client("dynamodb", region_name=region, endpoint_url=endpoint_url,
+                        config=Config(max_pool_connections=pool_size))
+
+def is_retryable(error: Exception) -> bool:
+    """True for a DynamoDB error worth retrying with backoff"""
+    
+    response = getattr(error, "response", None) or {}
+    if response.get("Error", {}).get("Code") in RETRYABLE_ERRORS:
+        return True
+    return response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0) >= 500
+
+def _item(item_type: str, sourced_id: str, title: str, **attributes) -> Dict[str, Any]:
+    # title is a TypeTitleIndex key and must not be empty
+    item = {"sourcedId": sourced_id, "type": item_type, "title": title or sourced_id}
+    item.update((key, value) for key, value in attributes.items() if value is not None)
+    return item
+
+def iter_metadata_items(content_dir: str) -> Iterator[Dict[str, Any]]:
+    """Course, component and resource items for the latest conversion of every course in content_dir
+    
+    A resource shared by several courses is yielded once, after every course
+    and component, with courseId/componentId from its first use and the
+    sourcedIds of all courses using it in courseIds.
+    """
+    
+    shared_resources = {}
+    store_path = os.path.join(content_dir, "resource_store.json")
+    if os.path.exists(store_path):
+        with open(store_path, 'r', encoding='utf-8') as f:
+            shared_resources = {resource["sourcedId"]: resource for resource in json.load(f).get("resources", {}).values()}
+    resources: Dict[str, Dict[str, Any]] = {}
+    
+    for course_file, course in latest_courses(content_dir):
+        course_id = os.path.basename(course_file)[len("course_"):-len(".json")]
+        syllabus = {}
+        syllabus_file = os.path.join(content_dir, f"syllabus_{course_id}.json")
+        if os.path.exists(syllabus_file):
+            with open(syllabus_file, 'r', encoding='utf-8') as f:
+                syllabus = json.load(f)
+        components = syllabus.get("subComponents", [])
+        
+        yield _item("course", course["sourcedId"], course.get("title", ""),
+                    status=course.get("status"), dateLastModified=course.get("dateLastModified"),
+                    courseCode=course.get("courseCode"), grades=course.get("grades"),
+                    subjects=course.get("subjects"), orgId=course.get("org", {}).get("sourcedId"),
+                    slug=course.get("metadata", {}).get("originalSlug"),
+                    componentCount=len(components),
+                    resourceCount=sum(len(component.get("componentResources", [])) for component in components))
+        
+        for component in components:
+            component_resources = component.get("componentResources", [])
+            yield _item("component", component["sourcedId"], component.get("title", ""),
+                        courseId=course["sourcedId"], sortOrder=component.get("sortOrder"),
+                        resourceCount=len(component_resources))
+            
+            for component_resource in component_resources:
+                resource = component_resource.get("resource", {})
+                if "metadata" not in resource:
+                    # Deduplicated syllabi only reference resources kept in the ResourceStore
+                    resource = shared_resources.get(resource.get("sourcedId"), resource)
+                sourced_id = resource.get("sourcedId", "")
+                if sourced_id in resources:
+                    if course["sourcedId"] not in resources[sourced_id]["courseIds"]:
+                        resources[sourced_id]["courseIds"].append(course["sourcedId"])
+                    continue
+                metadata = resource.get("metadata", {})
+                resources[sourced_id] = _item("resource", sourced_id, resource.get("title", ""),
+                                              courseId=course["sourcedId"], courseIds=[course["sourcedId"]],
+                                              componentId=component["sourcedId"],
+                                              sortOrder=component_resource.get("sortOrder"),
+                                              status=resource.get("status"),
+                                              vendorResourceId=resource.get("vendorResourceId"),
+                                              resourceType=metadata.get("type"), subType=metadata.get("subType"),
+                                              url=metadata.get("url"), description=metadata.get("description"),
+                                              estimatedDuration=metadata.get("estimatedDuration"))
+    
+    yield from resources.values()
+
+def request_key(request: Dict[str, Any]) -> str:
+    """sourcedId a BatchWriteItem put or delete request is for"""
+    
+    if "DeleteRequest" in request:
+        return request["DeleteRequest"]["Key"]["sourcedId"]["S"]
+    return request["PutRequest"]["Item"]["sourcedId"]["S"]
+
+def item_digest(item: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(item, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class MetadataLoader:
+    """Concurrent, retrying, resumable BatchWriteItem loader"""
+    
+    def __init__(self, table_name: str, client: Any = None, workers: int = 8,
+                 max_attempts: int = 8, base_delay: float = 0.05, max_delay: float = 5.0):
+        self.table_name = table_name
+        self.workers = workers
+        self.client = client or create_client(pool_size=workers)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.stats = {"written": 0, "unchanged": 0, "deleted": 0, "failed": 0, "requests": 0, "retries": 0}
+    
+    def _write_batch(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Write up to 25 put or delete requests; returns the ones still unprocessed after every retry"""
+        
+        pending = {self.table_name: requests}
+        for attempt in range(self.max_attempts):
+            if attempt:
+                # Full jitter keeps concurrent workers from retrying in lockstep
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+            try:
+                response = self.client.batch_write_item(RequestItems=pending)
+            except Exception as e:
+                # Throttling and server errors are retried like unprocessed items
+                if not is_retryable(e):
+                    raise
+                if attempt == self.max_attempts - 1:
+                    print(f"❌ Batch failed: {e}")
+                    break
+                with self._lock:
+                    self.stats["retries"] += 1
+                continue
+            finally:
+                with self._lock:
+                    self.stats["requests"] += 1
+            
+            pending = response.get("UnprocessedItems") or {}
+            if not pending.get(self.table_name):
+                return []
+            with self._lock:
+                self.stats["retries"] += 1
+        return pending.get(self.table_name, [])
+    
+    def load(self, items: List[Dict[str, Any]], state: Optional[Dict[str, str]] = None,
+             rewrite: bool = False) -> Dict[str, str]:
+        """Write items not already recorded in state (sourcedId -> digest) and delete superseded ones
+        
+        Items in state that are no longer among items were loaded from an
+        earlier conversion and are deleted. rewrite writes every item even if
+        its digest is unchanged. state is updated in place as batches are
+        acknowledged, so a caller that saves it after a failed load keeps the
+        batches already written.
+        """
+        
+        state = state if state is not None else {}
+        # One item per key: a shared resource is listed by every course using it,
+        # and BatchWriteItem rejects duplicate keys within a request
+        unique = {item["sourcedId"]: item for item in items if item["sourcedId"]}
+        # (sourcedId, request, digest); a delete carries no digest
+        todo = []
+        for sourced_id, item in unique.items():
+            digest = item_digest(item)
+            if state.get(sourced_id) == digest and not rewrite:
+                self.stats["unchanged"] += 1
+            else:
+                todo.append((sourced_id, {"PutRequest": {"Item": to_dynamodb(item)["M"]}}, digest))
+        for sourced_id in sorted(set(state) - set(unique)):
+            todo.append((sourced_id, {"DeleteRequest": {"Key": {"sourcedId": {"S": sourced_id}}}}, None))
+        
+        chunks = [todo[start:start + BATCH_SIZE] for start in range(0, len(todo), BATCH_SIZE)]
+        error = None
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._write_batch, [request for _, request, _ in chunk]): chunk
+                       for chunk in chunks}
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    unprocessed = future.result()
+                except Exception as e:
+                    # Keep recording the other chunks; the first error is raised once all have finished
+                    error = error or e
+                    self.stats["failed"] += len(chunk)
+                    continue
+                failed = {request_key(request) for request in unprocessed}
+                for sourced_id, _, digest in chunk:
+                    if sourced_id in failed:
+                        self.stats["failed"] += 1
+                    elif digest is None:
+                        state.pop(sourced_id, None)
+                        self.stats["deleted"] += 1
+                    else:
+                        state[sourced_id] = digest
+                        self.stats["written"] += 1
+        if error is not None:
+            raise error
+        return state
+
+def load_state(path: str, table_name: str) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    # State recorded against another table says nothing about this one
+    return data.get("items", {}) if data.get("table") == table_name else {}
+
+def save_state(path: str, table_name: str, items: Dict[str, str]):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"table": table_name, "items": items}, f)
+    os.replace(temp_path, path)
+
+def main():
+    """Command line interface for the loader"""
+    
+    parser = argparse.ArgumentParser(description="Load converted TimeBack metadata into DynamoDB")
+    parser.add_argument("content_dir", help="Converter output directory")
+    parser.add_argument("--table", required=True, help="ContentMetadataTable name")
+    parser.add_argument("--region", default=None, help="AWS region")
+    parser.add_argument("--endpoint-url", default=None,
+                        help="DynamoDB-compatible endpoint, e.g. DynamoDB Local at http://localhost:8000")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent BatchWriteItem requests")
+    parser.add_argument("--state-file", default=None,
+                        help=f"Where loaded item digests are kept (default: <content_dir>/{STATE_FILENAME})")
+    parser.add_argument("--full", action="store_true",
+                        help="Write every item, even those the state file records as loaded")
+    
+    args = parser.parse_args()
+    
+    state_file = args.state_file or os.path.join(args.content_dir, STATE_FILENAME)
+    state = load_state(state_file, args.table)
+    items = list(iter_metadata_items(args.content_dir))
+    
+    print(f"🗄️  Loading {len(items)} metadata items into {args.table} ({args.workers} workers)...")
+    started = time.perf_counter()
+    loader = MetadataLoader(args.table, create_client(args.region, args.endpoint_url, args.workers), args.workers)
+    try:
+        loader.load(items, state, rewrite=args.full)
+    finally:
+        save_state(state_file, args.table, state)
+    
+    stats = loader.stats
+    print(f"\n📊 Load Summary:")
+    print(f"   Written: {stats['written']}")
+    print(f"   Unchanged (already loaded): {stats['unchanged']}")
+    print(f"   Deleted (superseded): {stats['deleted']}")
+    print(f"   Failed: {stats['failed']}")
+    print(f"   Requests: {stats['requests']} ({stats['retries']} retries)")
+    print(f"   Wall time: {time.perf_counter() - started:.2f}s")
+    print(f"📄 State file: {state_file}")
+    
+    if stats["failed"]:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
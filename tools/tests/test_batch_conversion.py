@@ -0,0 +1,91 @@
+"""Batch conversion over a process pool, and incremental conversion against the build manifest"""
+
+import json
+import os
+
+import pytest
+
+from benchmark_converter import write_synthetic_course
+from khan_to_timeback_converter import BuildManifest, KhanToTimeBackConverter, convert_batch, expand_inputs
+
+@pytest.fixture
+def inputs(tmp_path):
+    input_dir = tmp_path / "dumps"
+    input_dir.mkdir()
+    paths = []
+    for units in (1, 2, 3):
+        path = input_dir / f"khan_{units}x3.json"
+        write_synthetic_course(str(path), units, 3)
+        paths.append(str(path))
+    return paths
+
+def test_inputs_expand_from_directories_globs_and_files(inputs, tmp_path):
+    input_dir = tmp_path / "dumps"
+    (input_dir / "notes.txt").write_text("not an input", encoding="utf-8")
+    
+    assert expand_inputs([str(input_dir)]) == inputs
+    assert expand_inputs([str(input_dir / "khan_[12]x3.json"), inputs[0]]) == inputs[:2]
+    assert expand_inputs([str(tmp_path / "**" / "khan_3x3.json")]) == inputs[2:]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_failing_file_is_recorded_and_the_batch_continues(inputs, tmp_path, workers):
+    broken = tmp_path / "broken.json"
+    broken.write_text("{", encoding="utf-8")
+    output_dir = tmp_path / "out"
+    
+    summary = convert_batch(inputs[:2] + [str(broken)] + inputs[2:], str(output_dir), workers=workers)
+    
+    assert (summary["succeeded"], summary["failed"], summary["workers"]) == (3, 1, workers)
+    files = summary["files"]
+    # Results stay in input order whatever order workers finish in
+    assert [result["input"] for result in files] == inputs[:2] + [str(broken)] + inputs[2:]
+    assert files[2]["status"] == "failed" and files[2]["error"].startswith("JSONDecodeError")
+    assert [(result["components"], result["resources"]) for result in files if result["status"] == "success"] == \
+        [(1, 3), (2, 6), (3, 9)]
+    assert all(result["wallTime"] >= 0 for result in files)
+    assert json.loads((output_dir / "batch_summary.json").read_text(encoding="utf-8"))["failed"] == 1
+    assert len(list(output_dir.glob("course_*.json"))) == 3
+
+def test_incremental_batch_skips_unchanged_inputs(inputs, tmp_path):
+    output_dir = tmp_path / "out"
+    first = convert_batch(inputs, str(output_dir), workers=1, incremental=True)
+    manifest = json.loads((output_dir / BuildManifest.FILENAME).read_text(encoding="utf-8"))
+    
+    again = convert_batch(inputs, str(output_dir), workers=1, incremental=True)
+    
+    assert (first["succeeded"], again["succeeded"], again["skipped"]) == (3, 0, 3)
+    assert [result["outputFiles"] for result in again["files"]] == [result["outputFiles"] for result in first["files"]]
+    assert [result["components"] for result in again["files"]] == [1, 2, 3]
+    assert json.loads((output_dir / BuildManifest.FILENAME).read_text(encoding="utf-8"))["inputs"] == manifest["inputs"]
+
+def test_changed_input_replaces_its_previous_outputs(inputs, tmp_path):
+    output_dir = tmp_path / "out"
+    before = convert_batch(inputs, str(output_dir), workers=1, incremental=True)["files"][0]["outputFiles"]
+    
+    write_synthetic_course(inputs[0], 1, 4)
+    after = convert_batch(inputs, str(output_dir), workers=1, incremental=True)
+    
+    assert [result["status"] for result in after["files"]] == ["success", "skipped", "skipped"]
+    assert after["files"][0]["resources"] == 4
+    assert not any(os.path.exists(path) for path in before.values())
+    assert all(os.path.exists(path) for path in after["files"][0]["outputFiles"].values())
+
+def test_changed_settings_or_missing_outputs_force_reconversion(inputs, tmp_path):
+    output_dir = tmp_path / "out"
+    convert_batch(inputs, str(output_dir), workers=1, incremental=True)
+    
+    # Another output profile changes what is written
+    production = convert_batch(inputs, str(output_dir), workers=1, incremental=True, output_profile="production")
+    assert production["succeeded"] == 3
+    
+    os.remove(production["files"][1]["outputFiles"]["syllabus_file"])
+    rerun = convert_batch(inputs, str(output_dir), workers=1, incremental=True, output_profile="production")
+    assert [result["status"] for result in rerun["files"]] == ["skipped", "success", "skipped"]
+
+def test_single_file_conversion_uses_the_manifest(inputs, tmp_path):
+    output_dir = tmp_path / "out"
+    manifest = BuildManifest.load(str(output_dir))
+    converter = KhanToTimeBackConverter()
+    
+    assert not converter.convert_khan_course(inputs[0], str(output_dir), manifest=manifest)["skipped"]
+    assert converter.convert_khan_course(inputs[0], str(output_dir), manifest=manifest)["skipped"]
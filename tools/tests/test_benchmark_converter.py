@@ -0,0 +1,40 @@
+"""Converter benchmark report and regression check"""
+
+from benchmark_converter import compare_reports, format_rate, run_benchmarks
+from khan_to_timeback_converter import KhanToTimeBackConverter, StageProfiler
+
+def scenario(name, wall_time):
+    return {"name": name, "stages": {"load": {"wallTime": wall_time}}, "total": {"wallTime": wall_time}}
+
+def test_rate_without_a_measurable_time_is_not_available():
+    assert format_rate(None).strip() == "n/a"
+    assert format_rate(1234.5) == f"{1234.5:>12,.0f}"
+    assert len(format_rate(None)) == len(format_rate(1234.5))
+
+def test_regressions_beyond_the_threshold_are_reported():
+    baseline = {"scenarios": [scenario("15x40", 1.0), scenario("50x200", 1.0)]}
+    current = {"scenarios": [scenario("15x40", 1.1), scenario("50x200", 1.5), scenario("new", 9.0)]}
+    
+    regressions = compare_reports(baseline, current, threshold=0.15)
+    
+    assert regressions == ["50x200 load: 1.0000s -> 1.5000s (+50%)", "50x200 total: 1.0000s -> 1.5000s (+50%)"]
+
+def test_benchmark_profiles_both_streaming_modes_through_the_converter(monkeypatch):
+    calls = []
+    original = KhanToTimeBackConverter.convert_khan_course
+    
+    def convert_khan_course(self, khan_json_path, output_dir, streaming=False, **options):
+        calls.append((streaming, isinstance(self.hooks, StageProfiler)))
+        return original(self, khan_json_path, output_dir, streaming=streaming, **options)
+    monkeypatch.setattr(KhanToTimeBackConverter, "convert_khan_course", convert_khan_course)
+    
+    report = run_benchmarks([(2, 4)], repeat=2)
+    
+    # Two timed runs and one traced run per mode
+    assert calls == [(False, True)] * 3 + [(True, True)] * 3
+    whole, streamed = report["scenarios"]
+    assert (whole["name"], whole["streaming"]) == ("2x4", False)
+    assert (streamed["name"], streamed["streaming"]) == ("2x4-streaming", True)
+    assert list(whole["stages"]) == ["load", "extract", "syllabus", "course", "save"]
+    assert list(streamed["stages"]) == ["syllabus", "course", "save"]
+    assert all(stage["peakMemory"] >= 0 for stage in whole["stages"].values())
@@ -0,0 +1,104 @@
+"""Offline checks of the generated CloudFormation template"""
+
+import os
+import zipfile
+
+import pytest
+
+import aws_hosting_setup
+from aws_hosting_setup import AWSTimeBackHosting, validate_template, INLINE_CODE_LIMIT
+from content_uploader import object_key
+
+@pytest.mark.parametrize("direct_s3_reads", [False, True])
+def test_template_validates(direct_s3_reads):
+    template = AWSTimeBackHosting().create_cloudformation_template(direct_s3_reads=direct_s3_reads)
+    
+    assert validate_template(template) == []
+
+def resource_path(resources, logical_id):
+    """/a/b path of an API Gateway resource, following ParentId up to the root"""
+    parts = []
+    while logical_id:
+        properties = resources[logical_id]["Properties"]
+        parts.append(properties["PathPart"])
+        logical_id = properties["ParentId"].get("Ref")
+    return "/" + "/".join(reversed(parts))
+
+@pytest.mark.parametrize("method_id, route, uploaded_file", [
+    ("ApiCourseGetMethod", "/courses/{courseId}", "course_{courseId}.json"),
+    ("ApiSyllabusGetMethod", "/powerpath/syllabus/{courseId}", "syllabus_{courseId}.json")
+])
+def test_direct_s3_reads_use_the_uploader_key_layout(method_id, route, uploaded_file):
+    resources = AWSTimeBackHosting().create_cloudformation_template(direct_s3_reads=True)["Resources"]
+    method = resources[method_id]["Properties"]
+    integration = method["Integration"]
+    
+    assert resource_path(resources, method["ResourceId"]["Ref"]) == route
+    assert integration["RequestParameters"]["integration.request.path.courseId"] == "method.request.path.courseId"
+    # arn:aws:apigateway:<region>:s3:path/<bucket>/<key>
+    key = integration["Uri"]["Fn::Sub"].split("${ContentBucket}/", 1)[1]
+    course_id = "c8c9ee5f-d628-47ed-829f-e1def7836558"
+    assert key.replace("{courseId}", course_id) == object_key(uploaded_file.replace("{courseId}", course_id))
+
+def test_direct_s3_reads_are_off_by_default():
+    resources = AWSTimeBackHosting().create_cloudformation_template()["Resources"]
+    
+    assert "ApiCourseGetMethod" not in resources
+    assert "ApiGatewayS3ReadRole" not in resources
+
+def test_function_code_comes_from_the_built_artifact():
+    hosting = AWSTimeBackHosting()
+    template = hosting.create_cloudformation_template()
+    
+    code = template["Resources"]["TimeBackAPIFunction"]["Properties"]["Code"]
+    assert code == {"S3Bucket": {"Ref": "ArtifactBucket"}, "S3Key": {"Ref": "ArtifactKey"}}
+    assert template["Parameters"]["ArtifactKey"]["Default"] == hosting.artifact_key()
+    # Why there is no inline mode: the handler cannot fit in a ZipFile
+    assert len(hosting._get_lambda_code()) > INLINE_CODE_LIMIT
+
+def test_oversized_inline_source_is_rejected():
+    template = AWSTimeBackHosting().create_cloudformation_template()
+    properties = template["Resources"]["TimeBackAPIFunction"]["Properties"]
+    
+    properties["Code"] = {"ZipFile": "x" * INLINE_CODE_LIMIT}
+    assert validate_template(template) == []
+    properties["Code"] = {"ZipFile": {"Fn::Sub": "x" * (INLINE_CODE_LIMIT + 1)}}
+    assert [error for error in validate_template(template) if "inline ZipFile source" in error]
+
+def test_package_is_reproducible_and_keyed_by_content(tmp_path):
+    hosting = AWSTimeBackHosting()
+    first = hosting.build_lambda_package(str(tmp_path / "first"))
+    second = hosting.build_lambda_package(str(tmp_path / "second"))
+    
+    with open(first, 'rb') as f, open(second, 'rb') as g:
+        assert f.read() == g.read()
+    with zipfile.ZipFile(first) as archive:
+        assert archive.read("index.py").decode("utf-8") == hosting._get_lambda_code()
+    assert AWSTimeBackHosting(runtime="python3.12").artifact_key() != hosting.artifact_key()
+
+@pytest.mark.parametrize("runtime, provisioned, expected", [
+    ("python3.12", 0, None),
+    ("python3.11", 0, "SnapStart requires Python 3.12"),
+    ("python3.12", 2, "SnapStart cannot be combined with provisioned concurrency")
+])
+def test_snap_start_constraints(runtime, provisioned, expected):
+    hosting = AWSTimeBackHosting(runtime=runtime, snap_start=True, provisioned_concurrency=provisioned)
+    errors = validate_template(hosting.create_cloudformation_template())
+    
+    if expected is None:
+        assert errors == []
+    else:
+        assert any(expected in error for error in errors)
+
+def test_deploy_script_runs_the_tools_wherever_it_is_written(tmp_path):
+    output_dir = tmp_path / "somewhere" / "else"
+    output_dir.mkdir(parents=True)
+    
+    script = open(AWSTimeBackHosting().create_deployment_script(str(output_dir)), encoding="utf-8").read()
+    
+    tools_dir = os.path.dirname(os.path.abspath(aws_hosting_setup.__file__))
+    assert f'TOOLS_DIR="${{TOOLS_DIR:-{tools_dir}}}"' in script
+    assert "$SCRIPT_DIR/.." not in script
+    for tool in ("content_uploader.py", "metadata_loader.py"):
+        assert f'python3 "$TOOLS_DIR/{tool}"' in script
+        assert os.path.exists(os.path.join(tools_dir, tool))
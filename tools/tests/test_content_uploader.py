@@ -0,0 +1,136 @@
+"""ContentUploader against an in-memory S3 stand-in"""
+
+import hashlib
+import json
+import threading
+
+import pytest
+
+from content_uploader import ContentUploader, MANIFEST_KEY, OBJECT_PREFIX
+
+class NoSuchKey(Exception):
+    pass
+
+class StubBody:
+    def __init__(self, data):
+        self.data = data
+    
+    def read(self):
+        return self.data
+
+class StubPaginator:
+    def __init__(self, s3):
+        self.s3 = s3
+    
+    def paginate(self, Bucket, Prefix=""):
+        yield {"Contents": [{"Key": key, "ETag": '"' + hashlib.md5(body).hexdigest() + '"'}
+                            for key, body in sorted(self.s3.objects.items()) if key.startswith(Prefix)]}
+
+class StubS3:
+    """Just enough of the S3 client for the uploader; records the order of writes"""
+    
+    class exceptions:
+        NoSuchKey = NoSuchKey
+    
+    def __init__(self):
+        self.objects = {}
+        self.writes = []
+        self.failing_digests = set()
+        self._lock = threading.Lock()
+    
+    def get_paginator(self, name):
+        return StubPaginator(self)
+    
+    def put_object(self, Bucket, Key, Body, **_):
+        body = Body.read() if hasattr(Body, "read") else Body
+        if hashlib.md5(body).hexdigest() in self.failing_digests:
+            raise RuntimeError("upload failed")
+        with self._lock:
+            self.objects[Key] = body
+            self.writes.append(Key)
+    
+    def get_object(self, Bucket, Key, **_):
+        if Key not in self.objects:
+            raise NoSuchKey(Key)
+        return {"Body": StubBody(self.objects[Key])}
+
+COURSE = {"sourcedId": "c1", "title": "Pre-algebra"}
+
+@pytest.fixture
+def content_dir(tmp_path):
+    (tmp_path / "course_c1.json").write_text(json.dumps(COURSE), encoding="utf-8")
+    (tmp_path / "syllabus_c1.json").write_text(json.dumps({"subComponents": []}), encoding="utf-8")
+    (tmp_path / "catalog.json").write_text(json.dumps({"courses": [COURSE]}), encoding="utf-8")
+    (tmp_path / "build_manifest.json").write_text("{}", encoding="utf-8")
+    return tmp_path
+
+def published(s3):
+    return json.loads(s3.objects[MANIFEST_KEY])
+
+def test_objects_are_stored_under_content_addressed_keys(content_dir):
+    s3 = StubS3()
+    stats = ContentUploader("bucket", s3, workers=4).upload(str(content_dir))
+    
+    objects = published(s3)["objects"]
+    assert sorted(objects) == ["catalog.json", "courses/c1.json", "syllabi/c1.json"]
+    for key in objects.values():
+        assert key == f"{OBJECT_PREFIX}{hashlib.md5(s3.objects[key]).hexdigest()}.json"
+    assert stats["uploaded"] == 3 and stats["manifestVersion"] == 1
+
+def test_unchanged_content_is_skipped(content_dir):
+    s3 = StubS3()
+    ContentUploader("bucket", s3).upload(str(content_dir))
+    writes = len(s3.writes)
+    
+    stats = ContentUploader("bucket", s3).upload(str(content_dir))
+    
+    assert stats["uploaded"] == 0 and stats["unchanged"] == 3
+    assert stats["manifestVersion"] == 1
+    assert len(s3.writes) == writes
+    
+    # Only the changed file is sent, and the manifest moves to a new version
+    (content_dir / "catalog.json").write_text(json.dumps({"courses": []}), encoding="utf-8")
+    stats = ContentUploader("bucket", s3).upload(str(content_dir))
+    assert stats["uploaded"] == 1 and stats["unchanged"] == 2
+    assert published(s3)["version"] == 2
+
+def test_manifest_is_written_after_every_object(content_dir):
+    s3 = StubS3()
+    ContentUploader("bucket", s3, workers=4).upload(str(content_dir))
+    
+    object_writes = [index for index, key in enumerate(s3.writes) if key.startswith(OBJECT_PREFIX)]
+    assert len(object_writes) == 3
+    assert max(object_writes) < s3.writes.index(MANIFEST_KEY)
+    assert s3.writes[-1] == MANIFEST_KEY
+
+def test_failed_upload_leaves_the_manifest_alone(content_dir):
+    s3 = StubS3()
+    ContentUploader("bucket", s3).upload(str(content_dir))
+    
+    catalog = json.dumps({"courses": []}).encode("utf-8")
+    (content_dir / "catalog.json").write_bytes(catalog)
+    s3.failing_digests.add(hashlib.md5(catalog).hexdigest())
+    stats = ContentUploader("bucket", s3).upload(str(content_dir))
+    
+    assert stats["failed"] == 1
+    assert stats["manifestVersion"] == 1
+    assert published(s3)["version"] == 1
+
+def test_superseded_conversions_are_not_published(content_dir):
+    # c0 is an earlier conversion of the same Khan course as c1
+    old = {"sourcedId": "c0", "title": "Pre-algebra", "dateLastModified": "2024-01-01T00:00:00Z",
+           "metadata": {"originalKhanId": "k1"}}
+    new = dict(old, sourcedId="c1", dateLastModified="2024-02-01T00:00:00Z")
+    (content_dir / "course_c0.json").write_text(json.dumps(old), encoding="utf-8")
+    (content_dir / "course_c1.json").write_text(json.dumps(new), encoding="utf-8")
+    for course_id in ("c0", "c1"):
+        (content_dir / f"syllabus_{course_id}.json").write_text("{}", encoding="utf-8")
+        (content_dir / f"syllabus_{course_id}.offsets.json").write_text("{}", encoding="utf-8")
+        (content_dir / f"syllabus_{course_id}").mkdir()
+        (content_dir / f"syllabus_{course_id}" / "index.json").write_text("{}", encoding="utf-8")
+    s3 = StubS3()
+    
+    ContentUploader("bucket", s3).upload(str(content_dir))
+    
+    assert sorted(published(s3)["objects"]) == ["catalog.json", "courses/c1.json", "syllabi/c1.json",
+                                                "syllabi/c1.offsets.json", "syllabi/c1/index.json"]
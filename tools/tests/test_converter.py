@@ -0,0 +1,166 @@
+"""Converter output consumed by the hosted API (search index, catalog, resource store) and its instrumentation"""
+
+import json
+import sys
+
+import pytest
+
+from benchmark_converter import write_synthetic_course
+from khan_to_timeback_converter import (KhanToTimeBackConverter, ConversionHooks, CourseCatalog, ResourceStore,
+                                        SearchIndexBuilder, build_search_index, convert_batch, tokenize,
+                                        main as converter_main)
+from metadata_loader import iter_metadata_items
+
+@pytest.fixture
+def khan_course(tmp_path):
+    path = tmp_path / "khan_course.json"
+    write_synthetic_course(str(path), 2, 4)
+    return path
+
+def search(output_dir, term):
+    """Documents the search index returns for one term"""
+    
+    index_dir = output_dir / SearchIndexBuilder.DIRNAME
+    index = json.loads((index_dir / "index.json").read_text(encoding="utf-8"))
+    bucket = SearchIndexBuilder.bucket_for(term, index["buckets"])
+    postings = json.loads((index_dir / "terms" / f"{bucket}.json").read_text(encoding="utf-8")).get(term, [])
+    documents = []
+    for doc_index, _ in postings:
+        shard = json.loads((index_dir / "docs" / f"{doc_index // index['docsPerShard']}.json").read_text(encoding="utf-8"))
+        documents.append(shard[doc_index % index["docsPerShard"]])
+    return documents
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_course_description_is_searchable(khan_course, tmp_path, streaming):
+    output_dir = tmp_path / "out"
+    result = KhanToTimeBackConverter().convert_khan_course(str(khan_course), str(output_dir), streaming=streaming)
+    build_search_index(str(output_dir))
+    
+    course = json.loads(open(result["output_files"]["course_file"], encoding="utf-8").read())
+    assert course["metadata"]["description"] == "Synthetic benchmark course"
+    # "benchmark" only appears in the course description
+    assert "benchmark" not in tokenize(course["title"])
+    assert [(document["type"], document["id"]) for document in search(output_dir, "benchmark")] == \
+        [("course", course["sourcedId"])]
+
+def test_reconverted_course_is_listed_once(khan_course, tmp_path):
+    output_dir = tmp_path / "out"
+    converter = KhanToTimeBackConverter()
+    converter.convert_khan_course(str(khan_course), str(output_dir))
+    latest = converter.convert_khan_course(str(khan_course), str(output_dir))["course"]
+    assert len(list(output_dir.glob("course_*.json"))) == 2
+    
+    catalog = CourseCatalog.build(str(output_dir))
+    courses = json.loads((output_dir / CourseCatalog.FILENAME).read_text(encoding="utf-8"))["courses"]
+    
+    assert catalog["courseCount"] == 1
+    assert [course["sourcedId"] for course in courses] == [latest.sourced_id]
+    assert [item["sourcedId"] for item in iter_metadata_items(str(output_dir)) if item["type"] == "course"] == \
+        [latest.sourced_id]
+
+def test_batch_reads_and_writes_the_resource_store_once(tmp_path, monkeypatch):
+    # The 3x4 course contains every item of the 2x4 one
+    inputs = []
+    for units in (2, 3):
+        path = tmp_path / f"khan_{units}x4.json"
+        write_synthetic_course(str(path), units, 4)
+        inputs.append(str(path))
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    # An entry from an earlier batch must survive the merge untouched
+    kept = {"sourcedId": ResourceStore.resource_id("x000000000"), "title": "Converted earlier"}
+    ResourceStore(str(output_dir), {"x000000000": kept}).save()
+    
+    loads = []
+    original_load = ResourceStore.load
+    
+    def counting_load(path):
+        loads.append(path)
+        return original_load(path)
+    monkeypatch.setattr(ResourceStore, "load", counting_load)
+    summary = convert_batch(inputs, str(output_dir), workers=1, dedupe_resources=True)
+    
+    assert summary["succeeded"] == 2
+    assert len(loads) == 1
+    resources = ResourceStore.load(str(output_dir)).resources
+    assert len(resources) == 12
+    assert resources["x000000000"] == kept
+
+def test_batch_workers_skip_resources_already_stored(khan_course, tmp_path, monkeypatch):
+    output_dir = tmp_path / "out"
+    convert_batch([str(khan_course)], str(output_dir), workers=1, dedupe_resources=True)
+    stored = ResourceStore.load(str(output_dir)).resources
+    
+    built = []
+    original_build = KhanToTimeBackConverter._build_resource
+    
+    def counting_build(self, content, index, resource_id):
+        built.append(resource_id)
+        return original_build(self, content, index, resource_id)
+    monkeypatch.setattr(KhanToTimeBackConverter, "_build_resource", counting_build)
+    summary = convert_batch([str(khan_course)], str(output_dir), workers=1, dedupe_resources=True)
+    
+    assert summary["succeeded"] == 1
+    assert built == []
+    assert ResourceStore.load(str(output_dir)).resources == stored
+
+class RecordingHooks(ConversionHooks):
+    def __init__(self):
+        self.events = []
+    
+    def on_stage_start(self, stage):
+        self.events.append(("start", stage))
+    
+    def on_stage_end(self, stage, metrics):
+        self.events.append(("end", stage))
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_failing_stage_still_ends(tmp_path, streaming):
+    broken = tmp_path / "broken.json"
+    broken.write_text('{"data": {"course": ', encoding="utf-8")
+    hooks = RecordingHooks()
+    
+    with pytest.raises(Exception):
+        KhanToTimeBackConverter(hooks=hooks).convert_khan_course(str(broken), str(tmp_path / "out"),
+                                                                 streaming=streaming)
+    
+    assert hooks.events
+    assert [stage for kind, stage in hooks.events if kind == "start"] == \
+        [stage for kind, stage in hooks.events if kind == "end"]
+    assert hooks.events[-1][0] == "end"
+
+@pytest.fixture
+def catalog_builds(monkeypatch):
+    builds = []
+    original_build = CourseCatalog.build
+    
+    def counting_build(output_dir, output_profile="pretty"):
+        builds.append(output_dir)
+        return original_build(output_dir, output_profile)
+    monkeypatch.setattr(CourseCatalog, "build", counting_build)
+    return builds
+
+def run_cli(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["khan_to_timeback_converter.py", *argv])
+    converter_main()
+
+def test_cli_builds_the_catalog_once_and_only_after_changes(tmp_path, monkeypatch, catalog_builds):
+    inputs = []
+    for units in (2, 3):
+        path = tmp_path / f"khan_{units}x4.json"
+        write_synthetic_course(str(path), units, 4)
+        inputs.append(str(path))
+    output_dir = str(tmp_path / "out")
+    
+    run_cli(monkeypatch, *inputs, output_dir, "--batch", "--workers", "1", "--incremental")
+    assert len(catalog_builds) == 1
+    
+    # Nothing changed: the catalog on disk is still current
+    run_cli(monkeypatch, *inputs, output_dir, "--batch", "--workers", "1", "--incremental")
+    run_cli(monkeypatch, inputs[0], output_dir, "--incremental")
+    assert len(catalog_builds) == 1
+    
+    run_cli(monkeypatch, inputs[0], output_dir, "--no-catalog")
+    assert len(catalog_builds) == 1
+    run_cli(monkeypatch, inputs[0], output_dir)
+    assert len(catalog_builds) == 2
@@ -0,0 +1,192 @@
+"""Converter output: streaming modes against whole-file conversion, output profiles, classification against the original rules"""
+
+import gzip
+import json
+import os
+import re
+
+import pytest
+
+from benchmark_converter import generate_synthetic_course, write_synthetic_course
+from khan_to_timeback_converter import KhanToTimeBackConverter, classify_content, encode_json, write_artifact
+
+UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:\d{2})?")
+
+@pytest.fixture
+def khan_course(tmp_path):
+    path = tmp_path / "khan_course.json"
+    write_synthetic_course(str(path), 3, 5)
+    return path
+
+def normalized_outputs(result):
+    """Output file contents by kind, with uuids numbered in order of appearance and timestamps blanked
+    
+    Course and resource reference ids are uuid4s minted per run, so two
+    conversions only agree up to a consistent renaming of them.
+    """
+    
+    ids = {}
+    outputs = {}
+    for kind, path in sorted(result["output_files"].items()):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if path.endswith(".gz"):
+            data = gzip.decompress(data)
+        text = TIMESTAMP.sub("<timestamp>", data.decode("utf-8"))
+        outputs[kind] = UUID.sub(lambda match: ids.setdefault(match[0], f"<id{len(ids)}>"), text)
+    return outputs
+
+def read_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def convert(khan_course, output_dir, output_profile="pretty", **options):
+    converter = KhanToTimeBackConverter(output_profile=output_profile)
+    return converter.convert_khan_course(str(khan_course), str(output_dir), **options)
+
+@pytest.mark.parametrize("output_profile", ["pretty", "production"])
+def test_streaming_input_writes_the_same_files(khan_course, tmp_path, output_profile):
+    whole = convert(khan_course, tmp_path / "whole", output_profile)
+    streamed = convert(khan_course, tmp_path / "streamed", output_profile, streaming=True)
+    
+    assert normalized_outputs(streamed) == normalized_outputs(whole)
+    assert streamed["summary"] == whole["summary"]
+
+def test_streaming_input_handles_course_fields_after_the_units(tmp_path):
+    dump = generate_synthetic_course(2, 4)
+    course = dump["data"]["contentRoute"]["listedPathData"]["course"]
+    units = course.pop("unitChildren")
+    dump["data"]["contentRoute"]["listedPathData"]["course"] = dict({"unitChildren": units}, **course)
+    khan_course = tmp_path / "units_first.json"
+    khan_course.write_text(json.dumps(dump), encoding="utf-8")
+    
+    whole = convert(khan_course, tmp_path / "whole")
+    streamed = convert(khan_course, tmp_path / "streamed", streaming=True)
+    
+    assert normalized_outputs(streamed) == normalized_outputs(whole)
+    assert "Synthetic 2x4" in normalized_outputs(streamed)["course_file"]
+
+# (contentKind, __typename) -> (originalKhanType, type, subType), recorded from
+# the if/elif chain the dispatch table replaced; earlier branches win conflicts
+ORIGINAL_CLASSIFICATION = [
+    ("Video", "Video", "video", "video", "educational-video"),
+    ("Video", "Exercise", "video", "video", "educational-video"),
+    ("Exercise", "Video", "exercise", "video", "educational-video"),
+    ("Exercise", "TopicQuiz", "exercise", "qti-assessment", "qti-test"),
+    ("Article", "Exercise", "article", "qti-assessment", "qti-test"),
+    ("Article", "TopicQuiz", "article", "text", "article"),
+    ("Quiz", "Article", "quiz", "text", "article"),
+    ("Quiz", "TopicQuiz", "quiz", "qti-assessment", "qti-quiz"),
+    ("Quiz", "Challenge", "quiz", "qti-assessment", "qti-quiz"),
+    ("TopicQuiz", "TopicQuiz", "topicquiz", "qti-assessment", "qti-quiz"),
+    ("TopicQuiz", "Quiz", "topicquiz", "text", "general-content"),
+    ("TopicQuiz", "", "topicquiz", "text", "general-content"),
+    ("Interactive", "TopicQuiz", "interactive", "qti-assessment", "qti-quiz"),
+    ("Interactive", "", "interactive", "text", "general-content"),
+    ("", "Video", "video", "video", "educational-video"),
+    ("", "Exercise", "exercise", "qti-assessment", "qti-test"),
+    ("", "Article", "article", "text", "article"),
+    ("", "TopicQuiz", "topicquiz", "qti-assessment", "qti-quiz"),
+    ("", "Quiz", "quiz", "text", "general-content"),
+    ("", "Challenge", "challenge", "text", "general-content"),
+    ("VIDEO", "", "video", "video", "educational-video"),
+]
+
+@pytest.mark.parametrize("content_kind, typename, khan_type, resource_type, sub_type", ORIGINAL_CLASSIFICATION)
+def test_classification_matches_the_original_rules(content_kind, typename, khan_type, resource_type, sub_type):
+    assert classify_content(content_kind, typename) == (khan_type, resource_type, sub_type)
+
+@pytest.mark.parametrize("content, index, expected", [
+    ({"__typename": "Exercise", "id": "x1", "contentKind": "Exercise", "translatedTitle": "Add fractions",
+      "translatedDescription": "Practice adding", "canonicalUrl": "/math/x/add",
+      "timeEstimate": {"lowerBound": 2, "upperBound": 6}}, 3,
+     '{"sourcedId": "<id>", "title": "Add fractions", "sortOrder": 3, "resource": {"sourcedId": "<id>", '
+     '"status": "active", "title": "Add fractions", "vendorResourceId": "x1", "metadata": {'
+     '"originalKhanType": "exercise", "originalKhanId": "x1", "description": "Practice adding", '
+     '"canonicalUrl": "/math/x/add", "estimatedDuration": {"lowerBound": 2, "upperBound": 6}, '
+     '"type": "qti-assessment", "subType": "qti-test", "url": "https://www.khanacademy.org/math/x/add"}}}'),
+    ({"__typename": "Challenge", "translatedTitle": "Bonus"}, 0,
+     '{"sourcedId": "<id>", "title": "Bonus", "sortOrder": 0, "resource": {"sourcedId": "<id>", '
+     '"status": "active", "title": "Bonus", "vendorResourceId": "", "metadata": {'
+     '"originalKhanType": "challenge", "originalKhanId": "", "description": "", "canonicalUrl": "", '
+     '"type": "text", "subType": "general-content"}}}'),
+])
+def test_resource_model_serializes_like_the_original_dicts(content, index, expected):
+    resource = KhanToTimeBackConverter()._convert_content_to_resource(content, index)
+    
+    # Key order included: it decides the bytes written
+    assert UUID.sub("<id>", json.dumps(resource.to_dict())) == expected
+
+def test_content_without_kind_or_typename_is_skipped():
+    assert KhanToTimeBackConverter()._convert_content_to_resource({"translatedTitle": "Unit intro"}, 0) is None
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_streaming_output_matches_the_compact_output(khan_course, tmp_path, streaming):
+    compact = convert(khan_course, tmp_path / "compact", "production", streaming=streaming)
+    streamed = convert(khan_course, tmp_path / "streamed", "production", streaming=streaming, streaming_output=True)
+    
+    assert streamed["syllabus"] is None
+    assert sorted(streamed["output_files"]) == sorted(compact["output_files"])
+    assert normalized_outputs(streamed) == normalized_outputs(compact)
+    assert streamed["summary"] == compact["summary"]
+
+def test_streaming_output_requires_the_production_profile(khan_course, tmp_path):
+    with pytest.raises(ValueError):
+        convert(khan_course, tmp_path / "out", "pretty", streaming_output=True)
+
+def test_production_files_hold_the_pretty_content_compactly(khan_course, tmp_path):
+    pretty = convert(khan_course, tmp_path / "pretty")
+    production = convert(khan_course, tmp_path / "production", "production")
+    
+    pretty_text, production_text = normalized_outputs(pretty), normalized_outputs(production)
+    for kind in ("course_file", "syllabus_file"):
+        assert json.loads(production_text[kind]) == json.loads(pretty_text[kind])
+        assert "\n" not in production_text[kind]
+    combined = json.loads(production_text["combined_file"])
+    assert combined["course"] == json.loads(production_text["course_file"])
+    assert combined["syllabus"] == json.loads(production_text["syllabus_file"])
+    assert production_text["combined_file_gz"] == production_text["combined_file"]
+
+def test_precompressed_siblings_are_reproducible(tmp_path):
+    data = {"title": "Fractions ½", "items": list(range(50))}
+    first = write_artifact(str(tmp_path / "a.json"), [encode_json(data, "production")])
+    second = write_artifact(str(tmp_path / "b.json"), [encode_json(data, "production")])
+    
+    gz = open(first["gz"], 'rb').read()
+    assert gz == open(second["gz"], 'rb').read()
+    assert gzip.decompress(gz) == (tmp_path / "a.json").read_bytes()
+    assert json.loads(gzip.decompress(gz)) == data
+    assert write_artifact(str(tmp_path / "c.json"), [b"{}"], precompress=False) == {}
+    assert not (tmp_path / "c.json.gz").exists()
+
+def test_brotli_sibling_when_brotli_is_installed(tmp_path):
+    brotli = pytest.importorskip("brotli")
+    siblings = write_artifact(str(tmp_path / "a.json"), [b'{"a":', b'1}'])
+    
+    assert brotli.decompress(open(siblings["br"], 'rb').read()) == b'{"a":1}'
+
+def test_pretty_profile_keeps_the_indented_encoding():
+    data = {"title": "Fractions ½", "grades": ["6"]}
+    
+    assert encode_json(data) == json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+    assert json.loads(encode_json(data, "production")) == data
+    with pytest.raises(ValueError):
+        KhanToTimeBackConverter(output_profile="fast")
+
+@pytest.mark.parametrize("output_profile, options", [("pretty", {}), ("production", {}),
+                                                     ("production", {"streaming_output": True})])
+def test_syllabus_shards_split_the_monolithic_syllabus(khan_course, tmp_path, output_profile, options):
+    converter = KhanToTimeBackConverter(output_profile=output_profile, shard_syllabus=True)
+    result = converter.convert_khan_course(str(khan_course), str(tmp_path / "out"), **options)
+    
+    shard_dir = result["output_files"]["syllabus_shards_dir"]
+    syllabus = read_json(result["output_files"]["syllabus_file"])
+    index = read_json(os.path.join(shard_dir, "index.json"))
+    components = syllabus["subComponents"]
+    assert index["componentCount"] == len(components) == 3
+    assert [entry["sourcedId"] for entry in index["components"]] == [component["sourcedId"] for component in components]
+    assert index["resourceCount"] == sum(entry["resourceCount"] for entry in index["components"])
+    for entry, component in zip(index["components"], components):
+        assert read_json(os.path.join(shard_dir, entry["shard"])) == component
+        assert entry["resourceCount"] == len(component["componentResources"])
@@ -0,0 +1,420 @@
+"""Generated Lambda handler, invoked with API Gateway-shaped events against the local stand-ins"""
+
+import ast
+import base64
+import json
+
+import pytest
+
+from aws_hosting_setup import AWSTimeBackHosting, proxy_event as request_event
+from benchmark_converter import write_synthetic_course
+from khan_to_timeback_converter import convert_batch
+from local_timeback_server import load_handler
+
+COURSE_ID = "c0000000-0000-4000-8000-000000000001"
+
+@pytest.fixture
+def handler(tmp_path):
+    course = {"sourcedId": COURSE_ID, "title": "Pre-algebra", "status": "active"}
+    (tmp_path / f"course_{COURSE_ID}.json").write_text(json.dumps(course), encoding="utf-8")
+    components = [json.dumps({"sourcedId": f"u{index}", "title": f"Unit {index}"}) for index in range(3)]
+    syllabus = '{"subComponents": [' + ", ".join(components) + ']}'
+    offsets, start = {}, len('{"subComponents": [')
+    for index, component in enumerate(components):
+        offsets[f"u{index}"] = [start, start + len(component) - 1]
+        start += len(component) + 2
+    (tmp_path / f"syllabus_{COURSE_ID}.json").write_text(syllabus, encoding="utf-8")
+    (tmp_path / f"syllabus_{COURSE_ID}.offsets.json").write_text(
+        json.dumps({"bytes": len(syllabus), "components": offsets}), encoding="utf-8")
+    (tmp_path / "catalog.json").write_text(json.dumps({"version": 1, "courseCount": 1, "courses": [course]}),
+                                           encoding="utf-8")
+    return load_handler(str(tmp_path))
+
+def proxy_event(path, query=None):
+    """What the root {proxy+} integration delivers: no courseId, only the proxy path"""
+    return {
+        "resource": "/{proxy+}",
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": query,
+        "pathParameters": {"proxy": path.lstrip("/")},
+        "body": None,
+        "isBase64Encoded": False
+    }
+
+def test_course_by_id_through_root_proxy(handler):
+    response = handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)
+    
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["sourcedId"] == COURSE_ID
+    assert response["headers"]["Cache-Control"] == handler.CACHE_CONTROL["content"]
+
+def test_missing_course_through_root_proxy(handler):
+    response = handler.lambda_handler(proxy_event("/courses/does-not-exist"), None)
+    
+    assert response["statusCode"] == 404
+
+def test_course_listing_through_root_proxy(handler):
+    response = handler.lambda_handler(proxy_event("/courses"), None)
+    
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["courseCount"] == 1
+    assert response["headers"]["Cache-Control"] == handler.CACHE_CONTROL["catalog"]
+
+def test_local_events_match_the_root_proxy(handler):
+    event = request_event("GET", f"/courses/{COURSE_ID}?fields=title")
+    
+    assert event == dict(proxy_event(f"/courses/{COURSE_ID}"), queryStringParameters={"fields": "title"})
+    assert handler.lambda_handler(event, None)["statusCode"] == 200
+
+def test_component_is_cut_from_the_cached_syllabus(handler):
+    handler.lambda_handler(proxy_event(f"/powerpath/syllabus/{COURSE_ID}"), None)
+    handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)
+    s3 = handler._clients["s3"]
+    ranged = []
+    original = s3.get_object
+    
+    def get_object(**request):
+        if "Range" in request:
+            ranged.append(request)
+        return original(**request)
+    s3.get_object = get_object
+    
+    response = handler.lambda_handler(proxy_event(f"/powerpath/syllabus/{COURSE_ID}/components/u1"), None)
+    
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"]) == {"sourcedId": "u1", "title": "Unit 1"}
+    # No ranged GET, and the syllabus is now the most recently used cache entry
+    assert ranged == []
+    assert next(reversed(handler._cache)) == f"syllabi/{COURSE_ID}.json"
+
+def test_missing_manifest_is_not_requested_again(handler):
+    s3 = handler._clients["s3"]
+    keys = []
+    original = s3.get_object
+    
+    def get_object(**request):
+        keys.append(request["Key"])
+        return original(**request)
+    s3.get_object = get_object
+    
+    for _ in range(2):
+        assert handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)["statusCode"] == 200
+    
+    assert keys.count(handler.MANIFEST_KEY) == 1
+    
+    # Once the miss expires the bucket is checked for a newly published manifest
+    handler._manifest[2] = 0.0
+    handler.lambda_handler(proxy_event("/courses/does-not-exist"), None)
+    assert keys.count(handler.MANIFEST_KEY) == 2
+
+LIBRARY = [("Geometry", "Math"), ("Algebra", "Math"), ("Cell biology", "Science"), ("Calculus", "Math"),
+           ("World history", "History")]
+
+@pytest.fixture
+def library(tmp_path):
+    """Handler over several courses, listed through the metadata table rather than the catalog"""
+    for index, (title, subject) in enumerate(LIBRARY):
+        course = {"sourcedId": f"c{index}", "title": title, "status": "active", "subjects": [subject],
+                  "grades": ["9"]}
+        (tmp_path / f"course_c{index}.json").write_text(json.dumps(course), encoding="utf-8")
+    return load_handler(str(tmp_path))
+
+def list_courses(handler, **query):
+    response = handler.lambda_handler(proxy_event("/courses", query), None)
+    assert response["statusCode"] == 200, response["body"]
+    return json.loads(response["body"])
+
+def page_through(handler, **query):
+    """Every page of a listing, following next tokens"""
+    pages = [list_courses(handler, **query)]
+    while "next" in pages[-1]:
+        pages.append(list_courses(handler, **dict(query, next=pages[-1]["next"])))
+    return pages
+
+def test_listing_pages_with_next_tokens(library):
+    pages = page_through(library, limit="2")
+    
+    assert [len(page["courses"]) for page in pages] == [2, 2, 1]
+    assert [course["sourcedId"] for page in pages for course in page["courses"]] == \
+        [f"c{index}" for index in range(len(LIBRARY))]
+    assert [course["sourcedId"] for course in list_courses(library, offset="3")["courses"]] == ["c3", "c4"]
+
+@pytest.mark.parametrize("order_by", ["asc", "desc"])
+def test_listing_sorts_and_projects_fields(library, order_by):
+    pages = page_through(library, sort="title", orderBy=order_by, fields="title", limit="3")
+    
+    titles = sorted(title for title, _ in LIBRARY)
+    assert [course for page in pages for course in page["courses"]] == \
+        [{"title": title} for title in (titles if order_by == "asc" else titles[::-1])]
+
+def test_listing_filters_across_pages(library):
+    pages = page_through(library, filter="subjects='Math'", sort="title", limit="1")
+    
+    assert [course["title"] for page in pages for course in page["courses"]] == ["Algebra", "Calculus", "Geometry"]
+    either = list_courses(library, filter="title='Algebra' OR title='World history'")
+    assert sorted(course["sourcedId"] for course in either["courses"]) == ["c1", "c4"]
+    both = list_courses(library, filter="status='active' AND title>='D'")
+    assert sorted(course["sourcedId"] for course in both["courses"]) == ["c0", "c4"]
+
+@pytest.mark.parametrize("query", [{"limit": "0"}, {"limit": "ten"}, {"limit": "1001"}, {"offset": "-1"},
+                                   {"sort": "grades"}, {"fields": "title,sourced-id"}, {"next": "!!"},
+                                   {"filter": "title~Algebra"}, {"filter": "title='A' AND title='B' OR title='C'"}])
+def test_invalid_listing_parameters_are_rejected(library, query):
+    response = library.lambda_handler(proxy_event("/courses", query), None)
+    
+    assert response["statusCode"] == 400
+    assert "error" in json.loads(response["body"])
+
+def test_next_token_only_continues_its_own_query(library):
+    token = list_courses(library, limit="1")["next"]
+    
+    response = library.lambda_handler(proxy_event("/courses", {"sort": "title", "next": token}), None)
+    assert response["statusCode"] == 400
+
+def record_s3_requests(handler):
+    """List that collects every get_object request the handler makes from now on"""
+    s3 = handler._clients["s3"]
+    requests = []
+    original = s3.get_object
+    
+    def get_object(**request):
+        requests.append(request)
+        return original(**request)
+    s3.get_object = get_object
+    return requests
+
+def test_warm_reads_are_served_from_the_cache(handler):
+    handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)
+    requests = record_s3_requests(handler)
+    
+    response = handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)
+    
+    assert response["statusCode"] == 200 and json.loads(response["body"])["sourcedId"] == COURSE_ID
+    assert requests == []
+
+def test_expired_entries_are_revalidated_conditionally(handler, tmp_path):
+    key = f"courses/{COURSE_ID}.json"
+    first = handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)
+    requests = record_s3_requests(handler)
+    
+    handler._cache[key][2] = 0.0
+    unchanged = handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)
+    
+    assert [request.get("IfNoneMatch") for request in requests if request["Key"] == key] == \
+        [first["headers"]["ETag"]]
+    assert unchanged["body"] == first["body"]
+    # A 304 extends the entry, so the next read is local again
+    handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)
+    assert len([request for request in requests if request["Key"] == key]) == 1
+    
+    (tmp_path / f"course_{COURSE_ID}.json").write_text(json.dumps({"sourcedId": COURSE_ID, "title": "Algebra"}),
+                                                       encoding="utf-8")
+    handler._cache[key][2] = 0.0
+    changed = handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)
+    
+    assert json.loads(changed["body"])["title"] == "Algebra"
+    assert changed["headers"]["ETag"] != first["headers"]["ETag"]
+
+def test_cache_evicts_least_recently_used_objects(handler, monkeypatch, tmp_path):
+    course_key, syllabus_key = f"courses/{COURSE_ID}.json", f"syllabi/{COURSE_ID}.json"
+    handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)
+    handler.lambda_handler(proxy_event(f"/powerpath/syllabus/{COURSE_ID}"), None)
+    # Room for the course and the catalog, but not for the syllabus as well
+    catalog_bytes = len((tmp_path / "catalog.json").read_bytes())
+    monkeypatch.setattr(handler, "CACHE_MAX_BYTES", len(handler._cache[course_key][0]) + catalog_bytes)
+    
+    # Touching the course makes the syllabus the least recently used entry
+    handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)
+    handler.lambda_handler(proxy_event("/courses"), None)
+    
+    assert syllabus_key not in handler._cache and course_key in handler._cache
+    assert handler._cache_bytes == sum(len(entry[0]) for entry in handler._cache.values())
+    assert handler._cache_bytes <= handler.CACHE_MAX_BYTES
+
+def test_objects_larger_than_the_cache_are_not_kept(handler, monkeypatch):
+    monkeypatch.setattr(handler, "CACHE_MAX_BYTES", 16)
+    
+    for _ in range(2):
+        assert handler.lambda_handler(proxy_event(f"/courses/{COURSE_ID}"), None)["statusCode"] == 200
+    
+    assert len(handler._cache) == 0 and handler._cache_bytes == 0
+
+def progress(body, method="POST", encode=False):
+    event = request_event(method, "/progress/batch", {"Content-Type": "application/json"}, body.encode("utf-8"))
+    if encode:
+        event["body"], event["isBase64Encoded"] = base64.b64encode(body.encode("utf-8")).decode("ascii"), True
+    return event
+
+def attempt(**fields):
+    return dict({"userId": "learner", "lessonId": "l1", "completedDate": "2024-05-01T10:00:00Z",
+                 "timeSpent": 60, "score": 4, "totalPossible": 5}, **fields)
+
+@pytest.mark.parametrize("encode", [False, True])
+def test_progress_batch_is_written(handler, encode):
+    body = json.dumps({"events": [attempt(), attempt(completedDate="2024-05-01T10:05:00Z", score=5)]})
+    
+    response = handler.lambda_handler(progress(body, encode=encode), None)
+    
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"]) == {"accepted": 2, "rejected": [], "written": 1}
+
+@pytest.mark.parametrize("literal", ["NaN", "Infinity", "-Infinity"])
+def test_non_finite_numbers_are_rejected(handler, literal):
+    # json.dumps cannot produce these, so splice the literal in as a client's encoder would
+    body = '[' + json.dumps(attempt()) + ', ' + json.dumps(attempt(timeSpent=0)).replace(": 0,", f": {literal},") + ']'
+    assert literal in body
+    
+    response = handler.lambda_handler(progress(body), None)
+    
+    assert response["statusCode"] == 200
+    result = json.loads(response["body"])
+    assert result["accepted"] == 1
+    assert result["rejected"] == [{"index": 1, "error": "timeSpent must be a non-negative number"}]
+
+@pytest.mark.parametrize("event, error", [
+    (attempt(userId=""), "userId must be a non-empty string"),
+    (attempt(completedDate="yesterday"), "completedDate must be an ISO 8601 timestamp"),
+    (attempt(score=1.5), "score must be a non-negative integer"),
+    (attempt(score=True), "score must be a non-negative integer"),
+    (attempt(score=6), "score exceeds totalPossible"),
+    ("not an event", "event must be an object"),
+])
+def test_invalid_progress_events_are_rejected(handler, event, error):
+    response = handler.lambda_handler(progress(json.dumps([event])), None)
+    
+    assert json.loads(response["body"])["rejected"] == [{"index": 0, "error": error}]
+
+@pytest.mark.parametrize("body", ["{not json", "[]", '{"events": {}}'])
+def test_malformed_progress_body_is_a_bad_request(handler, body):
+    assert handler.lambda_handler(progress(body), None)["statusCode"] == 400
+
+def test_progress_batch_only_accepts_post(handler):
+    response = handler.lambda_handler(progress("", method="GET"), None)
+    
+    assert response["statusCode"] == 405
+    assert response["headers"]["Allow"] == "POST"
+
+def test_progress_coalesces_per_batch(handler):
+    table = handler._clients["dynamodb"].tables["local-progress"]
+    first = json.dumps([attempt(), attempt(completedDate="2024-05-01T10:05:00Z")])
+    
+    handler.lambda_handler(progress(first), None)
+    handler.lambda_handler(progress(first), None)
+    assert len(table) == 1
+    
+    # A later batch for the same lesson is stored alongside, not merged
+    handler.lambda_handler(progress(json.dumps([attempt(completedDate="2024-05-02T09:00:00Z")])), None)
+    assert len(table) == 2
+
+def test_handler_module_defers_thread_pool_import():
+    tree = ast.parse(AWSTimeBackHosting()._get_lambda_code())
+    top_level = {alias.name for node in tree.body if isinstance(node, ast.Import) for alias in node.names}
+    top_level |= {node.module for node in tree.body if isinstance(node, ast.ImportFrom)}
+    
+    assert "concurrent.futures" not in top_level
+    assert "boto3" not in top_level
+
+def test_multi_get_returns_each_course_with_its_status(handler):
+    response = handler.lambda_handler(proxy_event("/courses", {"ids": f"{COURSE_ID},missing,{COURSE_ID}"}), None)
+    
+    assert response["statusCode"] == 200
+    courses = json.loads(response["body"])["courses"]
+    assert [(course["sourcedId"], course["status"]) for course in courses] == [(COURSE_ID, 200), ("missing", 404)]
+    assert courses[0]["course"]["title"] == "Pre-algebra"
+
+@pytest.mark.parametrize("ids", ["", ",", "a/b", ",".join(f"c{index}" for index in range(101))])
+def test_multi_get_rejects_unusable_ids(handler, ids):
+    response = handler.lambda_handler(proxy_event("/courses", {"ids": ids}), None)
+    
+    assert response["statusCode"] == 400
+
+def test_shared_resource_references_resolve_in_one_request(tmp_path):
+    khan_course = tmp_path / "khan_course.json"
+    write_synthetic_course(str(khan_course), 2, 4)
+    output_dir = tmp_path / "out"
+    summary = convert_batch([str(khan_course)], str(output_dir), workers=1, dedupe_resources=True)
+    course_file = summary["files"][0]["outputFiles"]["course_file"]
+    course_id = json.loads(open(course_file, encoding="utf-8").read())["sourcedId"]
+    handler = load_handler(str(output_dir))
+    
+    syllabus = json.loads(handler.lambda_handler(proxy_event(f"/powerpath/syllabus/{course_id}"), None)["body"])
+    references = [component_resource["resource"] for component in syllabus["syllabus"]["subComponents"]
+                  for component_resource in component["componentResources"]]
+    assert references and all(set(reference) == {"sourcedId", "title"} for reference in references)
+    ids = [reference["sourcedId"] for reference in references]
+    
+    response = handler.lambda_handler(proxy_event("/resources", {"ids": ",".join(ids + ["missing"])}), None)
+    
+    resources = json.loads(response["body"])["resources"]
+    assert [(resource["sourcedId"], resource["status"]) for resource in resources] == \
+        [(resource_id, 200) for resource_id in ids] + [("missing", 404)]
+    assert all(resource["resource"]["courseIds"] == [course_id] for resource in resources[:-1])
+
+def test_sharded_syllabus_serves_index_and_components(tmp_path):
+    khan_course = tmp_path / "khan_course.json"
+    write_synthetic_course(str(khan_course), 3, 4)
+    output_dir = tmp_path / "out"
+    summary = convert_batch([str(khan_course)], str(output_dir), workers=1, shard_syllabus=True)
+    output_files = summary["files"][0]["outputFiles"]
+    course_id = json.loads(open(output_files["course_file"], encoding="utf-8").read())["sourcedId"]
+    syllabus = json.loads(open(output_files["syllabus_file"], encoding="utf-8").read())
+    # The pretty profile writes no offsets index, so components come from the shards
+    assert "syllabus_offsets_file" not in output_files
+    handler = load_handler(str(output_dir))
+    
+    index = handler.lambda_handler(proxy_event(f"/powerpath/syllabus/{course_id}/index"), None)
+    assert index["statusCode"] == 200 and index["headers"]["ETag"]
+    entries = json.loads(index["body"])["components"]
+    assert [entry["sourcedId"] for entry in entries] == \
+        [component["sourcedId"] for component in syllabus["subComponents"]]
+    
+    for component in syllabus["subComponents"]:
+        path = f"/powerpath/syllabus/{course_id}/components/{component['sourcedId']}"
+        response = handler.lambda_handler(proxy_event(path), None)
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"]) == component
+    
+    missing = [f"/powerpath/syllabus/{course_id}/components/missing", "/powerpath/syllabus/missing/index"]
+    assert [handler.lambda_handler(proxy_event(path), None)["statusCode"] for path in missing] == [404, 404]
+
+class NoHashing:
+    """Stands in for hashlib in the handler module; any hashing fails the test"""
+    
+    def __getattr__(self, name):
+        raise AssertionError(f"hashlib.{name} called")
+
+@pytest.mark.parametrize("path", [f"/courses/{COURSE_ID}", f"/powerpath/syllabus/{COURSE_ID}", "/courses"])
+def test_stored_objects_revalidate_without_hashing(handler, monkeypatch, path):
+    monkeypatch.setattr(handler, "hashlib", NoHashing())
+    first = handler.lambda_handler(proxy_event(path), None)
+    etag = first["headers"]["ETag"]
+    
+    event = proxy_event(path)
+    event["headers"] = {"If-None-Match": etag}
+    second = handler.lambda_handler(event, None)
+    
+    assert first["statusCode"] == 200 and json.loads(first["body"])
+    assert second["statusCode"] == 304 and second["body"] == ""
+    assert second["headers"]["ETag"] == etag
+
+def test_not_modified_response_skips_building_the_body(handler, monkeypatch):
+    etag = handler.lambda_handler(proxy_event(f"/powerpath/syllabus/{COURSE_ID}"), None)["headers"]["ETag"]
+    built = []
+    original = handler.get_syllabus
+    
+    def get_syllabus(course_id):
+        response = original(course_id)
+        body = response["body"]
+        response["body"] = lambda: built.append(course_id) or body()
+        return response
+    monkeypatch.setattr(handler, "get_syllabus", get_syllabus)
+    
+    event = proxy_event(f"/powerpath/syllabus/{COURSE_ID}")
+    event["headers"] = {"if-none-match": etag}
+    assert handler.lambda_handler(event, None)["statusCode"] == 304
+    assert built == []
+    
+    assert handler.lambda_handler(proxy_event(f"/powerpath/syllabus/{COURSE_ID}"), None)["statusCode"] == 200
+    assert built == [COURSE_ID]
@@ -0,0 +1,34 @@
+"""Local HTTP front end for the generated handler"""
+
+import asyncio
+import json
+
+import pytest
+
+from local_timeback_server import LocalTimeBackServer, load_handler
+
+EVENT = {"userId": "learner", "lessonId": "l1", "completedDate": "2024-05-01T10:00:00Z", "timeSpent": 60, "score": 4}
+
+async def exchange(content_dir, request):
+    server = await LocalTimeBackServer(load_handler(content_dir)).start(port=0)
+    async with server:
+        reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+        writer.write(request)
+        await writer.drain()
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        headers = dict(line.split(": ", 1) for line in head[1:] if line)
+        body = await reader.readexactly(int(headers["Content-Length"]))
+        writer.close()
+    return int(head[0].split(" ")[1]), headers, body
+
+@pytest.mark.parametrize("name", ["Content-Length", "content-length", "CONTENT-LENGTH"])
+def test_request_body_length_header_is_case_insensitive(tmp_path, name):
+    body = json.dumps([EVENT]).encode("utf-8")
+    request = (f"POST /progress/batch HTTP/1.1\r\nhost: localhost\r\n{name}: {len(body)}\r\n"
+               f"connection: close\r\n\r\n").encode("latin-1") + body
+    
+    status, headers, response = asyncio.run(exchange(str(tmp_path), request))
+    
+    assert status == 200
+    assert json.loads(response)["accepted"] == 1
+    assert headers["Connection"] == "close"
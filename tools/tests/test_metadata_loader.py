@@ -0,0 +1,186 @@
+"""MetadataLoader against a stub DynamoDB client"""
+
+import json
+
+import pytest
+
+from metadata_loader import MetadataLoader, BATCH_SIZE, iter_metadata_items, request_key
+
+TABLE = "metadata"
+
+class StubError(Exception):
+    """Shaped like botocore's ClientError"""
+    
+    def __init__(self, code, status=400):
+        super().__init__(code)
+        self.response = {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}}
+
+class StubDynamoDB:
+    """batch_write_item that stores and deletes items and can leave chosen ones unprocessed"""
+    
+    def __init__(self, unprocessed_calls=0, always_unprocessed=(), errors=()):
+        self.items = {}
+        self.calls = []
+        self.unprocessed_calls = unprocessed_calls
+        self.always_unprocessed = set(always_unprocessed)
+        self.errors = list(errors)
+    
+    def batch_write_item(self, RequestItems):
+        requests = RequestItems[TABLE]
+        keys = [request_key(request) for request in requests]
+        self.calls.append(keys)
+        assert len(requests) <= BATCH_SIZE
+        if len(set(keys)) != len(keys):
+            raise StubError("ValidationException")
+        # errors are raised call by call; None lets that call through
+        error = self.errors.pop(0) if self.errors else None
+        if error:
+            raise error
+        
+        unprocessed = [request for request, key in zip(requests, keys) if key in self.always_unprocessed]
+        if self.unprocessed_calls:
+            # Throttle: half of the batch comes back unprocessed
+            self.unprocessed_calls -= 1
+            unprocessed = requests[len(requests) // 2:]
+        for request, key in zip(requests, keys):
+            if request in unprocessed:
+                continue
+            if "DeleteRequest" in request:
+                self.items.pop(key, None)
+            else:
+                self.items[key] = request["PutRequest"]["Item"]
+        return {"UnprocessedItems": {TABLE: unprocessed} if unprocessed else {}}
+
+def resource(sourced_id, title="Video"):
+    return {"sourcedId": sourced_id, "type": "resource", "title": title}
+
+def loader_for(client):
+    return MetadataLoader(TABLE, client, workers=1, base_delay=0)
+
+def test_unprocessed_items_are_retried():
+    client = StubDynamoDB(unprocessed_calls=3)
+    loader = loader_for(client)
+    
+    state = loader.load([resource(f"r{index}") for index in range(60)])
+    
+    assert len(client.items) == 60
+    assert len(state) == 60
+    assert loader.stats["written"] == 60 and loader.stats["failed"] == 0
+    assert loader.stats["retries"] == 3
+
+def test_resume_writes_only_what_failed_or_changed():
+    items = [resource(f"r{index}") for index in range(30)]
+    first = loader_for(StubDynamoDB(always_unprocessed={"r3", "r17"}))
+    state = first.load(items)
+    
+    assert first.stats["failed"] == 2
+    assert set(state) == {item["sourcedId"] for item in items} - {"r3", "r17"}
+    
+    items[5] = resource("r5", "Renamed video")
+    client = StubDynamoDB()
+    second = loader_for(client)
+    state = second.load(items, state)
+    
+    assert sorted(client.items) == ["r17", "r3", "r5"]
+    assert second.stats["unchanged"] == 27
+    assert len(state) == 30
+
+def test_shared_resources_are_written_once_per_batch():
+    # A resource shared by two courses is listed once per course
+    items = [resource("shared"), resource("a"), resource("shared"), resource("b")]
+    client = StubDynamoDB()
+    loader = loader_for(client)
+    
+    loader.load(items)
+    
+    assert client.calls == [["shared", "a", "b"]]
+    assert loader.stats["written"] == 3
+
+@pytest.mark.parametrize("error", [StubError("ProvisionedThroughputExceededException"),
+                                   StubError("ThrottlingException"), StubError("InternalServerError"),
+                                   StubError("ServiceUnavailable", 503)])
+def test_throttling_and_server_errors_are_retried(error):
+    client = StubDynamoDB(errors=[error, error])
+    loader = loader_for(client)
+    
+    loader.load([resource("r1")])
+    
+    assert list(client.items) == ["r1"]
+    assert loader.stats["retries"] == 2
+
+@pytest.mark.parametrize("code", ["ResourceNotFoundException", "ValidationException", "AccessDeniedException"])
+def test_other_errors_fail_without_retrying(code):
+    client = StubDynamoDB(errors=[StubError(code)])
+    loader = loader_for(client)
+    
+    with pytest.raises(StubError):
+        loader.load([resource("r1")])
+    assert len(client.calls) == 1
+
+def test_failed_load_keeps_the_batches_already_written():
+    items = [resource(f"r{index}") for index in range(BATCH_SIZE * 3)]
+    client = StubDynamoDB(errors=[None, StubError("ValidationException")])
+    state = {}
+    
+    with pytest.raises(StubError):
+        loader_for(client).load(items, state)
+    
+    # The first and third chunks were acknowledged and must survive into the saved state
+    assert set(state) == set(client.items)
+    assert len(state) == BATCH_SIZE * 2
+    
+    client = StubDynamoDB()
+    loader_for(client).load(items, state)
+    assert len(client.items) == BATCH_SIZE
+
+def test_superseded_items_are_deleted():
+    client = StubDynamoDB()
+    state = loader_for(client).load([resource("old"), resource("kept"), resource("gone")])
+    
+    # A re-conversion produces new ids for everything but "kept"
+    loader = loader_for(client)
+    loader.load([resource("kept"), resource("new")], state)
+    
+    assert sorted(client.items) == ["kept", "new"]
+    assert sorted(state) == ["kept", "new"]
+    assert loader.stats["deleted"] == 2 and loader.stats["unchanged"] == 1
+
+def test_unprocessed_deletes_stay_in_state():
+    client = StubDynamoDB()
+    state = loader_for(client).load([resource("old"), resource("kept")])
+    client.always_unprocessed = {"old"}
+    
+    loader = loader_for(client)
+    loader.load([resource("kept")], state)
+    
+    # Still recorded, so the next run tries the delete again
+    assert sorted(state) == ["kept", "old"]
+    assert loader.stats["failed"] == 1
+
+def test_rewrite_writes_unchanged_items():
+    client = StubDynamoDB()
+    items = [resource("r1"), resource("r2")]
+    state = loader_for(client).load(items)
+    
+    loader = loader_for(client)
+    loader.load(items, state, rewrite=True)
+    
+    assert client.calls[-1] == ["r1", "r2"]
+    assert loader.stats["written"] == 2
+
+def test_shared_resource_lists_every_course(tmp_path):
+    for course_id, slug in (("c1", "algebra"), ("c2", "geometry")):
+        course = {"sourcedId": course_id, "title": slug, "dateLastModified": "2024-01-01T00:00:00Z",
+                  "metadata": {"originalSlug": slug}}
+        syllabus = {"subComponents": [{"sourcedId": f"{course_id}-unit", "title": "Unit", "componentResources": [
+            {"sortOrder": 1, "resource": {"sourcedId": "shared", "title": "Video", "metadata": {"type": "video"}}},
+            {"sortOrder": 2, "resource": {"sourcedId": f"{course_id}-own", "title": "Quiz"}}]}]}
+        (tmp_path / f"course_{course_id}.json").write_text(json.dumps(course), encoding="utf-8")
+        (tmp_path / f"syllabus_{course_id}.json").write_text(json.dumps(syllabus), encoding="utf-8")
+    
+    resources = {item["sourcedId"]: item for item in iter_metadata_items(str(tmp_path)) if item["type"] == "resource"}
+    
+    assert sorted(resources) == ["c1-own", "c2-own", "shared"]
+    assert resources["shared"]["courseIds"] == ["c1", "c2"]
+    assert resources["shared"]["courseId"] == "c1"
+    assert resources["c2-own"]["courseIds"] == ["c2"]
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+TimeBack API Load Test
+
+Drives a TimeBack API (the local server from local_timeback_server.py, or a
+deployed API Gateway URL over plain HTTP) with a fixed number of concurrent
+keep-alive connections and reports requests/s and p50/p95/p99 latency per
+route. With --content-dir the local server is started in-process, so a
+single command measures the handler against converter output.
+
+--progress-burst replays the write-side peak instead: every learner in a
+school posts their queued lesson completions to /progress/batch at once,
+and ingestion is reported in events/s.
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import argparse
+from datetime import datetime, timezone, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def default_routes(content_dir: str) -> List[str]:
+    """A representative route mix for the courses in a converter output directory"""
+    
+    routes = ["/health", "/courses"]
+    catalog_path = os.path.join(content_dir, "catalog.json")
+    if os.path.exists(catalog_path):
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            courses = json.load(f).get("courses", [])
+        for course in courses[:3]:
+            routes += [f"/courses/{course['sourcedId']}", f"/powerpath/syllabus/{course['sourcedId']}"]
+        if courses:
+            ids = ",".join(course["sourcedId"] for course in courses[:3])
+            routes += [f"/courses?ids={ids}", f"/powerpath/syllabus?ids={ids}"]
+        if courses:
+            word = (courses[0].get("title") or "math").split()[0].lower()
+            routes.append(f"/search?q={word}")
+    routes.append("/courses?limit=20&sort=title")
+    return routes
+
+async def _request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str,
+                   route: str, headers: Dict[str, str], method: str = "GET", body: bytes = b"") -> Tuple[int, bytes]:
+    """One request over an open keep-alive connection; returns the status code and body"""
+    
+    lines = [f"{method} {route} HTTP/1.1", f"Host: {host}"] + [f"{name}: {value}" for name, value in headers.items()]
+    if body:
+        lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    
+    status = int((await reader.readline()).split(b" ", 2)[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value.strip())
+    return status, await reader.readexactly(length)
+
+async def run_load(base_url: str, routes: List[str], concurrency: int = 16, requests: int = 2000,
+                   duration: Optional[float] = None, headers: Optional[Dict[str, str]] = None,
+                   seed: int = 0) -> Dict[str, Any]:
+    """Issue requests (or run for duration seconds) across concurrency connections"""
+    
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    prefix = parts.path.rstrip("/")
+    headers = headers or {}
+    rng = random.Random(seed)
+    latencies: Dict[str, List[float]] = {route: [] for route in routes}
+    statuses: Dict[str, Dict[int, int]] = {route: {} for route in routes}
+    remaining = [requests]
+    deadline = time.perf_counter() + duration if duration else None
+    
+    async def worker():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while True:
+                if deadline is not None:
+                    if time.perf_counter() >= deadline:
+                        break
+                elif remaining[0] <= 0:
+                    break
+                else:
+                    remaining[0] -= 1
+                route = rng.choice(routes)
+                started = time.perf_counter()
+                status, _ = await _request(reader, writer, f"{host}:{port}", prefix + route, headers)
+                latencies[route].append(time.perf_counter() - started)
+                statuses[route][status] = statuses[route].get(status, 0) + 1
+        finally:
+            writer.close()
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    
+    report_routes = {}
+    for route in routes:
+        values = sorted(latencies[route])
+        report_routes[route] = {
+            "requests": len(values),
+            "requestsPerSecond": round(len(values) / elapsed, 1),
+            "p50": round(percentile(values, 0.50) * 1000, 3),
+            "p95": round(percentile(values, 0.95) * 1000, 3),
+            "p99": round(percentile(values, 0.99) * 1000, 3),
+            "statuses": {str(status): count for status, count in sorted(statuses[route].items())}
+        }
+    every = sorted(value for values in latencies.values() for value in values)
+    return {
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "baseUrl": base_url,
+        "concurrency": concurrency,
+        "wallTime": round(elapsed, 3),
+        "routes": report_routes,
+        "total": {
+            "requests": len(every),
+            "requestsPerSecond": round(len(every) / elapsed, 1),
+            "p50": round(percentile(every, 0.50) * 1000, 3),
+            "p95": round(percentile(every, 0.95) * 1000, 3),
+            "p99": round(percentile(every, 0.99) * 1000, 3)
+        }
+    }
+
+def lesson_ids(content_dir: Optional[str], count: int = 200) -> List[str]:
+    """Resource ids to report progress against, from converter output when there is some"""
+    
+    if content_dir:
+        from metadata_loader import iter_metadata_items
+        
+        ids = [item["sourcedId"] for item in iter_metadata_items(content_dir) if item["type"] == "resource"]
+        if ids:
+            return ids[:count]
+    return [f"lesson-{index:04d}" for index in range(count)]
+
+def classroom_burst(learners: int, events_per_learner: int, lessons: List[str], seed: int = 0) -> List[List[Dict[str, Any]]]:
+    """One batch per learner: lesson completions queued during a session, posted together at the bell
+    
+    Learners in a class work through the same stretch of lessons and
+    re-attempt some of them, so batches contain repeats to coalesce.
+    """
+    
+    rng = random.Random(seed)
+    bell = datetime(2025, 1, 15, 15, 0, tzinfo=timezone.utc)
+    batches = []
+    for learner in range(learners):
+        # Classes of 30 share a starting point in the course
+        start = learner // 30 * 7
+        events = []
+        for index in range(events_per_learner):
+            lesson = lessons[(start + rng.randrange(max(1, events_per_learner * 2 // 3))) % len(lessons)]
+            total = rng.choice([4, 5, 10])
+            events.append({
+                "id": f"evt-{learner}-{index}",
+                "userId": f"learner-{learner:05d}",
+                "lessonId": lesson,
+                "courseId": "burst-course",
+                "completedDate": (bell - timedelta(minutes=2 * (events_per_learner - index))).isoformat(),
+                "timeSpent": rng.randint(60, 600),
+                "score": rng.randint(0, total),
+                "totalPossible": total,
+                "xpEarned": rng.randint(5, 50)
+            })
+        batches.append(events)
+    return batches
+
+async def run_progress_burst(base_url: str, batches: List[List[Dict[str, Any]]], concurrency: int = 64,
+                             max_retries: int = 5) -> Dict[str, Any]:
+    """POST every batch to /progress/batch across concurrency connections, resubmitting on 503"""
+    
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    route = parts.path.rstrip("/") + "/progress/batch"
+    queue = list(reversed(batches))
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    totals = {"accepted": 0, "rejected": 0, "written": 0, "retries": 0, "failedBatches": 0}
+    
+    async def worker():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while queue:
+                body = json.dumps({"events": queue.pop()}).encode("utf-8")
+                for attempt in range(max_retries + 1):
+                    started = time.perf_counter()
+                    status, payload = await _request(reader, writer, f"{host}:{port}", route, {}, "POST", body)
+                    latencies.append(time.perf_counter() - started)
+                    statuses[status] = statuses.get(status, 0) + 1
+                    if status != 503:
+                        break
+                    totals["retries"] += 1
+                    await asyncio.sleep(0.05 * 2 ** attempt)
+                if status != 200:
+                    totals["failedBatches"] += 1
+                    continue
+                result = json.loads(payload)
+                totals["accepted"] += result["accepted"]
+                totals["rejected"] += len(result["rejected"])
+                totals["written"] += result["written"]
+        finally:
+            writer.close()
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(batches)))))
+    elapsed = time.perf_counter() - started
+    
+    values = sorted(latencies)
+    events = sum(len(batch) for batch in batches)
+    return {
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+        "baseUrl": base_url,
+        "concurrency": concurrency,
+        "batches": len(batches),
+        "events": events,
+        "wallTime": round(elapsed, 3),
+        "eventsPerSecond": round(totals["accepted"] / elapsed, 1),
+        "requestsPerSecond": round(len(values) / elapsed, 1),
+        "p50": round(percentile(values, 0.50) * 1000, 3),
+        "p95": round(percentile(values, 0.95) * 1000, 3),
+        "p99": round(percentile(values, 0.99) * 1000, 3),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        **totals
+    }
+
+async def _run_against_local(content_dir: str, server_concurrency: int, unprocessed_rate: float,
+                             runner, **load_args) -> Dict[str, Any]:
+    from local_timeback_server import LocalTimeBackServer, load_handler
+    
+    handler_module = load_handler(content_dir, unprocessed_rate=unprocessed_rate)
+    server = await LocalTimeBackServer(handler_module, server_concurrency).start("127.0.0.1", 0)
+    try:
+        port = server.sockets[0].getsockname()[1]
+        report = await runner(f"http://127.0.0.1:{port}", **load_args)
+        report["dynamodb"] = dict(handler_module._clients["dynamodb"].stats)
+        return report
+    finally:
+        server.close()
+        await server.wait_closed()
+
+def _parse_header(value: str) -> Tuple[str, str]:
+    name, separator, header_value = value.partition(":")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Expected NAME:VALUE, got {value!r}")
+    return name.strip(), header_value.strip()
+
+def print_route_report(report: Dict[str, Any]):
+    print(f"\n📊 {report['total']['requests']} requests in {report['wallTime']:.2f}s")
+    print(f"   {'route':<48} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    for route, metrics in list(report["routes"].items()) + [("total", report["total"])]:
+        statuses = " ".join(f"{status}x{count}" for status, count in metrics.get("statuses", {}).items())
+        print(f"   {route[:48]:<48} {metrics['requestsPerSecond']:9.1f} {metrics['p50']:9.2f} "
+              f"{metrics['p95']:9.2f} {metrics['p99']:9.2f}  {statuses}")
+
+def main():
+    """Command line interface for the load test"""
+    
+    parser = argparse.ArgumentParser(description="Load test a TimeBack API and report latency percentiles per route")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running API, e.g. http://127.0.0.1:8080")
+    target.add_argument("--content-dir", help="Serve this converter output in-process and test it")
+    parser.add_argument("--routes", nargs="+", help="Routes to request (default: a mix derived from catalog.json)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client connections")
+    parser.add_argument("--requests", type=int, default=2000, help="Total requests to send")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of a request count")
+    parser.add_argument("--server-concurrency", type=int, default=8,
+                        help="Parallel handler invocations for the in-process server")
+    parser.add_argument("--header", action="append", type=_parse_header, default=[],
+                        help="Extra request header as NAME:VALUE (repeatable)")
+    parser.add_argument("--progress-burst", action="store_true",
+                        help="Post a school's queued lesson completions to /progress/batch at once")
+    parser.add_argument("--classrooms", type=int, default=20, help="Classrooms in the burst")
+    parser.add_argument("--class-size", type=int, default=30, help="Learners per classroom")
+    parser.add_argument("--events-per-learner", type=int, default=12, help="Progress events in each learner's batch")
+    parser.add_argument("--unprocessed-rate", type=float, default=0.0,
+                        help="Share of writes the in-process DynamoDB stand-in returns unprocessed (0-1)")
+    parser.add_argument("--output", help="Write the JSON report here")
+    
+    args = parser.parse_args()
+    
+    if args.progress_burst:
+        learners = args.classrooms * args.class_size
+        batches = classroom_burst(learners, args.events_per_learner, lesson_ids(args.content_dir))
+        load_args = dict(batches=batches, concurrency=args.concurrency)
+        print(f"⏱️  Progress burst: {learners} learners x {args.events_per_learner} events "
+              f"over {args.concurrency} connections...")
+        if args.content_dir:
+            report = asyncio.run(_run_against_local(args.content_dir, args.server_concurrency, args.unprocessed_rate,
+                                                    run_progress_burst, **load_args))
+        else:
+            report = asyncio.run(run_progress_burst(args.url, **load_args))
+        
+        print(f"\n📊 {report['events']} events in {report['batches']} batches, {report['wallTime']:.2f}s")
+        print(f"   Ingested: {report['eventsPerSecond']:,.1f} events/s ({report['requestsPerSecond']:.1f} requests/s)")
+        print(f"   Batch latency: p50 {report['p50']:.2f} ms, p95 {report['p95']:.2f} ms, p99 {report['p99']:.2f} ms")
+        print(f"   Accepted {report['accepted']}, rejected {report['rejected']}, "
+              f"coalesced into {report['written']} items")
+        print(f"   Statuses: {' '.join(f'{status}x{count}' for status, count in report['statuses'].items())}"
+              f" ({report['retries']} resubmitted, {report['failedBatches']} failed)")
+        if "dynamodb" in report:
+            stats = report["dynamodb"]
+            print(f"   DynamoDB stand-in: {stats['batchWrites']} BatchWriteItem calls, "
+                  f"{stats['unprocessed']} items returned unprocessed")
+    else:
+        routes = args.routes or default_routes(args.content_dir or ".")
+        load_args = dict(routes=routes, concurrency=args.concurrency, requests=args.requests,
+                         duration=args.duration, headers=dict(args.header))
+        print(f"⏱️  Load testing {len(routes)} routes with {args.concurrency} connections...")
+        if args.content_dir:
+            report = asyncio.run(_run_against_local(args.content_dir, args.server_concurrency, args.unprocessed_rate,
+                                                    run_load, **load_args))
+        else:
+            report = asyncio.run(run_load(args.url, **load_args))
+        print_route_report(report)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n📄 Results saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()